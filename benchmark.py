@@ -0,0 +1,387 @@
+import os
+import sys
+import io
+import json
+import time
+import zlib
+import shutil
+import random
+import struct
+import argparse
+import platform
+import pickle
+import subprocess
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，此时不统计峰值内存
+    resource = None
+
+from compress_util import compress_folder, decompress_folder, merge_chunks, VolumeWriter
+from crypto_util import encrypt_file, decrypt_file
+from file_merge import merge_files, recover_files
+from dedup_util import store_folder, restore_store
+
+# 基准测试的测试数据集（由固定随机种子生成，保证可重复）:
+# tiny: 大量小文件；huge: 少量大文件；random: 不可压缩数据；text: 类文本数据。
+# scale 为每个数据集的大致总大小（MB）。
+CORPORA = ('tiny', 'huge', 'random', 'text')
+BENCH_PASSWORD = 'benchmark'
+TEXT_WORDS = [
+    'the', 'of', 'and', 'data', 'file', 'archive', 'volume', 'error', 'value', 'config',
+    'timestamp', 'request', 'response', 'user', 'id', 'status', 'ok', 'retry', 'chunk', 'offset',
+]
+
+
+def _write_random(path, size, rng, chunk=1024 * 1024):
+    with open(path, 'wb') as f:
+        while size > 0:
+            n = min(chunk, size)
+            f.write(rng.randbytes(n))
+            size -= n
+
+
+def _write_text(path, size, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        written = 0
+        line_no = 0
+        while written < size:
+            line = f"{line_no} " + ' '.join(rng.choices(TEXT_WORDS, k=12)) + '\n'
+            f.write(line)
+            written += len(line)
+            line_no += 1
+
+
+def make_corpus(kind, target_dir, scale_mb, seed=0):
+    """生成指定类型的测试数据集，返回 (文件数, 总字节数)"""
+    rng = random.Random(seed)
+    os.makedirs(target_dir, exist_ok=True)
+    total = scale_mb * 1024 * 1024
+    if kind == 'tiny':
+        count = 0
+        written = 0
+        while written < total:
+            sub_dir = os.path.join(target_dir, f"d{count // 500:04d}")
+            os.makedirs(sub_dir, exist_ok=True)
+            size = rng.randint(64, 4096)
+            with open(os.path.join(sub_dir, f"f{count:06d}.txt"), 'w', encoding='utf-8') as f:
+                f.write(' '.join(rng.choices(TEXT_WORDS, k=size // 6)))
+            written += size
+            count += 1
+    elif kind == 'huge':
+        for i in range(2):
+            _write_text(os.path.join(target_dir, f"huge{i}.log"), total // 4, rng)
+            _write_random(os.path.join(target_dir, f"huge{i}.bin"), total // 4, rng)
+    elif kind == 'random':
+        for i in range(20):
+            _write_random(os.path.join(target_dir, f"random{i:02d}.bin"), total // 20, rng)
+    elif kind == 'text':
+        for i in range(50):
+            _write_text(os.path.join(target_dir, f"text{i:02d}.txt"), total // 50, rng)
+    else:
+        raise ValueError(f"未知的数据集类型: {kind}")
+    return _tree_size(target_dir)
+
+
+def _tree_size(path):
+    """统计目录下的文件数和总字节数"""
+    files = 0
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return files, total
+
+
+def _make_png(path, width=64, height=64):
+    """生成一张最小的合法 PNG 图片作为 merge_files 的载体图片"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    raw = b''.join(b'\x00' + bytes((x * 4) % 256 for x in range(width)) * 3 for _ in range(height))
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw)))
+        f.write(chunk(b'IEND', b''))
+
+
+def _split_stage(zip_path, output_dir, chunk_size):
+    """单独测试分卷切分: 把已有的压缩包按分卷大小写出"""
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(zip_path))[0]
+    writer = VolumeWriter(output_dir, base_name, chunk_size)
+    with open(zip_path, 'rb') as f:
+        shutil.copyfileobj(f, writer, 1024 * 1024)
+    writer.close()
+
+
+def _proc_io():
+    """读取当前进程的 I/O 字节数（仅 Linux），不可用时返回 None"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _maxrss_bytes(usage):
+    """rusage 中的峰值内存换算为字节（Linux 上单位为 KB，macOS 上为字节）"""
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def _stage_child():
+    """阶段子进程的入口: 从标准输入读取要运行的阶段，把统计结果以 JSON 写到原来的标准输出
+
+    阶段本身（及其工作进程）的输出全部丢弃，标准输出只用来传回结果。
+    """
+    func, args, kwargs = pickle.load(sys.stdin.buffer)
+    result_out = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    io_before = _proc_io()
+    times_before = os.times()
+    start = time.perf_counter()
+    error = None
+    try:
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            func(*args, **kwargs)
+    except SystemExit as e:
+        error = f"阶段以 sys.exit({e.code}) 退出"
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - start
+    times_after = os.times()
+    io_after = _proc_io()
+    cpu = sum(times_after[:4]) - sum(times_before[:4])
+    read_bytes = write_bytes = None
+    if io_before and io_after:
+        read_bytes = io_after[0] - io_before[0]
+        write_bytes = io_after[1] - io_before[1]
+    json.dump({'wall_seconds': wall, 'cpu_seconds': cpu, 'bytes_read': read_bytes, 'bytes_written': write_bytes,
+               'error': error}, result_out)
+    result_out.close()
+
+
+def run_stage(name, func, args=(), kwargs=None, input_bytes=0, files=0):
+    """运行并计时一个阶段，返回该阶段的统计结果
+
+    每个阶段在新启动的解释器进程中运行（不是 fork，不继承本进程已占用的内存），
+    峰值内存取自等待该子进程结束时得到的 rusage，包括它的工作进程，各阶段之间互不影响。
+    """
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--stage-child'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    process.stdin.write(pickle.dumps((func, args, kwargs or {})))
+    process.stdin.close()
+    output = process.stdout.read()
+    process.stdout.close()
+    peak_rss = None
+    if resource is not None and hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss = _maxrss_bytes(usage)
+    else:
+        process.wait()
+    try:
+        result = json.loads(output)
+    except ValueError:
+        result = {'wall_seconds': None, 'cpu_seconds': None, 'bytes_read': None, 'bytes_written': None,
+                  'error': f"阶段进程异常退出(退出码 {process.returncode})"}
+    result['peak_rss'] = peak_rss
+    wall = result['wall_seconds']
+    result.update({
+        'stage': name,
+        'input_bytes': input_bytes,
+        'files': files,
+        'mb_per_s': input_bytes / 1024 / 1024 / wall if wall else None,
+        'files_per_s': files / wall if wall and files else None,
+    })
+    return result
+
+
+def bench_corpus(kind, work_dir, scale_mb, chunk_size, workers):
+    """对一个数据集依次测试各个阶段"""
+    corpus_dir = os.path.join(work_dir, 'corpus', kind)
+    out_dir = os.path.join(work_dir, 'out', kind)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    if not os.path.isdir(corpus_dir):
+        make_corpus(kind, corpus_dir, scale_mb)
+    files, total = _tree_size(corpus_dir)
+
+    zip_dir = os.path.join(out_dir, 'zip')
+    zip_path = os.path.join(zip_dir, f"{kind}.zip")
+    split_dir = os.path.join(out_dir, 'split')
+    img_dir = os.path.join(out_dir, 'images')
+    os.makedirs(img_dir, exist_ok=True)
+    for i in range(4):
+        _make_png(os.path.join(img_dir, f"carrier{i}.png"))
+
+    stages = []
+    stages.append(run_stage('compress_folder', compress_folder, (corpus_dir, zip_dir),
+                            {'workers': workers}, total, files))
+    zip_size = os.path.getsize(zip_path) if os.path.exists(zip_path) else 0
+    stages.append(run_stage('volume_split', _split_stage, (zip_path, split_dir, chunk_size), None, zip_size))
+    volumes = len(os.listdir(split_dir)) if os.path.isdir(split_dir) else 0
+    stages.append(run_stage('encrypt_file', encrypt_file, (zip_path, os.path.join(out_dir, 'enc'), BENCH_PASSWORD),
+                            {'workers': workers}, zip_size, 1))
+    stages.append(run_stage('decrypt_file', decrypt_file,
+                            (os.path.join(out_dir, 'enc', f"{kind}.zip.enc"), os.path.join(out_dir, 'dec'), BENCH_PASSWORD),
+                            {'workers': workers}, zip_size, 1))
+    stages.append(run_stage('merge_chunks', merge_chunks, (split_dir, kind), None, zip_size, volumes))
+    stages.append(run_stage('decompress_folder', decompress_folder, (zip_path, os.path.join(out_dir, 'restore')),
+                            {'workers': workers}, total, files))
+    stages.append(run_stage('dedup_store', store_folder, (corpus_dir, os.path.join(out_dir, 'store'), BENCH_PASSWORD),
+                            {'workers': workers}, total, files))
+    stages.append(run_stage('dedup_restore', restore_store, (os.path.join(out_dir, 'store'), os.path.join(out_dir, 'undedup'),
+                                                             BENCH_PASSWORD), {'workers': workers}, total, files))
+    stages.append(run_stage('merge_files', merge_files, (split_dir, img_dir, os.path.join(out_dir, 'merged')),
+                            None, zip_size, volumes))
+    stages.append(run_stage('recover_files', recover_files, (os.path.join(out_dir, 'merged'), os.path.join(out_dir, 'recovered')),
+                            None, zip_size, volumes))
+    return {'corpus': kind, 'files': files, 'bytes': total, 'stages': stages}
+
+
+def bench_workers(kind, work_dir, scale_mb, worker_counts):
+    """并行扩展性测试: 用不同的进程数分别压缩（带 AES 密码）和解压同一个数据集，返回各进程数的结果"""
+    corpus_dir = os.path.join(work_dir, 'corpus', kind)
+    if not os.path.isdir(corpus_dir):
+        make_corpus(kind, corpus_dir, scale_mb)
+    files, total = _tree_size(corpus_dir)
+
+    runs = []
+    for workers in worker_counts:
+        out_dir = os.path.join(work_dir, 'sweep', kind, f"w{workers}")
+        shutil.rmtree(out_dir, ignore_errors=True)
+        zip_dir = os.path.join(out_dir, 'zip')
+        stages = [
+            run_stage('compress_folder', compress_folder, (corpus_dir, zip_dir),
+                      {'password': BENCH_PASSWORD, 'workers': workers}, total, files),
+            run_stage('decompress_folder', decompress_folder, (os.path.join(zip_dir, f"{kind}.zip"), os.path.join(out_dir, 'restore')),
+                      {'password': BENCH_PASSWORD, 'workers': workers}, total, files),
+        ]
+        runs.append({'workers': workers, 'stages': stages})
+    return {'corpus': kind, 'files': files, 'bytes': total, 'runs': runs}
+
+
+def print_scaling(scaling):
+    """打印扩展性测试结果: 每个进程数的吞吐量，以及相对于第一个进程数的加速比"""
+    for corpus in scaling:
+        print(f"\n扩展性 {corpus['corpus']}: {corpus['files']} 个文件, {corpus['bytes']} 字节（本机 {os.cpu_count()} 个 CPU）")
+        first = {stage['stage']: stage for stage in corpus['runs'][0]['stages']}
+        for run in corpus['runs']:
+            for stage in run['stages']:
+                base = first[stage['stage']]
+                speedup = (base['wall_seconds'] / stage['wall_seconds']
+                           if base['wall_seconds'] and stage['wall_seconds'] else None)
+                line = (f"  {stage['stage']:<18} {run['workers']:>3} 进程 {_fmt(stage['wall_seconds'], 's'):>9} "
+                        f"{_fmt(stage['mb_per_s'], ' MB/s'):>14} 加速比 {_fmt(speedup, 'x')}")
+                if stage['error']:
+                    line += f"  出错: {stage['error']}"
+                print(line)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _fmt(value, unit=''):
+    return '-' if value is None else f"{value:.2f}{unit}"
+
+
+def print_report(report, baseline=None):
+    """打印结果表格；给出基准结果时同时显示速度变化"""
+    previous = {}
+    if baseline:
+        for corpus in baseline['results']:
+            for stage in corpus['stages']:
+                previous[(corpus['corpus'], stage['stage'])] = stage
+    for corpus in report['results']:
+        print(f"\n数据集 {corpus['corpus']}: {corpus['files']} 个文件, {corpus['bytes']} 字节")
+        for stage in corpus['stages']:
+            line = (f"  {stage['stage']:<18} {_fmt(stage['wall_seconds'], 's'):>9} "
+                    f"{_fmt(stage['mb_per_s'], ' MB/s'):>14} {_fmt(stage['files_per_s'], ' 文件/s'):>16} "
+                    f"峰值内存 {_fmt(stage['peak_rss'] and stage['peak_rss'] / 1024 / 1024, ' MB')} "
+                    f"读 {stage['bytes_read']} 写 {stage['bytes_written']}")
+            old = previous.get((corpus['corpus'], stage['stage']))
+            if old and old.get('wall_seconds') and stage['wall_seconds']:
+                line += f"  耗时变化 {(stage['wall_seconds'] / old['wall_seconds'] - 1) * 100:+.1f}%"
+            if stage['error']:
+                line += f"  出错: {stage['error']}"
+            print(line)
+
+
+def main():
+    if sys.argv[1:] == ['--stage-child']:
+        _stage_child()
+        return
+
+    parser = argparse.ArgumentParser(description="zip_crypto 与 file_merge 各阶段的性能基准测试")
+    parser.add_argument("-o", "--output", required=True, help="工作目录(存放测试数据和各阶段产物)")
+    parser.add_argument("-c", "--corpus", default=','.join(CORPORA), help=f"数据集，逗号分隔(可选: {', '.join(CORPORA)})")
+    parser.add_argument("--scale", type=int, default=64, help="每个数据集的大致大小(MB，默认 64)")
+    parser.add_argument("-s", "--size", type=int, default=8 * 1024 * 1024, help="分卷大小(字节，默认 8MB)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="并行进程数(默认 1)")
+    parser.add_argument("--sweep", help="并行扩展性测试的进程数列表，逗号分隔(如 1,2,4,8)，给出时另外测试压缩和解压随进程数的扩展性")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果比较")
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.corpus.split(',') if k.strip()]
+    for kind in kinds:
+        if kind not in CORPORA:
+            print(f"错误: 未知的数据集: {kind}")
+            sys.exit(1)
+    try:
+        worker_counts = [int(n) for n in args.sweep.split(',') if n.strip()] if args.sweep else []
+    except ValueError:
+        print(f"错误: 无效的进程数列表: {args.sweep}")
+        sys.exit(1)
+    if any(n < 1 for n in worker_counts):
+        print("错误: 进程数必须大于 0")
+        sys.exit(1)
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scale_mb': args.scale,
+        'chunk_size': args.size,
+        'workers': args.workers,
+        'results': [bench_corpus(kind, args.output, args.scale, args.size, args.workers) for kind in kinds],
+        'scaling': [bench_workers(kind, args.output, args.scale, worker_counts) for kind in kinds] if worker_counts else [],
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if report['scaling']:
+        print_scaling(report['scaling'])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
+
+    # 一些使用例子:
+    # 测试全部数据集(每个约 64MB): python benchmark.py -o /path/to/bench_dir --json result.json
+    # 只测试小文件和不可压缩数据，4 个进程: python benchmark.py -o /path/to/bench_dir -c tiny,random -w 4
+    # 与之前某次提交的结果比较: python benchmark.py -o /path/to/bench_dir --compare old_result.json
+    # 并行扩展性（1、2、4、8 个进程分别压缩和解压，输出吞吐量和加速比）: python benchmark.py -o /path/to/bench_dir -c text --sweep 1,2,4,8
+
+    # 测试数据只在工作目录中不存在时生成，重复运行会复用，便于在不同提交之间比较。
+    # 每个阶段在新启动的子进程中运行，峰值内存和读写字节数只统计该阶段（读写字节数仅 Linux 可用）。
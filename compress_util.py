@@ -1,8 +1,156 @@
+import io
 import os
+import re
 import sys
+import stat
+import json
+import bisect
+import fnmatch
+import zlib
+import bz2
+import struct
+import hashlib
+import hmac
+import shutil
+import time
+import heapq
+import tempfile
+import shlex
+import tarfile
 import argparse
+import subprocess
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pyzipper
-from tqdm import tqdm
+from pyzipper.zipfile import _get_compressor
+from pyzipper.zipfile_aes import AESZipDecrypter
+from crypto_util import SegmentWriter, SegmentReader, SegmentStreamReader, new_job_salt, segment_plain_size, digest_mac, verify_files, \
+    KDF_ITERATIONS
+import stats_util
+import journal_util
+
+# 按序号查找分卷文件 <base_name>_part<X>.zip（加密的分卷 suffix 为 .zip.enc），返回按顺序排列的路径列表（序号须从 1 开始连续）。
+def find_volumes(input_dir, base_name, suffix='.zip'):
+    """查找分卷文件"""
+    part_files = []
+    part_counter = 1
+    while True:
+        part_path = os.path.join(input_dir, f"{base_name}_part{part_counter}{suffix}")
+        if not os.path.exists(part_path):
+            break
+        part_files.append(part_path)
+        part_counter += 1
+    return part_files
+
+
+def _volume_files(directory, archive_name, leftovers=False):
+    """directory 中属于 archive_name 的分卷文件名（任意分卷大小、加密与否）；leftovers 为 True 时包括续传留下的 .old"""
+    pattern = re.compile(re.escape(archive_name) + r'(?:_part\d+)?\.zip(?:\.enc)?' + (r'(?:\.old)?' if leftovers else ''))
+    return sorted(filename for filename in os.listdir(directory or '.') if pattern.fullmatch(filename))
+
+
+# 全新开始写压缩包之前删除输出目录中同名压缩包的旧文件: 任意分卷大小、加密与否的分卷，续传留下的 .old 和摘要清单。
+# 新任务只覆盖它写出的分卷，被中断或分卷更小的旧任务留下的序号更大的分卷会被 find_volumes 接到新分卷集后面。
+def _remove_stale_volumes(output_dir, archive_name):
+    """删除 output_dir 中 archive_name 的旧分卷和摘要清单，返回删除的分卷数"""
+    removed = 0
+    for filename in _volume_files(output_dir, archive_name, leftovers=True):
+        os.remove(os.path.join(output_dir, filename))
+        removed += 1
+    digest_path = _digest_path(output_dir, archive_name)
+    if os.path.exists(digest_path):
+        os.remove(digest_path)
+    return removed
+
+
+# 多分卷虚拟读取流: 把有序的一组分卷当作一个连续的逻辑文件来读，支持 seek，
+# 逻辑偏移按分卷大小映射为 (分卷, 分卷内偏移)，分卷在用到时才打开。
+# pyzipper 可以直接从它读取，解压分卷压缩包时不再需要先在磁盘上合并出完整的 zip。
+class MultiVolumeReader(io.RawIOBase):
+    """把多个分卷呈现为一个可 seek 的只读流"""
+
+    def __init__(self, paths, opener=None, sizes=None):
+        super().__init__()
+        self.paths = list(paths)
+        self._opener = opener or (lambda path: open(path, 'rb'))
+        sizes = sizes if sizes is not None else [os.path.getsize(p) for p in self.paths]
+        # starts[i] 为第 i 个分卷在逻辑流中的起始偏移，starts[-1] 为总长度
+        self.starts = [0]
+        for size in sizes:
+            self.starts.append(self.starts[-1] + size)
+        self._pos = 0
+        self._index = None
+        self._file = None
+        self.opened = set()  # 实际打开过的分卷序号
+
+    @property
+    def size(self):
+        return self.starts[-1]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if pos < 0:
+            raise OSError("seek 位置不能为负数")
+        self._pos = pos
+        return pos
+
+    def volume_of(self, offset):
+        """返回逻辑偏移所在的分卷序号（从 0 开始）"""
+        return bisect.bisect_right(self.starts, offset) - 1
+
+    def _switch(self, index):
+        if index != self._index:
+            if self._file is not None:
+                self._file.close()
+            self._file = self._opener(self.paths[index])
+            self._index = index
+            self.opened.add(index)
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        total = 0
+        while total < len(view) and self._pos < self.size:
+            index = self.volume_of(self._pos)
+            self._switch(index)
+            self._file.seek(self._pos - self.starts[index])
+            want = min(len(view) - total, self.starts[index + 1] - self._pos)
+            n = self._file.readinto(view[total:total + want])
+            if not n:
+                raise OSError(f"分卷提前结束: {self.paths[index]}")
+            total += n
+            self._pos += n
+        return total
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._index = None
+        super().close()
+
+
+def open_volumes(paths, opener=None, sizes=None, buffer_size=1024 * 1024):
+    """打开一组分卷，返回带缓冲的可 seek 只读流"""
+    return io.BufferedReader(MultiVolumeReader(paths, opener, sizes), buffer_size=buffer_size)
+
 
 # 此函数用于合并分卷文件，支持可选的压缩密码。
 # 参数:
@@ -19,24 +167,18 @@ def merge_chunks(output_dir, base_name, password=None):
     merged_path = os.path.join(output_dir, f"{base_name}_merged.zip")
     try:
         # 先检查所有分卷文件
-        part_files = []
-        part_counter = 1
-        while True:
-            part_path = os.path.join(output_dir, f"{base_name}_part{part_counter}.zip")
-            if not os.path.exists(part_path):
-                break
-            part_files.append(part_path)
-            part_counter += 1
+        part_files = find_volumes(output_dir, base_name)
 
         if not part_files:
             print(f"错误: 未找到任何分卷文件: {base_name}_part*.zip")
             sys.exit(1)
 
         # 合并所有分卷文件
-        with open(merged_path, 'wb') as merged_file:
+        with stats_util.stage('merge'), open(merged_path, 'wb') as merged_file:
             for part_path in part_files:
                 with open(part_path, 'rb') as part_file:
                     merged_file.write(part_file.read())
+            stats_util.add('merge', bytes_in=merged_file.tell(), bytes_out=merged_file.tell(), files=len(part_files))
 
         # 验证合并后的文件
         if password:
@@ -47,7 +189,7 @@ def merge_chunks(output_dir, base_name, password=None):
             with pyzipper.ZipFile(merged_path) as zip_file:
                 zip_file.testzip()
 
-        print(f"合并完成，文件路径: {os.path.abspath(merged_path)}")
+        stats_util.log(f"合并完成，文件路径: {os.path.abspath(merged_path)}")
         return merged_path
 
     except Exception as e:
@@ -57,83 +199,1641 @@ def merge_chunks(output_dir, base_name, password=None):
         sys.exit(1)
 
 
+# 分卷写出流: 压缩数据写入后直接按分卷大小切到最终的分卷文件中（可选同时做分段加密），
+# 不再经过临时 zip 文件，每个字节只写一次磁盘。
+# 此流不可 seek，zipfile 会因此为每个成员写数据描述符（标准 zip 特性，解压不受影响）。
+class _DigestFile:
+    """写入时顺带计算 SHA-256 和字节数的文件包装，分卷的摘要不需要写完后再读一遍"""
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class VolumeWriter(io.RawIOBase):
+    """按分卷大小切分写入的只写流，可选对每个分卷做分段加密
+
+    on_volume: 每个分卷写完并 fsync 之后的回调 on_volume(已写完的分卷数)，用于记录断点续传的检查点。
+    sink: 可选的分卷输出（见 StreamSink、CommandSink），sink(分卷文件名) 返回可写的二进制文件对象，
+          关闭它即写完该分卷；为 None 时写到 output_dir 中的文件。使用 sink 时 volume_paths 中为分卷文件名。
+    volume_digests 为各分卷写出的字节（加密时为密文）的 SHA-256，在写出的同时计算。
+    """
+
+    def __init__(self, output_dir, base_name, chunk_size=None, crypto=None, job_salt=None, on_volume=None, sink=None):
+        super().__init__()
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.chunk_size = chunk_size
+        self.crypto = crypto
+        # 同一任务的分卷共用一个任务盐值，只做一次慢速密钥派生
+        self.job_salt = job_salt or (new_job_salt() if crypto else None)
+        self.on_volume = on_volume
+        self.sink = sink
+        self.volume_paths = []
+        self.volume_sizes = []
+        self.volume_digests = []
+        self.disk_bytes = 0  # 实际写入磁盘的字节数（加密时包含文件头和认证标签）
+        self._pos = 0  # 逻辑（明文 zip）偏移
+        self._file = None
+        self._stream = None
+        self._volume_pos = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def volume_name(self, index):
+        """第 index 个分卷（从 1 开始）的文件名，不分卷时为 <base_name>.zip"""
+        name = f"{self.base_name}_part{index}.zip" if self.chunk_size else f"{self.base_name}.zip"
+        return name + '.enc' if self.crypto else name
+
+    def _volume_path(self, index):
+        return os.path.join(self.output_dir, self.volume_name(index))
+
+    def _open_volume(self):
+        index = len(self.volume_paths) + 1
+        if self.sink:
+            path = self.volume_name(index)
+            self._file = _DigestFile(self.sink(path))
+        else:
+            path = self._volume_path(index)
+            self._file = _DigestFile(open(path, 'wb'))
+        self.volume_paths.append(path)
+        if self.crypto:
+            self._stream = SegmentWriter(self._file, self.crypto, self.job_salt, index if self.chunk_size else 0)
+        else:
+            self._stream = self._file
+        self._volume_pos = 0
+
+    def _close_volume(self):
+        if self._stream is not self._file:
+            self._stream.close()
+        if self.on_volume:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.disk_bytes += self._file.size
+        self.volume_sizes.append(self._file.size)
+        self.volume_digests.append(self._file.digest.hexdigest())
+        stats_util.add('split', bytes_out=self._file.size, files=1)
+        self._file.close()
+        self._file = self._stream = None
+        if self.on_volume:
+            self.on_volume(len(self.volume_paths))
+
+    def resume(self, end):
+        """断点续传（需要分卷）: 保留逻辑偏移 end 之前已写出的内容，之后从 end 处继续写
+
+        end 之前的完整分卷原样保留；end 所在的分卷截断到 end 处（加密的分卷解密这部分后用新的 nonce 重新加密写出），
+        之后的分卷全部删除。end 必须位于已完整写出的分卷中。
+        """
+        keep, rest = divmod(end, self.chunk_size)
+        index = keep + (2 if rest else 1)
+        while os.path.exists(self._volume_path(index)):
+            os.remove(self._volume_path(index))
+            index += 1
+
+        self.volume_paths = [self._volume_path(i) for i in range(1, keep + 1)]
+        self.volume_sizes = [os.path.getsize(path) for path in self.volume_paths]
+        self.volume_digests = [_file_digest(path) for path in self.volume_paths]
+        self.disk_bytes = sum(self.volume_sizes)
+        self._pos = keep * self.chunk_size
+        if rest:
+            # 先改名为 .old 再重写，重写过程中再次中断时下次仍从 .old 读取
+            path = self._volume_path(keep + 1)
+            old_path = path + '.old'
+            if not os.path.exists(old_path):
+                os.replace(path, old_path)
+            source = SegmentReader(old_path, self.crypto) if self.crypto else open(old_path, 'rb')
+            with source:
+                remaining = rest
+                while remaining:
+                    data = source.read(min(remaining, COPY_BUFFER_SIZE))
+                    if not data:
+                        raise ValueError(f"分卷长度不足，无法续传: {path}")
+                    self.write(data)
+                    remaining -= len(data)
+            os.remove(old_path)
+
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        while view:
+            if self._file is None:
+                self._open_volume()
+            n = len(view) if not self.chunk_size else min(len(view), self.chunk_size - self._volume_pos)
+            self._stream.write(view[:n])
+            view = view[n:]
+            self._volume_pos += n
+            self._pos += n
+            if self.chunk_size and self._volume_pos == self.chunk_size:
+                self._close_volume()
+        return len(data)
+
+    def close(self):
+        if not self.closed and self._file is not None:
+            self._close_volume()
+        super().close()
+
+    def abort(self, keep=False):
+        """出错时关闭并删除已经生成的分卷文件；keep 为 True 时保留（用于断点续传）；写到 sink 的分卷无法删除"""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass  # 出错时 sink 可能也已失败，以最初的错误为准
+            self._file = self._stream = None
+        for path in self.volume_paths if not keep and not self.sink else ():
+            if os.path.exists(path):
+                os.remove(path)
+        super().close()
+
+
+class _UnclosedStream:
+    """关闭时只 flush、不关闭底层流的包装（标准输出由调用方管理）"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, data):
+        return self._stream.write(data)
+
+    def close(self):
+        self._stream.flush()
+
+
+class StreamSink:
+    """把压缩包写到一个已打开的流（例如标准输出），不能分卷，也不输出摘要清单"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.used = False
+
+    def __call__(self, name):
+        if self.used:
+            raise ValueError("输出到流时不能分卷")
+        self.used = True
+        return _UnclosedStream(self.stream)
+
+
+class _CommandStream:
+    """写入子进程标准输入的流，关闭时等待子进程结束并检查退出码"""
+
+    def __init__(self, command):
+        self.command = command
+        self._process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE)
+
+    def write(self, data):
+        return self._process.stdin.write(data)
+
+    def close(self):
+        self._process.stdin.close()
+        returncode = self._process.wait()
+        if returncode != 0:
+            raise OSError(f"分卷命令执行失败(退出码 {returncode}): {self.command}")
+
+
+class CommandSink:
+    """把每个分卷（和摘要清单）通过管道交给一条命令，例如上传工具，本地不落盘
+
+    command 为 shell 命令模板，其中的 {name} 替换为分卷文件名（已做 shell 转义），
+    例如 "aws s3 cp - s3://bucket/backup/{name}"；同一时间只有一个命令在运行，写完一个分卷才开始下一个。
+    """
+
+    def __init__(self, command):
+        self.command = command
+
+    def __call__(self, name):
+        return _CommandStream(self.command.replace('{name}', shlex.quote(name)))
+
+
+# 读取源文件时的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+# 自适应压缩策略: 已经压缩过的数据再 deflate 只会白白消耗 CPU。
+# 先按扩展名判断，再对文件开头的一段样本做一次快速的试压缩:
+# 压缩率很差的直接存储，压缩率一般的改用快速级别，其余使用默认级别。
+COMPRESSED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp4', '.mkv', '.mov', '.avi', '.webm', '.mp3', '.aac', '.ogg', '.opus', '.flac', '.m4a',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.txz', '.7z', '.rar', '.zst', '.lz4', '.enc',
+    '.docx', '.xlsx', '.pptx', '.jar', '.apk', '.whl',
+}
+SAMPLE_SIZE = 256 * 1024
+STORE_RATIO = 0.95  # 样本压缩后仍大于原大小的 95%: 直接存储
+FAST_RATIO = 0.80  # 样本压缩后大于原大小的 80%: 使用快速级别
+FAST_LEVEL = 1
+
+
+def _choose_compression(file_path, compression, compresslevel, sample):
+    """根据扩展名和文件开头的样本 sample 为单个成员选择压缩方式，返回 (compress_type, compresslevel)"""
+    if compression == pyzipper.ZIP_STORED:
+        return compression, compresslevel
+    if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return pyzipper.ZIP_STORED, None
+    if len(sample) < 512:
+        return compression, compresslevel
+    ratio = len(zlib.compress(sample, FAST_LEVEL)) / len(sample)
+    if ratio > STORE_RATIO:
+        return pyzipper.ZIP_STORED, None
+    if ratio > FAST_RATIO:
+        return compression, FAST_LEVEL
+    return compression, compresslevel
+
+
+def _deflate_seconds_per_byte():
+    """粗略测量默认级别 deflate 处理不可压缩数据的耗时（秒/字节），用于估计直接存储节省的 CPU 时间"""
+    data = os.urandom(1024 * 1024)
+    start = time.process_time()
+    zlib.compress(data)
+    return (time.process_time() - start) / len(data)
+
+
+def _report_policy(filelist):
+    """统计各压缩方式处理的字节数并估计节省的 CPU 时间"""
+    stored = [z.file_size for z in filelist if z.compress_type == pyzipper.ZIP_STORED]
+    fast = [z.file_size for z in filelist if z.compress_type != pyzipper.ZIP_STORED and z._compresslevel == FAST_LEVEL]
+    normal = [z.file_size for z in filelist if z.compress_type != pyzipper.ZIP_STORED and z._compresslevel != FAST_LEVEL]
+    saved = sum(stored) * _deflate_seconds_per_byte() if stored else 0
+    stats_util.log(f"压缩策略: 直接存储 {sum(stored)} 字节({len(stored)} 个文件), 快速压缩 {sum(fast)} 字节({len(fast)} 个文件), "
+          f"标准压缩 {sum(normal)} 字节({len(normal)} 个文件); 估计节省 CPU 时间约 {saved:.2f} 秒")
+
+
+def _zipinfo(zip_file, arcname, size, mtime_ns, mode):
+    """用扫描时得到的 stat 信息构造成员的 ZipInfo（不再对文件重复 stat）
+
+    zip 的时间只能表示 1980 到 2107 年，超出范围的修改时间取最近的边界。
+    """
+    date_time = time.localtime(mtime_ns // 1000000000)[:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    zinfo = zip_file.zipinfo_cls(arcname, date_time)
+    zinfo.external_attr = (mode & 0xFFFF) << 16
+    zinfo.file_size = size
+    return zinfo
+
+
+def _write_member(zip_file, file_path, arcname, adaptive=True, meta=None):
+    """把单个文件流式写入压缩包，同时计算内容的 SHA-256，返回 (zinfo, 十六进制摘要)
+
+    adaptive 为 True 时按自适应策略为该成员选择直接存储或压缩级别（样本就是写入的第一块数据，文件只打开一次）。
+    meta 为扫描时得到的 (大小, 修改时间 ns, 权限)，为 None 时重新 stat。
+    """
+    if meta is None:
+        st = os.stat(file_path)
+        meta = (st.st_size, st.st_mtime_ns, st.st_mode)
+    with open(file_path, 'rb') as src:
+        return _write_stream(zip_file, src, arcname, meta, adaptive)
+
+
+def _write_stream(zip_file, src, arcname, meta, adaptive=True, streamable=False):
+    """把可读流 src 的全部内容写入压缩包的成员 arcname，同时计算 SHA-256，返回 (zinfo, 十六进制摘要)
+
+    meta 为 (大小, 修改时间 ns, 权限)；按 arcname 的扩展名和第一块数据选择压缩策略。
+    streamable 为 True 时不使用直接存储（改为 deflate 级别 0），保证每个成员的数据都能在流式解压时找到结尾。
+    """
+    zinfo = _zipinfo(zip_file, arcname, *meta)
+    zinfo.compress_type = zip_file.compression
+    zinfo._compresslevel = zip_file.compresslevel
+    digest = hashlib.sha256()
+    chunk = src.read(SAMPLE_SIZE if adaptive else COPY_BUFFER_SIZE)
+    if adaptive:
+        zinfo.compress_type, zinfo._compresslevel = _choose_compression(arcname, zinfo.compress_type,
+                                                                        zinfo._compresslevel, chunk)
+    if streamable and zinfo.compress_type == pyzipper.ZIP_STORED:
+        zinfo.compress_type, zinfo._compresslevel = pyzipper.ZIP_DEFLATED, 0
+    with zip_file.open(zinfo, 'w') as dest:
+        while chunk:
+            digest.update(chunk)
+            dest.write(chunk)
+            chunk = src.read(COPY_BUFFER_SIZE)
+    return zinfo, digest.hexdigest()
+
+
+def _file_digest(file_path):
+    """计算文件内容的 SHA-256（增量扫描时只对大小相同但修改时间变化的文件调用）"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 并行压缩时，压缩后超过此大小的成员由工作进程写到输出目录下的临时文件再拷入压缩包，
+# 小成员直接以字节串传回主进程，避免占用过多内存。
+MEMBER_SPILL_SIZE = 16 * 1024 * 1024
+
+
+# 固实模式: 小文件（小于 SOLID_FILE_LIMIT）按扩展名和路径排序后依次拼接成不超过 SOLID_BLOCK_SIZE 的块，
+# 每个块作为一个成员（.zcm_solid/blockNNNNNN）整体压缩和加密，省掉大量小成员的文件头、AES 密钥派生和
+# 很短的 deflate 流，压缩时也能利用文件之间的冗余。
+# 成员 SOLID_INDEX_NAME 记录每个文件所在的 (块, 块内偏移, 长度)，因此仍可以单独解压某个文件（只需解压它所在的块）。
+SOLID_PREFIX = '.zcm_solid/'
+SOLID_INDEX_NAME = SOLID_PREFIX + 'index.json'
+SOLID_VERSION = 1
+SOLID_FILE_LIMIT = 64 * 1024
+SOLID_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _plan_jobs(entries, solid=False, block_start=0):
+    """把文件条目分成压缩任务，返回 [(条目列表, 成员名, 是否固实块, 原始大小)]
+
+    非固实模式下每个文件一个任务；固实模式下小文件分组为块（块名从 block_start 开始编号），其余文件仍各自一个任务。
+    """
+    if not solid:
+        return [([entry], entry[1], False, entry[2]) for entry in entries]
+    jobs = [([entry], entry[1], False, entry[2]) for entry in entries if entry[2] >= SOLID_FILE_LIMIT]
+    small = sorted((entry for entry in entries if entry[2] < SOLID_FILE_LIMIT),
+                   key=lambda entry: (os.path.splitext(entry[1])[1].lower(), entry[1]))
+    block, block_size = [], 0
+    for entry in small + [None]:
+        if block and (entry is None or block_size + entry[2] > SOLID_BLOCK_SIZE):
+            jobs.append((block, f"{SOLID_PREFIX}block{block_start + len(jobs):06d}", True, block_size))
+            block, block_size = [], 0
+        if entry is not None:
+            block.append(entry)
+            block_size += entry[2]
+    return jobs
+
+
+def _write_block(zip_file, block_name, entries, adaptive=True):
+    """把一组小文件依次拼接写成一个固实块成员
+
+    返回 (zinfo, {arcname: SHA-256}, [[arcname, 块内偏移, 长度], ...])。块不超过 SOLID_BLOCK_SIZE，直接在内存中拼接。
+    """
+    digests = {}
+    layout = []
+    chunks = []
+    offset = 0
+    for file_path, rel_path, *_ in entries:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        arcname = rel_path.replace(os.sep, '/')
+        digests[arcname] = hashlib.sha256(data).hexdigest()
+        layout.append([arcname, offset, len(data)])
+        offset += len(data)
+        chunks.append(data)
+    block = b''.join(chunks)
+
+    zinfo = _zipinfo(zip_file, block_name, len(block), max(entry[3] for entry in entries), stat.S_IFREG | 0o644)
+    zinfo.compress_type = zip_file.compression
+    zinfo._compresslevel = zip_file.compresslevel
+    if adaptive:
+        zinfo.compress_type, zinfo._compresslevel = _choose_compression(block_name, zinfo.compress_type,
+                                                                        zinfo._compresslevel, block[:SAMPLE_SIZE])
+    with zip_file.open(zinfo, 'w') as dest:
+        dest.write(block)
+    return zinfo, digests, layout
+
+
+def _write_job(zip_file, job, adaptive=True):
+    """写出一个压缩任务（单个文件或固实块），返回 (zinfo, {arcname: SHA-256}, 固实块布局或 None)"""
+    entries, arcname, solid, _ = job
+    if solid:
+        return _write_block(zip_file, arcname, entries, adaptive)
+    file_path, rel_path, *meta = entries[0]
+    zinfo, digest = _write_member(zip_file, file_path, rel_path, adaptive, meta)
+    return zinfo, {zinfo.filename: digest}, None
+
+
+def _compress_member(task):
+    """在工作进程中把单个文件或固实块压缩（设置了密码时同时做 WinZip-AES 加密）为一个独立的 zip 成员
+
+    返回 (zinfo, data, spill_path, digests, layout): 成员的本地文件头加数据在 data 中，或者在临时文件 spill_path 中，
+    digests 为源文件内容的 SHA-256，layout 为固实块的布局（单个文件时为 None）。
+    """
+    job, password, spill_dir, adaptive, compression, compresslevel = task
+    spill_path = None
+    if job[3] > MEMBER_SPILL_SIZE:
+        fd, spill_path = tempfile.mkstemp(dir=spill_dir, prefix='.member_', suffix='.tmp')
+        buf = os.fdopen(fd, 'w+b')
+    else:
+        buf = io.BytesIO()
+
+    with buf:
+        with pyzipper.AESZipFile(buf, 'w', compression=compression, compresslevel=compresslevel) as zip_file:
+            if password:
+                zip_file.setpassword(password.encode())
+                zip_file.setencryption(pyzipper.WZ_AES, nbits=256)
+            zinfo, digests, layout = _write_job(zip_file, job, adaptive)
+            member_end = zip_file.start_dir
+        # 只保留成员本身，去掉这个临时压缩包的中央目录
+        if spill_path:
+            buf.truncate(member_end)
+            return zinfo, None, spill_path, digests, layout
+        return zinfo, buf.getvalue()[:member_end], None, digests, layout
+
+
+# 并行压缩把工作进程压缩好的成员直接拼接进压缩包，用到了 pyzipper（zipfile）的内部属性，
+# 已测试的 pyzipper 版本见 requirements.txt；这些属性不存在时回退为单进程压缩。
+APPEND_ATTRIBUTES = ('fp', 'start_dir', '_writecheck', '_didModify')
+
+
+def _can_append(zip_file):
+    """当前的 pyzipper 是否支持直接拼接成员（并行压缩）"""
+    return all(hasattr(zip_file, name) for name in APPEND_ATTRIBUTES)
+
+
+def _append_member(zip_file, zinfo, data, spill_path):
+    """把工作进程压缩好的成员按顺序拼接进压缩包，并登记到中央目录"""
+    zinfo.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(zinfo)
+    zip_file._didModify = True
+    if spill_path:
+        with open(spill_path, 'rb') as f:
+            shutil.copyfileobj(f, zip_file.fp, 1024 * 1024)
+        os.remove(spill_path)
+    else:
+        zip_file.fp.write(data)
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
+    zip_file.start_dir = zip_file.fp.tell()
+
+
+def _compress_parallel(zip_file, jobs, password, workers, spill_dir, on_done, adaptive):
+    """多进程并行压缩成员；大任务优先调度，结果按提交顺序拼接，同时在途的任务数有上限
+
+    每个成员拼接完成后调用 on_done(job, zinfo, digests, layout)。
+    """
+    jobs = sorted(jobs, key=lambda job: job[3], reverse=True)
+    pending = deque()
+
+    def finish():
+        job, future = pending.popleft()
+        zinfo, data, spill_path, digests, layout = future.result()
+        _append_member(zip_file, zinfo, data, spill_path)
+        on_done(job, zinfo, digests, layout)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for job in jobs:
+                if len(pending) >= workers * 2:
+                    finish()
+                pending.append((job, executor.submit(_compress_member, (job, password, spill_dir, adaptive,
+                                                                        zip_file.compression, zip_file.compresslevel))))
+            while pending:
+                finish()
+    finally:
+        # 出错时清理尚未拼接的临时文件
+        for _, future in pending:
+            if not future.cancelled() and future.exception() is None:
+                spill_path = future.result()[2]
+                if spill_path and os.path.exists(spill_path):
+                    os.remove(spill_path)
+
+
+def _zinfo_to_dict(zinfo):
+    """把成员的 ZipInfo 转为可写入任务日志的 dict（续传时用来重建中央目录）"""
+    data = {}
+    for cls in type(zinfo).__mro__:
+        for slot in getattr(cls, '__slots__', ()):
+            if hasattr(zinfo, slot):
+                value = getattr(zinfo, slot)
+                data[slot] = {'hex': value.hex()} if isinstance(value, bytes) else value
+    return data
+
+
+def _zinfo_from_dict(zip_file, data):
+    """由 _zinfo_to_dict 的结果重建 ZipInfo"""
+    zinfo = zip_file.zipinfo_cls.__new__(zip_file.zipinfo_cls)
+    for slot, value in data.items():
+        if isinstance(value, dict):
+            value = bytes.fromhex(value['hex'])
+        elif slot == 'date_time':
+            value = tuple(value)
+        setattr(zinfo, slot, value)
+    return zinfo
+
+
+# 增量压缩: 清单文件 <base_name>.manifest.json 记录上一次运行时每个文件的 大小、修改时间(ns) 和 内容哈希，
+# 以及已生成的压缩包链（完整包 <base_name>，之后依次为 <base_name>_delta1、<base_name>_delta2 ...）。
+# 重新扫描时大小和修改时间都没变的文件直接跳过（只需 stat，不读文件内容）；
+# 只有大小相同但修改时间变化的文件才读取内容比较哈希。
+# 增量包中只包含新增和修改的文件，被删除的文件记录在成员 TOMBSTONE_NAME（JSON 路径列表）中。
+# 注意: 清单是明文，包含文件名，若需要隐藏文件名请妥善保管清单。
+MANIFEST_VERSION = 1
+TOMBSTONE_NAME = '.zcm_deleted.json'
+
+
+def _manifest_path(output_dir, base_name):
+    return os.path.join(output_dir, f"{base_name}.manifest.json")
+
+
+def _load_manifest(manifest_path):
+    """读取增量清单，不存在时返回 None"""
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"不支持的清单版本: {manifest.get('version')}")
+    return manifest
+
+
+def _save_manifest(manifest_path, manifest):
+    """原子地写入增量清单（先写临时文件再替换）"""
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+
+
+def _diff_manifest(manifest, entries):
+    """与上一次的清单比较，返回 (需要压缩的条目, 被删除的路径列表, 未变化文件的清单记录)"""
+    old_files = manifest['files']
+    changed = []
+    unchanged = {}
+    for entry in entries:
+        file_path, rel_path, size, mtime_ns, _ = entry
+        arcname = rel_path.replace(os.sep, '/')
+        old = old_files.get(arcname)
+        if old and old[0] == size and old[1] == mtime_ns:
+            unchanged[arcname] = old
+        elif old and old[0] == size and _file_digest(file_path) == old[2]:
+            # 只是被 touch 过，内容没变
+            unchanged[arcname] = [size, mtime_ns, old[2]]
+        else:
+            changed.append(entry)
+    seen = set(unchanged) | {rel_path.replace(os.sep, '/') for _, rel_path, *_ in changed}
+    deleted = sorted(name for name in old_files if name not in seen)
+    return changed, deleted, unchanged
+
+
+# 摘要清单: 每次压缩在输出目录中生成 <archive_name>.digest.json，记录
+# 各分卷写入磁盘的字节（加密时为密文）的 SHA-256、各成员的大小和 CRC、各源文件内容的 SHA-256。
+# 这些摘要都在压缩的同一遍中顺带算出（源文件在读取时、分卷在写出时），不需要额外读一遍。
+# 设置了密码（优先使用分段加密的密码，否则用压缩密码）时，清单带有用密码派生的密钥计算的 HMAC-SHA256，
+# 防止分卷和清单被一起替换；没有密码时清单只能发现损坏，不能防篡改。
+# verify 只读取分卷计算哈希（多线程并行），不解压也不解密。
+DIGEST_VERSION = 1
+DIGEST_SUFFIX = '.digest.json'
+
+
+def _digest_path(output_dir, archive_name):
+    return os.path.join(output_dir, f"{archive_name}{DIGEST_SUFFIX}")
+
+
+def _digest_body(digest):
+    """清单中参与 HMAC 计算的部分（去掉 mac 字段后按键排序的紧凑 JSON）"""
+    body = {key: value for key, value in digest.items() if key != 'mac'}
+    return json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _write_digest(output_dir, archive_name, writer, zip_file, digests, password=None, crypto=None):
+    """写出压缩包的摘要清单（分卷写到 sink 时清单也交给 sink），返回清单路径或文件名"""
+    def volume_of(zinfo):
+        return zinfo.header_offset // writer.chunk_size + 1 if writer.chunk_size else 1
+
+    digest = {
+        'version': DIGEST_VERSION,
+        'archive': archive_name,
+        'algorithm': 'sha256',
+        'volumes': [{'name': os.path.basename(path), 'size': size, 'sha256': volume_digest}
+                    for path, size, volume_digest in zip(writer.volume_paths, writer.volume_sizes, writer.volume_digests)],
+        # AES 加密（AE-2）的成员不保存 CRC，记为 null
+        'members': [{'name': zinfo.filename, 'size': zinfo.file_size, 'compress_size': zinfo.compress_size,
+                     'crc': None if zinfo.flag_bits & 0x1 and not zinfo.CRC else f"{zinfo.CRC:08x}",
+                     'volume': volume_of(zinfo)} for zinfo in zip_file.filelist],
+        'files': dict(sorted(digests.items())),
+    }
+    if crypto or password:
+        # 分段加密时使用分卷的任务盐值，PBKDF2 主密钥已经缓存，不需要再做一次慢速派生
+        salt = writer.job_salt if crypto else new_job_salt()
+        digest['mac'] = {'key': 'crypto' if crypto else 'password', 'salt': salt.hex(), 'iterations': KDF_ITERATIONS,
+                         'hmac_sha256': digest_mac(crypto or password, salt, KDF_ITERATIONS, _digest_body(digest))}
+    if writer.sink:
+        name = f"{archive_name}{DIGEST_SUFFIX}"
+        f = writer.sink(name)
+        f.write(json.dumps(digest, ensure_ascii=False).encode('utf-8'))
+        f.close()
+        return name
+    path = _digest_path(output_dir, archive_name)
+    _save_manifest(path, digest)
+    return path
+
+
+# 目录扫描: 用 os.scandir 一遍完成目录遍历和 stat，结果（相对路径、大小、修改时间、权限）保存在紧凑的数组中，
+# 之后的进度条总数、增量比较、调度和 zip 成员的时间戳都直接使用，不再重复 stat。
+# 网络盘等元数据延迟高的场景可以用多个线程同时列目录（结果顺序与线程数无关）。
+class FileList:
+    """扫描结果: 相对路径存在列表中，大小、修改时间(ns)和权限存在 array 中
+
+    按下标或迭代访问时才生成 (file_path, rel_path, size, mtime_ns, mode) 元组。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.rel_paths = []
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        self.modes = array('L')
+        self.skipped = 0  # 无法读取而跳过的文件或目录数
+        self.empty_dirs = []  # 空目录的相对路径（不包括输入目录本身）
+
+    def append(self, rel_path, size, mtime_ns, mode):
+        self.rel_paths.append(rel_path)
+        self.sizes.append(size)
+        self.mtimes.append(mtime_ns)
+        self.modes.append(mode)
+
+    def _entry(self, i):
+        rel_path = self.rel_paths[i]
+        return os.path.join(self.root, rel_path), rel_path, self.sizes[i], self.mtimes[i], self.modes[i]
+
+    def __len__(self):
+        return len(self.rel_paths)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._entry(j) for j in range(*i.indices(len(self)))]
+        return self._entry(i)
+
+    def __iter__(self):
+        return (self._entry(i) for i in range(len(self)))
+
+
+def _scan_dir(path):
+    """列出一个目录，返回 (子目录名列表, [(文件名, 大小, 修改时间 ns, 权限)], 跳过数)；不进入指向目录的符号链接"""
+    dirs, files, skipped = [], [], 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    skipped += 1
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    files.append((entry.name, st.st_size, st.st_mtime_ns, st.st_mode))
+    except OSError:
+        skipped += 1
+    return dirs, files, skipped
+
+
+def scan_tree(input_path, threads=1):
+    """扫描输入路径（文件夹或单个文件），返回 FileList
+
+    按广度优先顺序记录文件；threads > 1 时用线程池同时列出多个目录，按提交顺序取结果，因此顺序是确定的。
+    """
+    result = FileList(input_path)
+    if os.path.isfile(input_path):
+        st = os.stat(input_path)
+        result.root = os.path.dirname(input_path)
+        result.append(os.path.basename(input_path), st.st_size, st.st_mtime_ns, st.st_mode)
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+    try:
+        queue = deque([('', executor.submit(_scan_dir, input_path) if executor else None)])
+        while queue:
+            rel_dir, future = queue.popleft()
+            dirs, files, skipped = future.result() if executor else _scan_dir(os.path.join(input_path, rel_dir))
+            result.skipped += skipped
+            if rel_dir and not dirs and not files and not skipped:
+                result.empty_dirs.append(rel_dir)
+            for name, size, mtime_ns, mode in files:
+                result.append(os.path.join(rel_dir, name) if rel_dir else name, size, mtime_ns, mode)
+            for name in dirs:
+                sub_dir = os.path.join(rel_dir, name) if rel_dir else name
+                queue.append((sub_dir, executor.submit(_scan_dir, os.path.join(input_path, sub_dir)) if executor else None))
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return result
+
+
+# 可选的压缩算法；级别: deflate 0-9，bzip2 1-9，stored 和 lzma 不支持级别
+CODECS = {
+    'stored': pyzipper.ZIP_STORED,
+    'deflate': pyzipper.ZIP_DEFLATED,
+    'bzip2': pyzipper.ZIP_BZIP2,
+    'lzma': pyzipper.ZIP_LZMA,
+}
+CODEC_LEVELS = {'deflate': range(0, 10), 'bzip2': range(1, 10)}
+
+# 自动调优: 在输入文件中均匀抽取样本（每个文件最多 SAMPLE_SIZE，总计最多 AUTO_SAMPLE_TOTAL），
+# 用下列候选的算法/级别分别压缩样本，测出压缩率和速度后按目标选择。
+AUTO_CANDIDATES = [
+    ('stored', None), ('deflate', 1), ('deflate', 6), ('deflate', 9),
+    ('bzip2', 1), ('bzip2', 9), ('lzma', None),
+]
+AUTO_SAMPLE_TOTAL = 8 * 1024 * 1024
+
+
+def check_codec(codec, level):
+    """校验压缩算法和级别，返回 zipfile 的压缩方式常量"""
+    if codec not in CODECS:
+        raise ValueError(f"不支持的压缩算法: {codec}，可选: {', '.join(CODECS)}")
+    if level is not None and level not in CODEC_LEVELS.get(codec, ()):
+        raise ValueError(f"压缩算法 {codec} 不支持级别 {level}")
+    return CODECS[codec]
+
+
+def _read_samples(entries):
+    """从文件列表中均匀抽取样本数据，返回 [(样本数据, 所属文件大小)]"""
+    samples = []
+    total = 0
+    step = max(1, len(entries) // max(1, AUTO_SAMPLE_TOTAL // SAMPLE_SIZE))
+    for file_path, _, size, *_ in entries[::step]:
+        with open(file_path, 'rb') as f:
+            data = f.read(min(SAMPLE_SIZE, AUTO_SAMPLE_TOTAL - total))
+        if data:
+            samples.append((data, size))
+            total += len(data)
+        if total >= AUTO_SAMPLE_TOTAL:
+            break
+    return samples
+
+
+def auto_tune(entries, target_speed=None, target_size=None, adaptive=True):
+    """对样本测试候选的压缩算法/级别，返回 (codec, level)
+
+    target_speed: 目标速度(MB/s)，在满足速度的候选中选压缩率最好的；都不满足时选最快的。
+    target_size: 目标输出大小(字节)，在预计输出不超过目标的候选中选最快的；都不满足时选压缩率最好的。
+    各样本的压缩率按所属文件的大小加权，以估计整个输入的压缩率；
+    adaptive 为 True 时，压缩后反而变大的样本按直接存储计算（与自适应策略一致）。
+    """
+    samples = _read_samples(entries)
+    sample_bytes = sum(len(data) for data, _ in samples)
+    weight_bytes = sum(size for _, size in samples)
+    input_bytes = sum(entry[2] for entry in entries)
+    if not sample_bytes:
+        return 'deflate', None
+
+    results = []
+    for codec, level in AUTO_CANDIDATES:
+        start = time.perf_counter()
+        weighted_out = 0
+        for data, size in samples:
+            compressor = _get_compressor(CODECS[codec], level)
+            out_bytes = len(data) if compressor is None else len(compressor.compress(data)) + len(compressor.flush())
+            if adaptive:
+                out_bytes = min(out_bytes, len(data))
+            weighted_out += out_bytes / len(data) * size
+        seconds = max(time.perf_counter() - start, 1e-9)
+        ratio = weighted_out / weight_bytes
+        speed = sample_bytes / 1024 / 1024 / seconds
+        results.append((codec, level, ratio, speed, int(input_bytes * ratio)))
+        stats_util.log(f"自动调优: {codec:<7} 级别 {level if level is not None else '-':<2} "
+              f"压缩率 {ratio:.3f}, 速度 {speed:.1f} MB/s, 预计输出 {int(input_bytes * ratio)} 字节")
+
+    if target_speed is not None:
+        fits = [r for r in results if r[3] >= target_speed]
+        best = min(fits, key=lambda r: r[2]) if fits else max(results, key=lambda r: r[3])
+    else:
+        fits = [r for r in results if r[4] <= target_size]
+        best = max(fits, key=lambda r: r[3]) if fits else min(results, key=lambda r: r[2])
+    stats_util.log(f"自动调优选择: {best[0]} 级别 {best[1] if best[1] is not None else '默认'}"
+          f"{'' if fits else '（没有候选满足目标，已选择最接近的）'}")
+    return best[0], best[1]
+
+
 # 此函数用于压缩指定的文件夹，支持可选的分卷和加密功能。
 # 参数:
 # input_path: 要压缩的文件夹的路径。
 # output_dir: 压缩文件的输出目录路径。
 # chunk_size: 分卷大小（以字节为单位），可选参数，默认为 None，表示不进行分卷。
 # password: 压缩文件的加密密码，可选参数，默认为 None，表示不进行加密。
+# crypto: 对压缩产物再做一层文件加密的密码，可选参数，默认为 None，表示不进行文件加密。
+# workers: 并行压缩（及 AES 加密）成员的进程数，可选参数，默认为 1，表示在当前进程中依次压缩。
+# incremental: 是否使用增量模式，可选参数，默认为 False。第一次生成完整包并写清单，之后只生成增量包。
+# adaptive: 是否使用自适应压缩策略（按扩展名和样本试压缩选择直接存储或压缩级别），可选参数，默认为 True。
+# codec: 压缩算法，可选 stored、deflate、bzip2、lzma，默认为 deflate。
+# level: 压缩级别，可选参数，默认为 None，表示使用该算法的默认级别。
+# auto: 是否自动调优，可选参数，默认为 False。为 True 时需要给出 target_speed(MB/s) 或 target_size(字节)，
+#       会在输入文件的样本上测试各候选算法/级别后选择，此时忽略 codec 和 level。
+# scan_threads: 扫描目录时同时列目录的线程数，可选参数，默认为 1；元数据延迟高（如网络盘）时可以调大。
+# solid: 是否使用固实模式，可选参数，默认为 False。为 True 时小文件拼接成块整体压缩（和加密），适合大量很小的文件。
+# resume: 是否断点续传，可选参数，默认为 False。分卷时每写完一个分卷在输出目录的任务日志中记录检查点，
+#         中途失败后用相同的参数加上 resume=True 重新运行，会保留已完成的分卷和成员，从最后一个检查点继续。
 
-# 这里的分卷是单纯的先压缩成一个文件再按照 size 切分
+# 压缩、分卷、文件加密在一个流水线中完成: 压缩数据直接切分并加密写到最终文件，不产生临时文件。
 
 # 输出文件名称规则：
 # 若不进行分卷，输出文件名为输入文件夹名称加上 .zip 后缀；
 # 若进行分卷，输出文件名为输入文件夹名称加上 _partX.zip 后缀，其中 X 为分卷序号。
-def compress_folder(input_path, output_dir, chunk_size=None, password=None):
+# 若使用文件加密，在上述文件名后再加 .enc 后缀。
+# 增量模式下的增量包以 <输入文件夹名称>_deltaN 作为名称，其余规则同上。
+def compress_folder(input_path, output_dir, chunk_size=None, password=None, crypto=None, workers=1,
+                    incremental=False, adaptive=True, codec='deflate', level=None,
+                    auto=False, target_speed=None, target_size=None, scan_threads=1, solid=False, resume=False):
     """压缩文件夹，可选分卷和加密"""
     if not os.path.exists(input_path):
         print(f"错误: 输入路径不存在: {input_path}")
         sys.exit(1)
 
+    if auto and target_speed is None and target_size is None:
+        print("错误: 自动调优需要指定目标速度或目标输出大小")
+        sys.exit(1)
+    try:
+        compression = check_codec(codec, level)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     base_name = os.path.basename(input_path.rstrip(os.sep))
-    temp_zip = os.path.join(output_dir, f"{base_name}_temp.zip")
 
+    with stats_util.stage('scan'):
+        entries = scan_tree(input_path, scan_threads)
+    stats_util.add('scan', files=len(entries))
+    if entries.skipped:
+        stats_util.log(f"警告: 跳过 {entries.skipped} 个无法读取的文件或目录")
+
+    # 增量模式: 有上一次的清单时只压缩新增和修改的文件
+    archive_name = base_name
+    manifest_path = _manifest_path(output_dir, base_name)
+    manifest = _load_manifest(manifest_path) if incremental else None
+    deleted = []
+    unchanged = {}
+    if manifest:
+        with stats_util.stage('diff'):
+            entries, deleted, unchanged = _diff_manifest(manifest, entries)
+        if not entries and not deleted:
+            stats_util.log("没有新增、修改或删除的文件，未生成增量压缩包")
+            return []
+        archive_name = f"{base_name}_delta{len(manifest['chain'])}"
+        stats_util.log(f"增量压缩: {len(entries)} 个新增或修改的文件, {len(deleted)} 个删除的文件, {len(unchanged)} 个未变化的文件")
+
+    if auto:
+        with stats_util.stage('auto_tune'):
+            codec, level = auto_tune(entries, target_speed, target_size, adaptive)
+        compression = CODECS[codec]
+
+    # 断点续传: 每写完一个分卷记录一个检查点（该分卷之前已写完的成员），只有分卷时才有检查点
     try:
-        # 先压缩成单个临时文件
-        with pyzipper.AESZipFile(temp_zip, 'w', compression=pyzipper.ZIP_DEFLATED) as zip_file:
-            if password:
-                zip_file.setpassword(password.encode())
-                zip_file.setencryption(pyzipper.WZ_AES, nbits=256)
-                # print(f"已设置AES-256加密密码: {password}")
-
-            total_files = sum(len(files) for _, _, files in os.walk(input_path))
-            with tqdm(total=total_files, desc="压缩进度") as pbar:
-                for root, _, files in os.walk(input_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(file_path, input_path)
-                        zip_file.write(file_path, rel_path)
-                        pbar.update(1)
+        journal = journal_util.Journal.open(
+            journal_util.journal_path(output_dir, archive_name), 'compress',
+            {'input': os.path.abspath(input_path), 'archive': archive_name, 'chunk_size': chunk_size},
+            secrets=[password, crypto], resume=resume)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+    done_members = [member for record in journal.records for member in record['members']]
+    pending_members = []
+
+    def on_volume(volume_count):
+        journal.append({'volume': volume_count, 'members': pending_members[:]})
+        pending_members.clear()
+
+    writer = VolumeWriter(output_dir, archive_name, chunk_size, crypto, on_volume=on_volume if chunk_size else None)
+
+    try:
+        digests = {}
+        solid_files = {}
+        if done_members:
+            writer.resume(done_members[-1]['end'])
+            for member in done_members:
+                digests.update(member['digests'])
+                for arcname, offset, length in member['layout'] or ():
+                    solid_files[arcname] = [member['zinfo']['filename'], offset, length]
+            block_numbers = [int(block_name[len(SOLID_PREFIX) + len('block'):]) for block_name, _, _ in solid_files.values()]
+            # entries 保持完整（增量清单需要包括续传前已写完的文件），只为剩下的文件安排压缩任务
+            pending = [entry for entry in entries if entry[1].replace(os.sep, '/') not in digests]
+            jobs = _plan_jobs(pending, solid, max(block_numbers, default=-1) + 1)
+            stats_util.log(f"续传: 跳过已完成的 {len(digests)} 个文件（{len(writer.volume_paths)} 个分卷），从偏移 {writer.tell()} 处继续")
+        else:
+            # 上次中断的任务写出的分卷（包括日志中没有记录的、写到一半的最后一个分卷）和更早的旧分卷一起删除
+            if journal.discarded:
+                stats_util.log(f"上次中断的任务已写完 {len(journal.discarded)} 个分卷，未使用 --resume，重新开始")
+            removed = _remove_stale_volumes(output_dir, archive_name)
+            if removed:
+                stats_util.log(f"删除 {archive_name} 的 {removed} 个旧分卷")
+            pending = entries
+            jobs = _plan_jobs(entries, solid)
+        with stats_util.stage('compress'):
+            with pyzipper.AESZipFile(writer, 'w', compression=compression, compresslevel=level) as zip_file:
+                if password:
+                    zip_file.setpassword(password.encode())
+                    zip_file.setencryption(pyzipper.WZ_AES, nbits=256)
+                    # print(f"已设置AES-256加密密码: {password}")
+
+                # 续传时恢复已写完的成员的中央目录记录
+                for member in done_members:
+                    zinfo = _zinfo_from_dict(zip_file, member['zinfo'])
+                    zip_file.filelist.append(zinfo)
+                    zip_file.NameToInfo[zinfo.filename] = zinfo
+
+                with stats_util.progress(len(pending), "压缩进度") as pbar:
+                    def on_done(job, zinfo, member_digests, layout):
+                        digests.update(member_digests)
+                        for arcname, offset, length in layout or ():
+                            solid_files[arcname] = [zinfo.filename, offset, length]
+                        pending_members.append({'zinfo': _zinfo_to_dict(zinfo), 'digests': member_digests,
+                                                'layout': layout, 'end': writer.tell()})
+                        pbar.update(len(job[0]))
+
+                    if workers > 1 and not _can_append(zip_file):
+                        stats_util.log(f"警告: 当前的 pyzipper {getattr(pyzipper, '__version__', '')} 不支持并行压缩"
+                                       "（版本见 requirements.txt），改为单进程压缩")
+                        workers = 1
+                    if workers > 1:
+                        _compress_parallel(zip_file, jobs, password, workers, output_dir, on_done, adaptive)
+                    else:
+                        for job in jobs:
+                            on_done(job, *_write_job(zip_file, job, adaptive))
+                bytes_read = sum(zinfo.file_size for zinfo in zip_file.filelist)
+                if solid_files:
+                    zip_file.writestr(SOLID_INDEX_NAME, json.dumps({'version': SOLID_VERSION, 'files': solid_files},
+                                                                   ensure_ascii=False))
+                if deleted:
+                    zip_file.writestr(TOMBSTONE_NAME, json.dumps(deleted, ensure_ascii=False))
+            writer.close()
+        stats_util.add('compress', bytes_in=bytes_read, bytes_out=writer.disk_bytes, files=len(pending))
+        if adaptive and not stats_util.is_quiet():
+            _report_policy(zip_file.filelist)
+
+        if incremental:
+            files = dict(unchanged)
+            for _, rel_path, size, mtime_ns, _ in entries:
+                arcname = rel_path.replace(os.sep, '/')
+                files[arcname] = [size, mtime_ns, digests[arcname]]
+            chain = manifest['chain'] + [archive_name] if manifest else [archive_name]
+            _save_manifest(manifest_path, {'version': MANIFEST_VERSION, 'chain': chain, 'files': files})
+        _write_digest(output_dir, archive_name, writer, zip_file, digests, password, crypto)
 
         if chunk_size:
-            # 分割压缩文件
-            zip_counter = 1
-            with open(temp_zip, 'rb') as f:
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    part_name = f"{base_name}_part{zip_counter}.zip"
-                    part_path = os.path.join(output_dir, part_name)
-                    with open(part_path, 'wb') as part_file:
-                        part_file.write(chunk)
-                    zip_counter += 1
-            os.remove(temp_zip)  # 删除临时文件
-            print(f"压缩完成，共生成 {zip_counter-1} 个分卷文件; 输出路径: {os.path.abspath(output_dir)}")
-
-            # 合并分卷文件(这里用于测试)
-            # merge_chunks(output_dir, base_name, password)
+            stats_util.log(f"压缩完成，共生成 {len(writer.volume_paths)} 个分卷文件; 输出路径: {os.path.abspath(output_dir)}")
+        else:
+            stats_util.log(f"压缩完成，生成单个压缩文件; 输出路径: {os.path.abspath(writer.volume_paths[0])}")
+        # 单遍流水线: 写入量即最终产物大小，峰值磁盘占用也不超过最终产物大小
+        stats_util.log(f"I/O 统计: 读取源文件 {bytes_read} 字节, 写入磁盘 {writer.disk_bytes} 字节, 峰值磁盘占用 {writer.disk_bytes} 字节")
+        journal.finish()
+        return writer.volume_paths
+
+    except Exception as e:
+        # 已有检查点时保留已写完的分卷，可以用 --resume 续传
+        writer.abort(keep=journal.checkpointed)
+        if journal.checkpointed:
+            journal.close()
+            print(f"压缩过程中出错: {str(e)}（已完成的分卷已保留，修复问题后加上 --resume 重新运行即可续传）")
+        else:
+            journal.finish()
+            print(f"压缩过程中出错: {str(e)}")
+        sys.exit(1)
+
+def _stream_name(name):
+    """把 tar 或文件列表中的路径规整为成员名（去掉开头的 / 和 ./），含 .. 时返回 None"""
+    parts = [part for part in name.replace(os.sep, '/').split('/') if part not in ('', '.')]
+    if not parts or '..' in parts:
+        return None
+    return '/'.join(parts)
+
+
+def tar_members(stream):
+    """从 tar 数据流（例如标准输入，也可以是 gzip/bzip2/xz 压缩的 tar）中依次取出普通文件
+
+    产生 (成员名, (大小, 修改时间 ns, 权限), 可读流)，只顺序读一遍，不需要定位；目录跳过，链接等特殊文件跳过并提示。
+    """
+    with tarfile.open(fileobj=stream, mode='r|*') as tar:
+        for member in tar:
+            name = _stream_name(member.name)
+            if not member.isfile() or name is None:
+                if not member.isdir():
+                    stats_util.log(f"警告: 跳过 tar 中的非普通文件: {member.name}")
+                continue
+            yield name, (member.size, int(member.mtime * 1000000000), stat.S_IFREG | member.mode), tar.extractfile(member)
+
+
+def list_members(lines):
+    """按文件列表（每行一个相对路径，例如 find 或 git ls-files 的输出）依次产生成员，列出的目录整个加入"""
+    for line in lines:
+        path = line.rstrip('\r\n')
+        if not path:
+            continue
+        if os.path.isabs(path) or _stream_name(path) is None:
+            raise ValueError(f"文件列表中的路径必须是不含 .. 的相对路径: {path}")
+        if os.path.isdir(path):
+            for file_path, rel_path, size, mtime_ns, mode in scan_tree(path):
+                yield _stream_name(os.path.join(path, rel_path)), (size, mtime_ns, mode), open(file_path, 'rb')
         else:
-            # 重命名为最终文件名
-            final_zip = os.path.join(output_dir, f"{base_name}.zip")
-            os.rename(temp_zip, final_zip)
-            print(f"压缩完成，生成单个压缩文件; 输出路径: {os.path.abspath(final_zip)}")
+            st = os.stat(path)
+            yield _stream_name(path), (st.st_size, st.st_mtime_ns, st.st_mode), open(path, 'rb')
+
+
+def folder_members(input_path, scan_threads=1):
+    """文件夹（或单个文件）中的文件依次作为成员，成员名与 compress_folder 相同"""
+    for file_path, rel_path, size, mtime_ns, mode in scan_tree(input_path, scan_threads):
+        yield rel_path.replace(os.sep, '/'), (size, mtime_ns, mode), open(file_path, 'rb')
+
+
+# 此函数用于流式压缩（管道模式）: 成员依次来自 tar 数据流、文件列表或文件夹，压缩（可选加密、分卷）后
+# 写到输出目录、标准输出（StreamSink）或其他分卷输出（例如 CommandSink），源数据只顺序读一遍，
+# 不写本地临时文件，内存占用与数据量无关（约为一个加密分段加上压缩缓冲区）。
+# 为了能用 decompress_stream 流式解压，成员不使用直接存储（已压缩的数据改用 deflate 级别 0）；
+# 不支持固实、增量、并行和断点续传。
+# 参数:
+# members: (成员名, (大小, 修改时间 ns, 权限), 可读流) 的可迭代对象，见 tar_members、list_members、folder_members。
+# output_dir: 输出目录，sink 为 None 时使用。
+# archive_name: 压缩包（分卷）的名字，可选参数，默认为 stream。
+# sink: 分卷输出，可选参数，见 VolumeWriter；写到 StreamSink 时不能分卷，也不输出摘要清单。
+# chunk_size、password、crypto、codec、level、adaptive: 与 compress_folder 相同（codec 不支持 lzma）。
+def compress_stream(members, output_dir=None, archive_name='stream', sink=None, chunk_size=None, password=None,
+                    crypto=None, codec='deflate', level=None, adaptive=True):
+    """流式压缩，返回分卷路径（写到 sink 时为分卷文件名）列表"""
+    try:
+        if codec == 'lzma':
+            raise ValueError("流式模式不支持 lzma（流式解压时无法找到成员数据的结尾），请使用 deflate 或 bzip2")
+        compression = check_codec(codec, level)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+
+    if sink is None and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    if sink is None:
+        _remove_stale_volumes(output_dir, archive_name)
+    writer = VolumeWriter(output_dir, archive_name, chunk_size, crypto, sink=sink)
+    try:
+        digests = {}
+        bytes_read = 0
+        with stats_util.stage('compress'):
+            with pyzipper.AESZipFile(writer, 'w', compression=compression, compresslevel=level) as zip_file:
+                if password:
+                    zip_file.setpassword(password.encode())
+                    zip_file.setencryption(pyzipper.WZ_AES, nbits=256)
+                with stats_util.progress(None, "压缩进度") as pbar:
+                    for arcname, meta, src in members:
+                        with src:
+                            zinfo, digests[arcname] = _write_stream(zip_file, src, arcname, meta, adaptive, streamable=True)
+                        bytes_read += zinfo.file_size
+                        pbar.update(1)
+            writer.close()
+        stats_util.add('compress', bytes_in=bytes_read, bytes_out=writer.disk_bytes, files=len(digests))
+        if not isinstance(sink, StreamSink):
+            _write_digest(output_dir, archive_name, writer, zip_file, digests, password, crypto)
+        stats_util.log(f"流式压缩完成: {len(digests)} 个文件, 读取 {bytes_read} 字节, "
+                       f"输出 {len(writer.volume_paths)} 个分卷共 {writer.disk_bytes} 字节")
+        return writer.volume_paths
 
     except Exception as e:
-        if os.path.exists(temp_zip):
-            os.remove(temp_zip)
+        writer.abort()
         print(f"压缩过程中出错: {str(e)}")
         sys.exit(1)
 
-# 此函数用于解压指定的文件夹，支持自动处理分卷文件（先合并）。
+
+@contextmanager
+def _open_archive(paths, password=None, crypto=None):
+    """打开压缩包（单个文件或一组按顺序排列的分卷），退出时一并关闭分卷读取流
+
+    crypto 不为空时 paths 为分段加密的 .enc 文件，读取时只按需解密用到的分段。
+    """
+    if crypto:
+        source = open_volumes(paths, opener=lambda path: SegmentReader(path, crypto),
+                              sizes=[segment_plain_size(path) for path in paths])
+    else:
+        source = paths[0] if len(paths) == 1 else open_volumes(paths)
+    try:
+        with pyzipper.AESZipFile(source) as zip_file:
+            if password:
+                zip_file.setpassword(password.encode())
+            yield zip_file
+    finally:
+        if source is not paths[0]:
+            source.close()
+
+
+def _volume_reader(zip_file):
+    """返回压缩包底层的多分卷读取流（直接打开的单个文件时为 None）"""
+    fp = zip_file.fp
+    if isinstance(fp, io.BufferedReader) and isinstance(fp.raw, MultiVolumeReader):
+        return fp.raw
+    return None
+
+
+def _member_target(output_dir, filename):
+    """计算成员解压后的路径（与 zipfile 解压时对路径的清理规则一致）"""
+    arcname = filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_path_parts = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in invalid_path_parts)
+    if os.path.sep == '\\':
+        arcname = pyzipper.AESZipFile._sanitize_windows_name(arcname, os.path.sep)
+    return os.path.join(output_dir, arcname)
+
+
+def _member_target_dir(output_dir, filename):
+    """计算成员解压后所在的目录"""
+    target = _member_target(output_dir, filename)
+    return target if filename.endswith('/') else os.path.dirname(target)
+
+
+def _solid_blocks(zip_file):
+    """读取固实块索引，返回 {块名: [(块内偏移, 长度, arcname), ...]}（按偏移排序）；没有固实块时返回 {}"""
+    if SOLID_INDEX_NAME not in zip_file.NameToInfo:
+        return {}
+    index = json.loads(zip_file.read(SOLID_INDEX_NAME).decode('utf-8'))
+    if index.get('version', 1) > SOLID_VERSION:
+        raise ValueError(f"不支持的固实索引版本: {index['version']}")
+    blocks = {}
+    for arcname, (block_name, offset, length) in index['files'].items():
+        blocks.setdefault(block_name, []).append((offset, length, arcname))
+    for files in blocks.values():
+        files.sort()
+    return blocks
+
+
+def _extract_block(zip_file, block_name, files, output_dir):
+    """顺序解压一个固实块，把其中的 files（[(块内偏移, 长度, arcname)]，按偏移排序）写到各自的位置"""
+    with zip_file.open(block_name) as src:
+        pos = 0
+        for offset, length, arcname in files:
+            # 跳过不需要的部分（只解压部分文件时）
+            while pos < offset:
+                skipped = len(src.read(min(offset - pos, COPY_BUFFER_SIZE)))
+                if not skipped:
+                    raise ValueError(f"固实块 {block_name} 长度不足")
+                pos += skipped
+            data = src.read(length)
+            if len(data) != length:
+                raise ValueError(f"固实块 {block_name} 长度不足")
+            target = _member_target(output_dir, arcname)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            pos += length
+
+
+def _archive_members(zip_file):
+    """返回 (需要解压的普通成员 ZipInfo 列表（含固实块本身）, 固实块索引)，排除删除记录和固实索引"""
+    blocks = _solid_blocks(zip_file)
+    infos = [zinfo for zinfo in zip_file.infolist() if zinfo.filename not in (TOMBSTONE_NAME, SOLID_INDEX_NAME)]
+    return infos, blocks
+
+
+# 解压的断点续传: 每解压 EXTRACT_CHECKPOINT_FILES 个文件把它们的名字记入任务日志，每个压缩包解压完再记一条完成记录。
+# 解压出的文件不逐个 fsync（大量小文件时代价太高），续传时只跳过日志中有记录并且输出文件大小一致的成员。
+EXTRACT_CHECKPOINT_FILES = 256
+
+
+class _ExtractCheckpoints:
+    """解压的检查点（并行解压时每个工作进程各自追加到同一个任务日志）"""
+
+    def __init__(self, journal, archive):
+        self.journal = journal
+        self.archive = archive
+        self._names = []
+
+    def add(self, name):
+        self._names.append(name)
+        if len(self._names) >= EXTRACT_CHECKPOINT_FILES:
+            self.flush()
+
+    def flush(self):
+        if self._names:
+            self.journal.append({'archive': self.archive, 'members': self._names})
+            self._names = []
+
+
+def _pending_members(infos, blocks, done, output_dir):
+    """续传时去掉已经解压过的成员（日志中有记录并且输出文件大小一致），返回剩余的 (infos, blocks)"""
+    if not done:
+        return infos, blocks
+
+    def extracted(name, size):
+        target = _member_target(output_dir, name)
+        return name in done and os.path.isfile(target) and os.path.getsize(target) == size
+
+    pending_blocks = {}
+    for block_name, files in blocks.items():
+        files = [entry for entry in files if not extracted(entry[2], entry[1])]
+        if files:
+            pending_blocks[block_name] = files
+    infos = [zinfo for zinfo in infos if zinfo.filename in pending_blocks or
+             (zinfo.filename not in blocks and not (not zinfo.is_dir() and extracted(zinfo.filename, zinfo.file_size)))]
+    return infos, pending_blocks
+
+
+def _extract_members(task):
+    """在工作进程中用自己的文件句柄解压分配到的成员（含固实块），返回该进程的吞吐统计"""
+    worker_id, paths, names, output_dir, password, crypto, blocks, journal_path = task
+    start = time.perf_counter()
+    total_bytes = 0
+    files = 0
+    journal = journal_util.Journal(journal_path)
+    checkpoints = _ExtractCheckpoints(journal, os.path.basename(paths[0]))
+    try:
+        with _open_archive(paths, password, crypto) as zip_file:
+            for name in names:
+                zinfo = zip_file.getinfo(name)
+                if name in blocks:
+                    _extract_block(zip_file, name, blocks[name], output_dir)
+                    files += len(blocks[name])
+                    for _, _, arcname in blocks[name]:
+                        checkpoints.add(arcname)
+                else:
+                    zip_file.extract(zinfo, output_dir)
+                    files += 1
+                    checkpoints.add(name)
+                total_bytes += zinfo.file_size
+    finally:
+        checkpoints.flush()
+        journal.close()
+    return worker_id, files, total_bytes, time.perf_counter() - start
+
+
+def _extract_parallel(paths, output_dir, password, crypto, workers, infos, blocks, journal):
+    """多进程并行解压: 先建好所有目录，再按压缩后大小把成员均衡分给各进程"""
+    # 预先创建所有目录，避免各进程同时创建同一个目录时发生竞争
+    names = [zinfo.filename for zinfo in infos if zinfo.filename not in blocks]
+    names += [arcname for files in blocks.values() for _, _, arcname in files]
+    for target_dir in {_member_target_dir(output_dir, name) for name in names}:
+        os.makedirs(target_dir, exist_ok=True)
+
+    # 从大到小依次分给当前负载最小的进程
+    buckets = [(0, i, []) for i in range(workers)]
+    for zinfo in sorted((z for z in infos if not z.is_dir()), key=lambda z: z.compress_size, reverse=True):
+        load, i, names = heapq.heappop(buckets)
+        names.append(zinfo.filename)
+        heapq.heappush(buckets, (load + zinfo.compress_size, i, names))
+
+    tasks = [(i, paths, names, output_dir, password, crypto, {name: blocks[name] for name in names if name in blocks},
+              journal.path)
+             for _, i, names in sorted(buckets, key=lambda b: b[1]) if names]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_extract_members, tasks))
+
+    for worker_id, files, total_bytes, seconds in results:
+        speed = total_bytes / 1024 / 1024 / seconds if seconds > 0 else 0
+        stats_util.log(f"解压进程 {worker_id}: {files} 个文件, {total_bytes} 字节, 用时 {seconds:.2f} 秒, {speed:.2f} MB/s")
+
+
+# 压缩包文件名: <名称>[_deltaN][_partX].zip（加密后再加 .enc）
+ARCHIVE_NAME_RE = re.compile(r'^(?P<base>.+?)(?:_delta(?P<delta>\d+))?(?:_part(?P<part>\d+))?\.zip$')
+
+
+def _digest_volumes(input_dir, archive_name, suffix):
+    """按摘要清单中的分卷列表返回分卷路径（不按文件名查找，目录中多出的旧分卷不会混进分卷集）
+
+    没有摘要清单，或清单中的分卷不是 suffix 格式（例如清单记录的是 .enc 分卷，而这里要找解密后的 .zip）时返回 None。
+    """
+    digest_path = _digest_path(input_dir, archive_name)
+    if not os.path.exists(digest_path):
+        return None
+    with open(digest_path, 'r', encoding='utf-8') as f:
+        names = [volume['name'] for volume in json.load(f)['volumes']]
+    if not names or not all(name.endswith(suffix) and os.path.basename(name) == name for name in names):
+        return None
+    paths = [os.path.join(input_dir, name) for name in names]
+    missing = [name for name, path in zip(names, paths) if not os.path.exists(path)]
+    if missing:
+        raise ValueError(f"摘要清单中的分卷不存在: {', '.join(missing)}")
+    return paths
+
+
+def find_archives(input_dir, suffix='.zip'):
+    """在目录中查找压缩包，返回按回放顺序（完整包在前，增量包按序号在后）排列的分卷路径列表的列表"""
+    archives = {}
+    for filename in os.listdir(input_dir):
+        if not filename.endswith(suffix):
+            continue
+        match = ARCHIVE_NAME_RE.match(filename[:len(filename) - len(suffix)] + '.zip')
+        if not match:
+            continue
+        delta = int(match.group('delta')) if match.group('delta') else 0
+        name = f"{match.group('base')}_delta{delta}" if delta else match.group('base')
+        archives[(match.group('base'), delta)] = (name, match.group('part') is not None)
+
+    result = []
+    for key in sorted(archives):
+        name, is_chunked = archives[key]
+        paths = _digest_volumes(input_dir, name, suffix)
+        if paths is None:
+            paths = find_volumes(input_dir, name, suffix) if is_chunked else [os.path.join(input_dir, f"{name}{suffix}")]
+        if not paths:
+            raise ValueError(f"未找到任何分卷文件: {name}_part*{suffix}")
+        result.append(paths)
+    return result
+
+
+def _extract_archive(paths, output_dir, password, crypto, workers, journal):
+    """解压一个压缩包；若是增量包，先删除其中记录为已删除的文件。续传时跳过任务日志中已完成的部分
+
+    crypto 不为空时 paths 为分段加密的 .enc 分卷，边读边解密，解密后的分卷不落盘。
+    """
+    archive = os.path.basename(paths[0])
+    records = [record for record in journal.records if record.get('archive') == archive]
+    if any(record.get('done') for record in records):
+        stats_util.log(f"续传: 跳过已解压的 {archive}")
+        return
+    done = {name for record in records for name in record.get('members', ())}
+
+    with stats_util.stage('extract'):
+        with _open_archive(paths, password, crypto) as zip_file:
+            if TOMBSTONE_NAME in zip_file.NameToInfo:
+                for name in json.loads(zip_file.read(TOMBSTONE_NAME).decode('utf-8')):
+                    target = _member_target(output_dir, name)
+                    if os.path.isfile(target):
+                        os.remove(target)
+            infos, blocks = _pending_members(*_archive_members(zip_file), done, output_dir)
+            if done:
+                stats_util.log(f"续传: {archive} 已解压 {len(done)} 个文件")
+            stats_util.add('extract', bytes_in=sum(z.compress_size for z in infos), bytes_out=sum(z.file_size for z in infos),
+                           files=len(infos) - len(blocks) + sum(len(files) for files in blocks.values()))
+            if workers <= 1:
+                checkpoints = _ExtractCheckpoints(journal, archive)
+                for zinfo in infos:
+                    if zinfo.filename in blocks:
+                        _extract_block(zip_file, zinfo.filename, blocks[zinfo.filename], output_dir)
+                        for _, _, arcname in blocks[zinfo.filename]:
+                            checkpoints.add(arcname)
+                    else:
+                        zip_file.extract(zinfo, output_dir)
+                        checkpoints.add(zinfo.filename)
+                checkpoints.flush()
+        if workers > 1:
+            _extract_parallel(paths, output_dir, password, crypto, workers, infos, blocks, journal)
+    journal.append({'archive': archive, 'done': True})
+
+
+def _match_member(name, patterns):
+    """成员名是否匹配: 与某个模式相同、符合通配符，或位于以某个模式为路径的目录下"""
+    for pattern in patterns:
+        pattern = pattern.replace('\\', '/')
+        if name == pattern or fnmatch.fnmatchcase(name, pattern) or name.startswith(pattern.rstrip('/') + '/'):
+            return True
+    return False
+
+
+def _extract_matching(paths, output_dir, patterns, password, crypto):
+    """只解压一个压缩包中匹配的成员，返回解压的文件数"""
+    with stats_util.stage('extract'), _open_archive(paths, password, crypto) as zip_file:
+        if TOMBSTONE_NAME in zip_file.NameToInfo:
+            for name in json.loads(zip_file.read(TOMBSTONE_NAME).decode('utf-8')):
+                target = _member_target(output_dir, name)
+                if _match_member(name, patterns) and os.path.isfile(target):
+                    os.remove(target)
+        infos, blocks = _archive_members(zip_file)
+
+        selected = [z for z in infos if z.filename not in blocks and _match_member(z.filename, patterns)]
+        for zinfo in selected:
+            zip_file.extract(zinfo, output_dir)
+        files = len(selected)
+        bytes_out = sum(z.file_size for z in selected)
+        for block_name, block_files in blocks.items():
+            wanted = [entry for entry in block_files if _match_member(entry[2], patterns)]
+            if wanted:
+                _extract_block(zip_file, block_name, wanted, output_dir)
+                files += len(wanted)
+                bytes_out += sum(entry[1] for entry in wanted)
+        stats_util.add('extract', bytes_out=bytes_out, files=files)
+
+        reader = _volume_reader(zip_file)
+        if reader is not None:
+            stats_util.log(f"{os.path.basename(paths[0])}: 匹配 {files} 个文件, 读取了 {len(reader.opened)}/{len(paths)} 个分卷")
+    return files
+
+
+def _list_archive(paths, password, crypto):
+    """列出一个压缩包的成员（只读取中央目录；给出解压密码时展开固实块并列出删除记录）"""
+    entries = []
+    archive = os.path.basename(paths[0])
+    with _open_archive(paths, password, crypto) as zip_file:
+        reader = _volume_reader(zip_file)
+
+        def volume_of(zinfo):
+            return reader.volume_of(zinfo.header_offset) + 1 if reader is not None else 1
+
+        try:
+            blocks = _solid_blocks(zip_file) if password or SOLID_INDEX_NAME not in zip_file.NameToInfo else {}
+            deleted = json.loads(zip_file.read(TOMBSTONE_NAME).decode('utf-8')) \
+                if password and TOMBSTONE_NAME in zip_file.NameToInfo else []
+        except RuntimeError:
+            # 没有给出解压密码时读不了加密的固实索引和删除记录，只列出原始成员
+            blocks, deleted = {}, []
+        hidden = {TOMBSTONE_NAME, SOLID_INDEX_NAME} if blocks or deleted or password else set()
+
+        for zinfo in zip_file.infolist():
+            if zinfo.filename in hidden:
+                continue
+            if zinfo.filename in blocks:
+                for offset, length, arcname in blocks[zinfo.filename]:
+                    entries.append({'archive': archive, 'name': arcname, 'size': length, 'compress_size': None,
+                                    'crc': None, 'volume': volume_of(zinfo), 'block': zinfo.filename})
+                continue
+            # AES 加密（AE-2）的成员不保存 CRC，由认证码校验
+            crc = None if zinfo.flag_bits & 0x1 and not zinfo.CRC else f"{zinfo.CRC:08x}"
+            entries.append({'archive': archive, 'name': zinfo.filename, 'size': zinfo.file_size,
+                            'compress_size': zinfo.compress_size, 'crc': crc, 'volume': volume_of(zinfo)})
+        for name in deleted:
+            entries.append({'archive': archive, 'name': name, 'deleted': True})
+    return entries
+
+
+# 此函数用于列出（分卷、加密的）压缩包中的内容: 只读取最后的分卷中的中央目录（加密时只解密这部分分段），
+# 不解压、不合并，耗时与压缩包大小无关。
+# 参数:
+# input_path: 压缩包文件，或包含分卷/增量包链的文件夹（加密时为其中的 .enc 文件）。
+# password: 解压密码，可选参数；给出时固实块会展开为其中的文件，增量包的删除记录也会列出。
+# crypto: 分段加密的解密密码，可选参数。
+# as_json: 是否以 JSON 格式输出，可选参数，默认为 False。
+def list_archive(input_path, password=None, crypto=None, as_json=False):
+    """列出压缩包中的成员"""
+    if not os.path.exists(input_path):
+        print(f"错误: 输入路径不存在: {input_path}")
+        sys.exit(1)
+
+    try:
+        suffix = '.zip.enc' if crypto else '.zip'
+        archives = find_archives(input_path, suffix) if os.path.isdir(input_path) else [[input_path]]
+        if not archives:
+            print(f"错误: 目录中没有压缩包: {input_path}")
+            sys.exit(1)
+        entries = []
+        with stats_util.stage('list'):
+            for paths in archives:
+                entries += _list_archive(paths, password, crypto)
+        stats_util.add('list', files=len(entries))
+    except Exception as e:
+        print(f"列出压缩包内容时出错: {str(e)}")
+        sys.exit(1)
+
+    if as_json:
+        print(json.dumps(entries, ensure_ascii=False, indent=2))
+        return entries
+    for entry in entries:
+        if entry.get('deleted'):
+            print(f"{entry['archive']}: {entry['name']}  (已删除)")
+        elif 'block' in entry:
+            print(f"{entry['archive']}: {entry['name']}  {entry['size']} 字节  固实块 {entry['block']}  分卷 {entry['volume']}")
+        else:
+            print(f"{entry['archive']}: {entry['name']}  {entry['size']} 字节  压缩后 {entry['compress_size']} 字节  "
+                  f"CRC {entry['crc'] or '-'}  分卷 {entry['volume']}")
+    return entries
+
+
+def _check_digest_mac(digest, password, crypto):
+    """校验摘要清单的 HMAC，返回 True（通过）、False（不匹配）或 None（清单没有签名或没有给出对应的密码）"""
+    mac = digest.get('mac')
+    secret = (crypto if mac['key'] == 'crypto' else password) if mac else None
+    if not secret:
+        return None
+    expected = digest_mac(secret, bytes.fromhex(mac['salt']), mac['iterations'], _digest_body(digest))
+    return hmac.compare_digest(expected, mac['hmac_sha256'])
+
+
+def _check_volume(item):
+    """校验一个分卷的大小和 SHA-256，返回错误信息，通过时返回 None"""
+    path, volume = item
+    if not os.path.exists(path):
+        return f"{volume['name']}: 分卷不存在"
+    size = os.path.getsize(path)
+    if size != volume['size']:
+        return f"{volume['name']}: 大小不符（应为 {volume['size']} 字节，实际为 {size} 字节）"
+    if _file_digest(path) != volume['sha256']:
+        return f"{volume['name']}: SHA-256 不匹配，分卷已损坏或被修改"
+    return None
+
+
+# 此函数用于校验压缩时生成的分卷集: 按摘要清单多线程并行计算每个分卷的 SHA-256，只读取分卷，不解压也不解密，
+# 速度取决于磁盘的读取速度。给出密码时同时校验清单的签名（HMAC）。
+# 参数:
+# input_path: 包含分卷和摘要清单（<名称>.digest.json）的文件夹，或一个摘要清单文件。
+# password: 压缩密码，可选参数；清单用压缩密码签名时用于校验签名。
+# crypto: 分段加密的密码，可选参数；用于校验清单签名，文件夹中没有摘要清单时改为校验各 .enc 文件每一段的认证标签。
+# workers: 并行计算哈希的线程数，可选参数，默认为 1。
+def verify_archive(input_path, password=None, crypto=None, workers=1):
+    """校验分卷集的完整性，全部通过时返回 True"""
+    if not os.path.exists(input_path):
+        print(f"错误: 输入路径不存在: {input_path}")
+        sys.exit(1)
+
+    if os.path.isdir(input_path):
+        input_dir = input_path
+        digest_paths = sorted(os.path.join(input_path, name) for name in os.listdir(input_path)
+                              if name.endswith(DIGEST_SUFFIX))
+    else:
+        input_dir = os.path.dirname(input_path)
+        digest_paths = [input_path]
+
+    if not digest_paths:
+        # 没有摘要清单（例如单独加密的文件）: 分段格式的 GCM 认证标签本身就能发现损坏和篡改
+        enc_paths = sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir) if name.endswith('.enc'))
+        if not crypto or not enc_paths:
+            print(f"错误: 没有找到摘要清单(*{DIGEST_SUFFIX})，校验 .enc 文件的认证标签需要给出加密密码")
+            sys.exit(1)
+        stats_util.log(f"没有找到摘要清单，校验 {len(enc_paths)} 个 .enc 文件的认证标签")
+        if not verify_files(enc_paths, crypto, workers):
+            return False
+        stats_util.log(f"校验通过: {len(enc_paths)} 个文件")
+        return True
+
+    failures = []
+    volumes = []
+    try:
+        for digest_path in digest_paths:
+            with open(digest_path, 'r', encoding='utf-8') as f:
+                digest = json.load(f)
+            if digest.get('version') != DIGEST_VERSION:
+                raise ValueError(f"不支持的摘要清单版本: {digest.get('version')}")
+            name = os.path.basename(digest_path)
+            signed = _check_digest_mac(digest, password, crypto)
+            if signed is False:
+                failures.append(f"{name}: 清单签名不匹配（密码错误或清单被篡改）")
+            elif signed is None:
+                reason = "没有给出对应的密码" if digest.get('mac') else "清单没有签名"
+                stats_util.log(f"警告: {name} {reason}，只校验摘要（能发现损坏，不能发现篡改）")
+            volumes += [(os.path.join(input_dir, volume['name']), volume) for volume in digest['volumes']]
+            # 目录中多出的同名分卷（例如被中断的旧任务留下的）会被按文件名查找分卷的工具接进分卷集
+            listed = {volume['name'] for volume in digest['volumes']}
+            extra = [filename for filename in _volume_files(input_dir, digest['archive']) if filename not in listed]
+            if extra:
+                failures.append(f"{name}: 目录中有清单之外的分卷 {', '.join(extra)}")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"读取摘要清单时出错: {str(e)}")
+        sys.exit(1)
+
+    with stats_util.stage('verify'):
+        with stats_util.progress(len(volumes), "校验进度") as pbar, \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # hashlib 和文件读取都会释放 GIL，多线程即可并行
+            for error in executor.map(_check_volume, volumes):
+                if error:
+                    failures.append(error)
+                pbar.update(1)
+    stats_util.add('verify', bytes_in=sum(volume['size'] for _, volume in volumes), files=len(volumes))
+
+    for failure in failures:
+        print(f"校验失败: {failure}")
+    if failures:
+        return False
+    stats_util.log(f"校验通过: {len(digest_paths)} 个摘要清单, {len(volumes)} 个分卷")
+    return True
+
+
+# 此函数用于从（分卷、加密的）压缩包中只取出匹配的成员: 先读压缩包末尾的中央目录，
+# 再只读取（加密时只解密）这些成员所在的分卷和分段，不需要先解密、合并整个分卷集。
+# 参数:
+# input_path: 压缩包文件，或包含分卷/增量包链的文件夹（加密时为其中的 .enc 文件）。
+# output_dir: 输出目录路径。
+# patterns: 成员路径、通配符（如 *.log）或目录（如 docs/）的列表。
+# password: 解压密码，可选参数，默认为 None。
+# crypto: 分段加密的解密密码，可选参数，默认为 None；旧 CBC 格式不支持随机访问，需要先完整解密。
+def extract_members(input_path, output_dir, patterns, password=None, crypto=None):
+    """从压缩包中只解压匹配的成员"""
+    if not os.path.exists(input_path):
+        print(f"错误: 输入路径不存在: {input_path}")
+        sys.exit(1)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    try:
+        suffix = '.zip.enc' if crypto else '.zip'
+        archives = find_archives(input_path, suffix) if os.path.isdir(input_path) else [[input_path]]
+        if not archives:
+            print(f"错误: 目录中没有压缩包: {input_path}")
+            sys.exit(1)
+
+        # 增量包链按顺序回放，后面的包中的新版本覆盖前面的
+        files = 0
+        for paths in archives:
+            files += _extract_matching(paths, output_dir, patterns, password, crypto)
+        if not files:
+            print(f"错误: 没有匹配的成员: {' '.join(patterns)}")
+            sys.exit(1)
+
+        stats_util.log(f"解压完成，共 {files} 个文件，输出路径: {os.path.abspath(output_dir)}")
+        return output_dir
+
+    except Exception as e:
+        print(f"解压缩过程中出错: {str(e)}")
+        sys.exit(1)
+
+
+# 此函数用于解压指定的文件夹，支持自动处理分卷文件（通过多分卷虚拟读取流直接解压，不生成合并文件）。
+# 若文件夹中有增量压缩包链（<名称>、<名称>_delta1、<名称>_delta2 ...），按顺序依次回放。
 # 参数:
 # input_path: 要解密的文件夹的路径。
 # output_dir: 解密文件的输出目录路径。
 # password: 解密文件的密码，可选参数，默认为 None，表示不进行解密。
-def decompress_folder(input_path, output_dir, password=None):
+# workers: 并行解压的进程数，可选参数，默认为 1；大于 1 时每个进程各自打开压缩包（或分卷）并解压分到的成员。
+# resume: 是否断点续传，可选参数，默认为 False；为 True 时跳过上次中断前（输出目录的任务日志中记录的）已解压的文件。
+# crypto: 分段加密的解密密码，可选参数；给出时读取 .zip.enc 分卷，只在内存中按段解密（并校验），不生成解密后的分卷。
+def decompress_folder(input_path, output_dir, password=None, workers=1, resume=False, crypto=None):
     """解密文件夹，自动处理分卷文件"""
     if not os.path.exists(input_path):
         print(f"错误: 输入路径不存在: {input_path}")
@@ -142,36 +1842,239 @@ def decompress_folder(input_path, output_dir, password=None):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    is_chunked = False
-    base_name = None
-    # 检查输入路径是否为文件夹
-    if os.path.isdir(input_path):
-        for filename in os.listdir(input_path):
-            if filename.endswith('.zip') and '_part' in filename:
-                is_chunked = True
-                # 提取基础名称(去掉_partX.zip)
-                base_name = filename.split('_part')[0]
-                break
-
+    journal = None
     try:
-        if is_chunked:
-            # 先合并分卷
-            merged_path = merge_chunks(input_path, base_name, password)
-            input_path = merged_path  # 更新输入路径为合并后的文件
+        # 检查输入路径是否为文件夹；分卷通过多分卷读取流当作一个连续的文件来读，不再在磁盘上合并
+        suffix = '.zip.enc' if crypto else '.zip'
+        archives = find_archives(input_path, suffix) if os.path.isdir(input_path) else [[input_path]]
+        if not archives:
+            print(f"错误: 目录中没有压缩包: {input_path}")
+            sys.exit(1)
 
-        # 解压文件
-        with pyzipper.AESZipFile(input_path) as zip_file:
-            if password:
-                zip_file.setpassword(password.encode())
-            zip_file.extractall(output_dir)
+        journal = journal_util.Journal.open(
+            journal_util.journal_path(output_dir, 'extract'), 'extract',
+            {'archives': [[os.path.abspath(path) for path in paths] for paths in archives]},
+            secrets=[password, crypto] if crypto else [password], resume=resume)
+
+        # 解压文件（增量包链按顺序回放）
+        for paths in archives:
+            _extract_archive(paths, output_dir, password, crypto, workers, journal)
 
-        print(f"解压缩完成，输出路径: {os.path.abspath(output_dir)}")
+        journal.finish()
+        stats_util.log(f"解压缩完成，输出路径: {os.path.abspath(output_dir)}")
         return output_dir
 
+    except Exception as e:
+        if journal is not None and journal.checkpointed:
+            journal.close()
+            print(f"解压缩过程中出错: {str(e)}（加上 --resume 重新运行即可续传）")
+        else:
+            if journal is not None:
+                journal.finish()
+            print(f"解压缩过程中出错: {str(e)}")
+        sys.exit(1)
+
+# 流式解压时每次从数据流读取的字节数
+STREAM_READ_SIZE = 64 * 1024
+
+
+class _PushbackReader:
+    """顺序读取的包装，可以把多读的数据退回（成员数据的结尾只有解压到那里才知道）"""
+
+    def __init__(self, f):
+        self._f = f
+        self._buffer = b''
+
+    def read(self, n):
+        if self._buffer:
+            data, self._buffer = self._buffer[:n], self._buffer[n:]
+            return data
+        return self._f.read(n)
+
+    def read_exact(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = self.read(n - len(data))
+            if not chunk:
+                raise ValueError("数据流意外结束，压缩包不完整")
+            data += chunk
+        return data
+
+    def unread(self, data):
+        self._buffer = data + self._buffer
+
+
+def _stream_decompressor(zinfo):
+    if zinfo.compress_type == pyzipper.ZIP_DEFLATED:
+        return zlib.decompressobj(-15)
+    if zinfo.compress_type == pyzipper.ZIP_BZIP2:
+        return bz2.BZ2Decompressor()
+    raise ValueError(f"流式解压不支持成员 {zinfo.filename} 的压缩方式({zinfo.compress_type})")
+
+
+def _read_local_header(f, signature):
+    """读取一个本地文件头（signature 为已读出的前 4 字节），返回 (zinfo, 是否有 zip64 扩展)"""
+    fields = struct.unpack(pyzipper.zipfile.structFileHeader,
+                           signature + f.read_exact(pyzipper.zipfile.sizeFileHeader - 4))
+    flag_bits, compress_type, _, _, crc, compress_size, file_size, name_length, extra_length = fields[3:]
+    name = f.read_exact(name_length).decode('utf-8' if flag_bits & 0x800 else 'cp437')
+    zinfo = pyzipper.AESZipFile.zipinfo_cls(name)
+    zinfo.flag_bits, zinfo.compress_type, zinfo.CRC = flag_bits, compress_type, crc
+    zinfo.compress_size, zinfo.file_size, zinfo.header_offset = compress_size, file_size, 0
+    zinfo.extra = f.read_exact(extra_length)
+    zinfo._decodeExtra()
+    zip64 = False
+    extra = zinfo.extra
+    while len(extra) >= 4:
+        tp, ln = struct.unpack('<HH', extra[:4])
+        zip64 = zip64 or tp == 0x0001
+        extra = extra[ln + 4:]
+    return zinfo, zip64
+
+
+def _stream_cipher(decrypter):
+    """AESZipDecrypter 内部的 AES-CTR 解密器（pyzipper 中属性名拼写为 decypter），用于按任意长度解密"""
+    cipher = getattr(decrypter, 'decypter', None) or getattr(decrypter, 'decrypter', None)
+    if cipher is None:
+        raise ValueError(f"当前的 pyzipper {getattr(pyzipper, '__version__', '')} 不支持流式解密"
+                         "（版本见 requirements.txt）")
+    return cipher
+
+
+def _extract_stream_member(f, zinfo, password, dest):
+    """从流中读出一个成员的数据，解密、解压后写到 dest，返回 (CRC, 解压后的大小)；之后流位于数据描述符（如有）处
+
+    有数据描述符时本地文件头中没有压缩后的大小，靠解压器发现压缩数据的结尾，多读的部分退回流中；
+    AES 为 CTR 模式，密文与压缩数据一一对应，因此可以按同样的位置截断后计算 HMAC。
+    """
+    decrypter = None
+    if zinfo.flag_bits & 0x1:
+        if not password:
+            raise RuntimeError(f"{zinfo.filename} 已加密，需要解压密码")
+        if getattr(zinfo, 'wz_aes_strength', None) is None:
+            raise ValueError(f"流式解压只支持 AES 加密的成员: {zinfo.filename}")
+        header = f.read_exact(AESZipDecrypter.encryption_header_length(zinfo))
+        decrypter = AESZipDecrypter(zinfo, password.encode(), header)
+
+    crc = 0
+    size = 0
+    if zinfo.flag_bits & 0x8:
+        decompressor = _stream_decompressor(zinfo)
+        cipher = _stream_cipher(decrypter) if decrypter else None
+        while not decompressor.eof:
+            raw = f.read(STREAM_READ_SIZE)
+            if not raw:
+                raise ValueError("数据流意外结束，压缩包不完整")
+            data = cipher.decrypt(raw) if cipher else raw
+            out = decompressor.decompress(data)
+            if decompressor.eof and decompressor.unused_data:
+                used = len(raw) - len(decompressor.unused_data)
+                f.unread(raw[used:])
+                raw = raw[:used]
+            if decrypter:
+                decrypter.hmac.update(raw)
+            crc = zlib.crc32(out, crc)
+            size += len(out)
+            dest.write(out)
+    else:
+        decompressor = None if zinfo.compress_type == pyzipper.ZIP_STORED else _stream_decompressor(zinfo)
+        remaining = zinfo.compress_size
+        if decrypter:
+            remaining -= len(header) + AESZipDecrypter.hmac_size
+        while remaining:
+            raw = f.read(min(STREAM_READ_SIZE, remaining))
+            if not raw:
+                raise ValueError("数据流意外结束，压缩包不完整")
+            remaining -= len(raw)
+            data = decrypter.decrypt(raw) if decrypter else raw
+            out = decompressor.decompress(data) if decompressor else data
+            crc = zlib.crc32(out, crc)
+            size += len(out)
+            dest.write(out)
+    if decrypter:
+        decrypter.check_hmac(f.read_exact(AESZipDecrypter.hmac_size))
+    return crc, size
+
+
+def _extract_stream(f, output_dir, password):
+    """按顺序解压 zip 数据流中的成员（只读本地文件头，不需要中央目录），返回 (文件数, 解压后的字节数)"""
+    f = _PushbackReader(f)
+    files = 0
+    total = 0
+    signature = f.read_exact(4)
+    if signature not in (pyzipper.zipfile.stringFileHeader, pyzipper.zipfile.stringEndArchive):
+        raise ValueError("输入不是 zip 数据流")
+    while signature == pyzipper.zipfile.stringFileHeader:
+        zinfo, zip64 = _read_local_header(f, signature)
+        name = zinfo.filename
+        if name.startswith(SOLID_PREFIX):
+            raise ValueError("固实压缩包不支持流式解压")
+        target = _member_target(output_dir, name)
+        if name == TOMBSTONE_NAME:
+            dest = io.BytesIO()
+            crc, size = _extract_stream_member(f, zinfo, password, dest)
+        elif name.endswith('/'):
+            os.makedirs(target, exist_ok=True)
+            crc, size = _extract_stream_member(f, zinfo, password, io.BytesIO())
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as dest:
+                crc, size = _extract_stream_member(f, zinfo, password, dest)
+            files += 1
+            total += size
+
+        expected_crc, expected_size = zinfo.CRC, zinfo.file_size
+        if zinfo.flag_bits & 0x8:
+            descriptor = f.read_exact(4)
+            if descriptor != b'PK\x07\x08':
+                f.unread(descriptor)
+            fmt = '<LQQ' if zip64 else '<LLL'
+            expected_crc, _, expected_size = struct.unpack(fmt, f.read_exact(struct.calcsize(fmt)))
+        # AE-2 加密的成员不保存 CRC（为 0），由 HMAC 保证完整性
+        if not (zinfo.flag_bits & 0x1 and expected_crc == 0) and crc != expected_crc:
+            raise pyzipper.BadZipFile(f"CRC 校验失败: {name}")
+        if size != expected_size:
+            raise pyzipper.BadZipFile(f"解压后的大小不一致: {name}")
+
+        if name == TOMBSTONE_NAME:
+            for deleted in json.loads(dest.getvalue().decode('utf-8')):
+                deleted_target = _member_target(output_dir, deleted)
+                if os.path.isfile(deleted_target):
+                    os.remove(deleted_target)
+        signature = f.read_exact(4)
+
+    # 中央目录等剩余数据也要读完: 加密的数据流读到结尾才能完成最后一段的认证
+    while f.read(STREAM_READ_SIZE):
+        pass
+    return files, total
+
+
+# 此函数用于流式解压（管道模式）: 从数据流（例如标准输入）顺序读取压缩包，边读边解压到输出目录，
+# 不需要定位，也不需要先把压缩包保存到本地。只支持 compress_stream 生成的（或成员都使用 deflate/bzip2
+# 压缩的）不分卷的压缩包；固实压缩包不支持。
+# 参数:
+# stream: 可读的二进制流。
+# output_dir: 输出目录。
+# password: 解压密码，可选参数。
+# crypto: 分段加密的密码，可选参数；给出时 stream 为加密后的 .enc 数据流。
+def decompress_stream(stream, output_dir, password=None, crypto=None):
+    """流式解压，返回输出目录"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    try:
+        with stats_util.stage('extract'):
+            source = SegmentStreamReader(stream, crypto) if crypto else stream
+            files, size = _extract_stream(source, output_dir, password)
+        stats_util.add('extract', bytes_out=size, files=files)
     except Exception as e:
         print(f"解压缩过程中出错: {str(e)}")
         sys.exit(1)
 
+    stats_util.log(f"流式解压完成: {files} 个文件，输出路径: {os.path.abspath(output_dir)}")
+    return output_dir
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="文件/文件夹的压缩(分卷)工具")
     subparsers = parser.add_subparsers(dest='command', required=True)
@@ -182,28 +2085,78 @@ if __name__ == "__main__":
     compress_parser.add_argument("-s", "--size", type=int, help="分卷大小(字节，可选)")
     compress_parser.add_argument("-o", "--output", required=True, help="输出目录路径")
     compress_parser.add_argument("-p", "--password", help="压缩密码(可选)")
+    compress_parser.add_argument("-w", "--workers", type=int, default=1, help="并行压缩的进程数(可选，默认 1)")
+    compress_parser.add_argument("--incremental", action="store_true", help="增量模式: 根据上次的清单只压缩新增和修改的文件")
+    compress_parser.add_argument("--no-adaptive", dest="adaptive", action="store_false", help="关闭自适应压缩策略，所有文件都使用指定的压缩算法")
+    compress_parser.add_argument("--codec", choices=list(CODECS), default='deflate', help="压缩算法(可选，默认 deflate)")
+    compress_parser.add_argument("--level", type=int, help="压缩级别(可选，deflate 0-9, bzip2 1-9)")
+    compress_parser.add_argument("--auto", action="store_true", help="自动调优压缩算法和级别，需配合 --target-speed 或 --target-size")
+    compress_parser.add_argument("--target-speed", type=float, help="自动调优的目标速度(MB/s)")
+    compress_parser.add_argument("--target-size", type=int, help="自动调优的目标输出大小(字节)")
+    compress_parser.add_argument("--scan-threads", type=int, default=1, help="扫描目录的线程数(可选，默认 1，网络盘上可调大)")
+    compress_parser.add_argument("--solid", action="store_true", help="固实模式: 小文件拼接成块整体压缩，适合大量很小的文件")
+    compress_parser.add_argument("--resume", action="store_true", help="断点续传: 从上次中断时最后一个检查点继续(需要分卷)")
 
     # 解压子命令
     decompress_parser = subparsers.add_parser('decompress', help='解压文件/文件夹')
     decompress_parser.add_argument("-i", "--input", required=True, help="输入文件路径")
     decompress_parser.add_argument("-o", "--output", required=True, help="输出目录路径")
     decompress_parser.add_argument("-p", "--password", help="解压密码(可选)")
+    decompress_parser.add_argument("-w", "--workers", type=int, default=1, help="并行解压的进程数(可选，默认 1)")
+    decompress_parser.add_argument("--member", action="append", help="只解压匹配的成员(路径、通配符或目录，可多次指定)")
+    decompress_parser.add_argument("--resume", action="store_true", help="断点续传: 跳过上次中断前已解压的文件")
+
+    # 列出内容子命令
+    list_parser = subparsers.add_parser('list', help='列出压缩包中的内容(只读取中央目录)')
+    list_parser.add_argument("-i", "--input", required=True, help="输入文件或文件夹路径")
+    list_parser.add_argument("-p", "--password", help="解压密码(可选，给出时展开固实块)")
+    list_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+
+    # 校验子命令
+    verify_parser = subparsers.add_parser('verify', help='按摘要清单校验分卷集(不解压)')
+    verify_parser.add_argument("-i", "--input", required=True, help="输入文件夹或摘要清单文件路径")
+    verify_parser.add_argument("-p", "--password", help="压缩密码(可选，用于校验清单签名)")
+    verify_parser.add_argument("-w", "--workers", type=int, default=1, help="并行校验的线程数(可选，默认 1)")
+
+    for sub_parser in (compress_parser, decompress_parser, list_parser, verify_parser):
+        stats_util.add_arguments(sub_parser)
 
     args = parser.parse_args()
 
-    if args.command == 'compress':
-        compress_folder(
-            input_path=args.input,
-            output_dir=args.output,
-            chunk_size=args.size,
-            password=args.password
-        )
-    elif args.command == 'decompress':
-        decompress_folder(
-            input_path=args.input,
-            output_dir=args.output,
-            password=args.password
-        )
+    with stats_util.cli_session(args):
+        if args.command == 'compress':
+            compress_folder(
+                input_path=args.input,
+                output_dir=args.output,
+                chunk_size=args.size,
+                password=args.password,
+                workers=args.workers,
+                incremental=args.incremental,
+                adaptive=args.adaptive,
+                codec=args.codec,
+                level=args.level,
+                auto=args.auto,
+                target_speed=args.target_speed,
+                target_size=args.target_size,
+                scan_threads=args.scan_threads,
+                solid=args.solid,
+                resume=args.resume
+            )
+        elif args.command == 'list':
+            list_archive(args.input, password=args.password, as_json=args.json)
+        elif args.command == 'verify':
+            if not verify_archive(args.input, password=args.password, workers=args.workers):
+                sys.exit(1)
+        elif args.command == 'decompress' and args.member:
+            extract_members(args.input, args.output, args.member, password=args.password)
+        elif args.command == 'decompress':
+            decompress_folder(
+                input_path=args.input,
+                output_dir=args.output,
+                password=args.password,
+                workers=args.workers,
+                resume=args.resume
+            )
 
     # 使用例子:
     # 压缩:
@@ -211,6 +2164,14 @@ if __name__ == "__main__":
     # 进行分卷，不加密: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder -s 1048576  # 示例分卷大小为 1MB（1048576 字节）
     # 不进行分卷，加密: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder -p mypassword
     # 进行分卷，加密: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder -s 1048576 -p mypassword  # 示例分卷大小为 1MB（1048576 字节）
+    # 使用 8 个进程并行压缩: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder -w 8
+    # 增量压缩（第一次生成完整包，之后每次只生成 <input_folder>_deltaN 增量包）:
+    #   python compress.py compress -i /path/to/input_folder -o /path/to/output_folder --incremental
+    # 指定压缩算法和级别: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder --codec bzip2 --level 9
+    # 自动调优（速度不低于 50MB/s 时压缩率最好的）: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder --auto --target-speed 50
+    # 网络盘上的大量小文件，用 16 个线程扫描目录: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder --scan-threads 16
+    # 固实模式（大量很小的文件）: python compress.py compress -i /path/to/input_folder -o /path/to/output_folder --solid
+    #   固实压缩包中小文件保存在 .zcm_solid/ 下的块成员中，需要用本工具解压（其他 zip 工具只能看到块文件）。
 
     # 不进行分卷，输出文件的名字: <input_folder>.zip
     # 进行分卷后，输出文件的名字: <input_folder>_part<X>.zip，其中 X 为分卷序号。
@@ -220,3 +2181,16 @@ if __name__ == "__main__":
     # 进行分卷的，不加密的: python compress.py decompress -i /path/to/input_dir -o /path/to/output_folder
     # 不进行分卷的，加密的: python compress.py decompress -i /path/to/input_zip.zip -o /path/to/output_folder -p mypassword
     # 进行分卷的，加密的: python compress.py decompress -i /path/to/input_dir -o /path/to/output_folder -p mypassword
+    # 增量包链: -i 指定包含完整包和各增量包的目录，会按顺序依次回放
+    # 只解压部分成员（只读取中央目录和这些成员所在的分卷）:
+    #   python compress.py decompress -i /path/to/input_dir -o /path/to/output_folder --member docs/report.txt --member "*.log"
+
+    # 列出内容（名称、大小、压缩后大小、CRC、所在分卷）: python compress.py list -i /path/to/input_dir [-p mypassword] [--json]
+
+    # 校验: 压缩时在输出目录中生成 <input_folder>.digest.json（分卷、成员和源文件的 SHA-256，设置密码时带 HMAC 签名），
+    # 用 4 个线程按清单校验分卷集（只读取分卷计算哈希，不解压）:
+    #   python compress.py verify -i /path/to/output_folder -w 4 [-p mypassword]
+
+    # 统计与安静模式（压缩和解压都支持）:
+    # 把各阶段（扫描、压缩、加密、分卷、解压等）的耗时、字节数、文件数和密钥派生耗时写入 JSON，并且不显示进度条和提示信息:
+    #   python compress.py compress -i /path/to/input_folder -o /path/to/output_folder --stats-json stats.json -q
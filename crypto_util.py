@@ -1,12 +1,544 @@
+import io
 import os
 import sys
+import struct
+import time
+from functools import lru_cache
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from Crypto.Cipher import AES
-from Crypto.Protocol.KDF import PBKDF2
+from Crypto.Hash import SHA256, HMAC
+from Crypto.Protocol.KDF import PBKDF2, HKDF
 from Crypto.Random import get_random_bytes
 import argparse
+import stats_util
+import journal_util
 
-def encrypt_file(input_path, output_dir, password):
-    """加密文件到指定目录"""
+# 流式加解密时每次读写的缓冲区大小（字节），必须是 AES 块大小（16）的整数倍。
+# 峰值内存约为两个缓冲区大小，与文件大小无关。
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# 分段加密格式（.enc，带版本号）:
+# 文件头 v1: 魔数 b'ZCSG' | 版本(1B) | PBKDF2 迭代次数(4B) | 盐值(16B) | nonce 前缀(8B) | 分段大小(4B)
+# 文件头 v2: 在 v1 之后追加 分卷序号(4B)，盐值为整个任务共用的任务盐值。
+# 文件头之后为若干分段，每段为 AES-GCM 密文（最后一段可以更短）加 16 字节认证标签。
+# 第 i 段的 nonce 为 nonce 前缀 + i(4B 大端)，附加认证数据为 文件头 + i + 是否末段，
+# 因此各段可以独立地并行加解密，篡改、截断和重排都会被检测出来。
+# 旧格式（盐值 16B | IV 16B | CBC 密文）没有魔数，解密时自动回退。
+#
+# 断点续传: 分段按任意顺序完成，每完成 CHECKPOINT_SEGMENTS 段先 fsync 输出文件，再把完成的分段序号记入任务日志，
+# 续传时只处理日志中没有的分段（输出文件的大小在开始时就已确定，已完成的分段不需要重写）。
+#
+# 密钥: v1 每个文件单独做一次 PBKDF2；v2 每个任务只做一次 PBKDF2 得到主密钥（按任务盐值缓存），
+# 每个分卷再用 HKDF(主密钥, 分卷序号) 派生出各自独立的子密钥，分卷越多节省越明显。
+SEGMENT_MAGIC = b'ZCSG'
+SEGMENT_VERSION = 2
+SEGMENT_HEADERS = {
+    1: struct.Struct('>4sBI16s8sI'),
+    2: struct.Struct('>4sBI16s8sII'),
+}
+SEGMENT_TAG_SIZE = 16
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+KDF_ITERATIONS = 100000
+CHECKPOINT_SEGMENTS = 16
+
+def _check_buffer_size(buffer_size):
+    """校验缓冲区大小，返回合法的缓冲区大小"""
+    if buffer_size <= 0 or buffer_size % AES.block_size != 0:
+        raise ValueError(f"缓冲区大小必须是 {AES.block_size} 的正整数倍: {buffer_size}")
+    return buffer_size
+
+def _read_full(f, buf):
+    """尽量读满 buf（可写的 bytearray/memoryview），返回实际读到的字节数，0 表示文件结束"""
+    view = memoryview(buf)
+    total = 0
+    while total < len(view):
+        n = f.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+def _encrypt_stream(f_in, f_out, cipher, buffer_size):
+    """以固定大小的块流式执行 CBC 加密，末尾按 PKCS#7 填充"""
+    buf = bytearray(buffer_size)
+    out = bytearray(buffer_size)
+    while True:
+        n = _read_full(f_in, buf)
+        if n < buffer_size:
+            # 最后一块: 填充数据到块大小的倍数
+            padding_length = AES.block_size - (n % AES.block_size)
+            f_out.write(cipher.encrypt(bytes(buf[:n]) + bytes([padding_length]) * padding_length))
+            return
+        cipher.encrypt(buf, output=out)
+        f_out.write(out)
+
+def _decrypt_stream(f_in, f_out, cipher, buffer_size):
+    """以固定大小的块流式执行 CBC 解密，保留最后一个块用于去除填充（读写都复用同一对缓冲区，不产生额外的拷贝）"""
+    buf = bytearray(buffer_size)
+    out = bytearray(buffer_size)
+    tail = b''
+    while True:
+        n = _read_full(f_in, buf)
+        if n == 0:
+            break
+        if n % AES.block_size != 0:
+            raise ValueError("密文长度不是块大小的整数倍，文件可能已损坏")
+        with memoryview(buf)[:n] as src, memoryview(out)[:n] as dst:
+            cipher.decrypt(src, output=dst)
+            f_out.write(tail)
+            f_out.write(dst[:-AES.block_size])
+            tail = bytes(dst[-AES.block_size:])
+        if n < buffer_size:
+            break
+
+    # 移除填充
+    if not tail:
+        raise ValueError("密文为空，文件可能已损坏")
+    padding_length = tail[-1]
+    if not 1 <= padding_length <= AES.block_size or tail[-padding_length:] != bytes([padding_length]) * padding_length:
+        raise ValueError("填充无效，密码错误或文件已损坏")
+    f_out.write(tail[:-padding_length])
+
+@lru_cache(maxsize=16)
+def _derive_segment_key(password, salt, iterations):
+    """分段格式的密钥派生（PBKDF2-HMAC-SHA256），同一任务盐值只计算一次"""
+    start = time.perf_counter()
+    key = PBKDF2(password, salt, dkLen=32, count=iterations, hmac_hash_module=SHA256)
+    stats_util.add_kdf(time.perf_counter() - start)
+    return key
+
+def _derive_legacy_key(password, salt):
+    """旧 CBC 格式的密钥派生（PBKDF2-HMAC-SHA1）"""
+    start = time.perf_counter()
+    key = PBKDF2(password, salt, dkLen=32, count=100000)
+    stats_util.add_kdf(time.perf_counter() - start)
+    return key
+
+def _volume_key(password, salt, iterations, volume_index):
+    """取得分卷的密钥；volume_index 为 None 时为 v1 文件（直接使用 PBKDF2 的结果）"""
+    key = _derive_segment_key(password, salt, iterations)
+    if volume_index is None:
+        return key
+    return HKDF(key, 32, b'', SHA256, context=b'ZCSG volume' + struct.pack('>I', volume_index))
+
+def derive_key(password, salt, context, iterations=KDF_ITERATIONS):
+    """从 PBKDF2 主密钥用 HKDF 按用途（context）派生出相互独立的 32 字节子密钥；同一盐值的主密钥只计算一次"""
+    return HKDF(_derive_segment_key(password, salt, iterations), 32, b'', SHA256, context=context)
+
+def digest_mac(password, salt, iterations, data):
+    """计算摘要清单的 HMAC-SHA256（十六进制）
+
+    密钥与分卷密钥相互独立；盐值与分卷相同时主密钥直接取缓存，不再做慢速派生。
+    """
+    key = derive_key(password, salt, b'ZCSG digest', iterations)
+    return HMAC.new(key, data, digestmod=SHA256).hexdigest()
+
+def new_job_salt():
+    """生成一个任务盐值，同一任务的所有分卷共用它，只需一次慢速密钥派生"""
+    return get_random_bytes(16)
+
+def _segment_cipher(key, header, nonce_prefix, index, is_last):
+    """构造第 index 段的 AES-GCM 对象，并绑定附加认证数据"""
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce_prefix + struct.pack('>I', index), mac_len=SEGMENT_TAG_SIZE)
+    cipher.update(header + struct.pack('>IB', index, is_last))
+    return cipher
+
+def _encrypt_segment(task):
+    """加密单个分段（在工作进程中执行），直接写入输出文件中该段的固定偏移处"""
+    input_path, output_path, key, header, nonce_prefix, index, segment_size, is_last = task
+    with open(input_path, 'rb') as f_in:
+        f_in.seek(index * segment_size)
+        plaintext = f_in.read(segment_size)
+    cipher = _segment_cipher(key, header, nonce_prefix, index, is_last)
+    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+    with open(output_path, 'r+b') as f_out:
+        f_out.seek(len(header) + index * (segment_size + SEGMENT_TAG_SIZE))
+        f_out.write(ciphertext)
+        f_out.write(tag)
+    return len(plaintext)
+
+def _decrypt_segment(task):
+    """解密并校验单个分段（在工作进程中执行），直接写入输出文件中该段的固定偏移处；output_path 为 None 时只校验"""
+    input_path, output_path, key, header, nonce_prefix, index, segment_size, is_last, length = task
+    with open(input_path, 'rb') as f_in:
+        f_in.seek(len(header) + index * (segment_size + SEGMENT_TAG_SIZE))
+        ciphertext = f_in.read(length)
+        tag = f_in.read(SEGMENT_TAG_SIZE)
+    cipher = _segment_cipher(key, header, nonce_prefix, index, is_last)
+    try:
+        plaintext = cipher.decrypt_and_verify(ciphertext, tag)
+    except ValueError:
+        raise ValueError(f"{os.path.basename(input_path)} 第 {index} 段认证失败，密码错误或文件已损坏")
+    if output_path is not None:
+        with open(output_path, 'r+b') as f_out:
+            f_out.seek(index * segment_size)
+            f_out.write(plaintext)
+    return len(plaintext)
+
+def _decrypt_legacy(input_path, output_path, password, buffer_size):
+    """解密旧 CBC 格式的文件（不可分段并行）"""
+    with open(input_path, 'rb') as f_in:
+        salt = f_in.read(16)
+        iv = f_in.read(16)
+
+        # 从密码派生密钥
+        key = _derive_legacy_key(password, salt)
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+
+        with open(output_path, 'wb') as f_out:
+            _decrypt_stream(f_in, f_out, cipher, buffer_size)
+
+def _decrypt_legacy_task(task):
+    """在工作进程中解密一个旧 CBC 格式的文件"""
+    _decrypt_legacy(*task)
+
+def _run_task(item):
+    """执行 (函数, 参数) 形式的任务，用于在同一个进程池中混合执行不同类型的任务"""
+    func, task = item
+    return func(task)
+
+def _run_segment_tasks(func, tasks, workers, on_done=None):
+    """执行分段任务；workers > 1 时使用进程池并限制同时提交的任务数
+
+    on_done(task) 在每个任务完成后于主进程中调用（完成顺序不一定是提交顺序）。
+    """
+    if workers <= 1:
+        for task in tasks:
+            func(task)
+            if on_done:
+                on_done(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                future.result()
+                task = pending.pop(future)
+                if on_done:
+                    on_done(task)
+
+        for task in tasks:
+            if len(pending) >= workers * 2:
+                collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+            pending[executor.submit(func, task)] = task
+        collect(wait(pending)[0])
+
+class _Checkpoints:
+    """分段任务的检查点: 每完成 CHECKPOINT_SEGMENTS 段，先 fsync 涉及的输出文件，再把完成的分段记入任务日志"""
+
+    def __init__(self, journal):
+        self.journal = journal
+        self._done = {}
+
+    def add(self, output_path, index):
+        self._done.setdefault(output_path, []).append(index)
+        if sum(len(indexes) for indexes in self._done.values()) >= CHECKPOINT_SEGMENTS:
+            self.flush()
+
+    def flush(self):
+        for output_path, indexes in self._done.items():
+            journal_util.sync_path(output_path)
+            self.journal.append({'file': os.path.basename(output_path), 'segments': indexes})
+        self._done = {}
+
+    @staticmethod
+    def completed(records, output_path):
+        """日志中记录的某个输出文件已完成的分段序号"""
+        name = os.path.basename(output_path)
+        return {index for record in records if record.get('file') == name for index in record.get('segments', ())}
+
+def read_segment_header(f):
+    """读取并解析分段格式的文件头，不是分段格式（旧 CBC 格式）时返回 None 并回到文件开头
+
+    返回 (header, iterations, salt, nonce_prefix, segment_size, volume_index)，v1 文件的 volume_index 为 None。
+    """
+    prefix = f.read(len(SEGMENT_MAGIC) + 1)
+    if len(prefix) == len(SEGMENT_MAGIC) + 1 and prefix[:len(SEGMENT_MAGIC)] == SEGMENT_MAGIC:
+        version = prefix[-1]
+        if version not in SEGMENT_HEADERS:
+            raise ValueError(f"不支持的加密格式版本: {version}")
+        header_struct = SEGMENT_HEADERS[version]
+        header = prefix + f.read(header_struct.size - len(prefix))
+        if len(header) != header_struct.size:
+            raise ValueError("文件头不完整，文件可能已损坏")
+        fields = header_struct.unpack(header)
+        iterations, salt, nonce_prefix, segment_size = fields[2:6]
+        volume_index = fields[6] if version >= 2 else None
+        if segment_size <= 0:
+            raise ValueError("文件头中的分段大小无效")
+        return header, iterations, salt, nonce_prefix, segment_size, volume_index
+    f.seek(0)
+    return None
+
+def is_segmented(path):
+    """文件是否为分段加密格式（可以用 SegmentReader 按需解密读取；旧 CBC 格式只能完整解密）"""
+    with open(path, 'rb') as f:
+        return read_segment_header(f) is not None
+
+def _new_segment_header(password, job_salt, segment_size, volume_index):
+    """生成当前版本的分段格式文件头，返回 (header, nonce_prefix, key)"""
+    if not 0 < segment_size < 2 ** 32:
+        raise ValueError(f"分段大小无效: {segment_size}")
+    salt = job_salt or new_job_salt()
+    nonce_prefix = get_random_bytes(8)
+    header = SEGMENT_HEADERS[SEGMENT_VERSION].pack(SEGMENT_MAGIC, SEGMENT_VERSION, KDF_ITERATIONS, salt,
+                                                   nonce_prefix, segment_size, volume_index)
+    return header, nonce_prefix, _volume_key(password, salt, KDF_ITERATIONS, volume_index)
+
+class SegmentWriter(io.RawIOBase):
+    """以分段格式流式加密写入的只写流，用于在写出数据的同时直接生成 .enc 文件
+
+    明文按 segment_size 缓存成段后加密写出，内存占用约为一个分段大小；
+    最后一段要在 close() 时才能确定（需要写入“末段”标记），因此总会留一段在缓存中。
+    """
+
+    def __init__(self, f_out, password, job_salt=None, volume_index=0, segment_size=DEFAULT_SEGMENT_SIZE):
+        super().__init__()
+        self._f_out = f_out
+        self._header, self._nonce_prefix, self._key = _new_segment_header(password, job_salt, segment_size, volume_index)
+        self._segment_size = segment_size
+        self._buffer = bytearray()
+        self._index = 0
+        self._f_out.write(self._header)
+
+    def writable(self):
+        return True
+
+    def _write_segment(self, plaintext, is_last):
+        with stats_util.stage('encrypt'):
+            cipher = _segment_cipher(self._key, self._header, self._nonce_prefix, self._index, is_last)
+            ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+            self._f_out.write(ciphertext)
+            self._f_out.write(tag)
+        stats_util.add('encrypt', bytes_in=len(plaintext), bytes_out=len(ciphertext) + len(tag))
+        self._index += 1
+
+    def write(self, data):
+        self._buffer += data
+        # 只有确定后面还有数据时才写出整段，保证最后一段带有末段标记
+        while len(self._buffer) > self._segment_size:
+            self._write_segment(bytes(self._buffer[:self._segment_size]), False)
+            del self._buffer[:self._segment_size]
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._write_segment(bytes(self._buffer), True)
+            self._buffer = bytearray()
+        super().close()
+
+class SegmentStreamReader(io.RawIOBase):
+    """从不可定位的流（例如标准输入）顺序读取并解密分段格式的数据
+
+    总要多读入一段才能知道当前段是不是末段（流结束时的那一段才是），内存占用约为两个分段大小。
+    读到流结束时末段标记也校验过了，因此截断、重排和篡改都能发现。旧 CBC 格式不支持。
+    """
+
+    def __init__(self, f_in, password):
+        super().__init__()
+        self._f_in = f_in
+        try:
+            parsed = read_segment_header(f_in)
+        except io.UnsupportedOperation:
+            # 不是分段格式时 read_segment_header 要回到文件开头，而流不支持定位
+            parsed = None
+        if not parsed:
+            raise ValueError("数据流不是分段加密格式（旧 CBC 格式不支持流式解密）")
+        self._header, iterations, salt, self._nonce_prefix, segment_size, volume_index = parsed
+        self._key = _volume_key(password, salt, iterations, volume_index)
+        self._stride = segment_size + SEGMENT_TAG_SIZE
+        self._index = 0
+        self._next = self._read_stride()
+        self._plain = b''
+        self._pos = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def _read_stride(self):
+        data = bytearray()
+        while len(data) < self._stride:
+            chunk = self._f_in.read(self._stride - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+
+    def _decrypt_next(self):
+        current = self._next
+        self._next = self._read_stride() if len(current) == self._stride else b''
+        is_last = not self._next
+        if len(current) < SEGMENT_TAG_SIZE:
+            raise ValueError("数据流被截断")
+        with stats_util.stage('decrypt'):
+            cipher = _segment_cipher(self._key, self._header, self._nonce_prefix, self._index, is_last)
+            try:
+                plaintext = cipher.decrypt_and_verify(current[:-SEGMENT_TAG_SIZE], current[-SEGMENT_TAG_SIZE:])
+            except ValueError:
+                raise ValueError(f"数据流第 {self._index} 段认证失败，密码错误或数据已损坏")
+        stats_util.add('decrypt', bytes_in=len(current), bytes_out=len(plaintext))
+        self._index += 1
+        return plaintext, is_last
+
+    def readinto(self, b):
+        while self._pos >= len(self._plain):
+            if self._done:
+                return 0
+            self._plain, self._done = self._decrypt_next()
+            self._pos = 0
+        n = min(len(b), len(self._plain) - self._pos)
+        b[:n] = self._plain[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+def _encrypt_segmented(input_path, output_path, password, segment_size, workers, job_salt, volume_index, journal):
+    """以分段格式加密文件；任务日志中已有文件头时为续传，只加密没有完成的分段"""
+    plain_size = os.path.getsize(input_path)
+    count = max(1, -(-plain_size // segment_size))
+    headers = [i for i, record in enumerate(journal.records) if 'header' in record]
+    done = set()
+    if headers and os.path.exists(output_path):
+        # 以最后写入的文件头为准，它之前的检查点属于被重新开始的输出，不再计入
+        header = bytes.fromhex(journal.records[headers[-1]]['header'])
+        _, iterations, salt, nonce_prefix, segment_size, volume_index = read_segment_header(io.BytesIO(header))
+        key = _volume_key(password, salt, iterations, volume_index)
+        with open(output_path, 'rb') as f_out:
+            if f_out.read(len(header)) != header:
+                raise ValueError("输出文件与任务日志不一致，无法续传")
+        done = _Checkpoints.completed(journal.records[headers[-1] + 1:], output_path)
+        stats_util.log(f"续传: 跳过已完成的 {len(done)}/{count} 个分段")
+    else:
+        header, nonce_prefix, key = _new_segment_header(password, job_salt, segment_size, volume_index)
+        with open(output_path, 'wb') as f_out:
+            f_out.write(header)
+            f_out.truncate(len(header) + plain_size + count * SEGMENT_TAG_SIZE)
+        journal_util.sync_path(output_path)
+        journal.append({'header': header.hex()})
+
+    checkpoints = _Checkpoints(journal)
+    tasks = ((input_path, output_path, key, header, nonce_prefix, i, segment_size, i == count - 1)
+             for i in range(count) if i not in done)
+    _run_segment_tasks(_encrypt_segment, tasks, workers, on_done=lambda task: checkpoints.add(task[1], task[5]))
+    checkpoints.flush()
+
+def _segment_layout(parsed, file_size):
+    """根据文件头和文件大小计算 (分段数, 最后一段的明文长度)"""
+    header, segment_size = parsed[0], parsed[4]
+    body_size = file_size - len(header)
+    stride = segment_size + SEGMENT_TAG_SIZE
+    count = max(1, -(-body_size // stride))
+    last_length = body_size - (count - 1) * stride - SEGMENT_TAG_SIZE
+    if last_length < 0 or (last_length == 0 and count > 1):
+        raise ValueError("密文长度与分段大小不符，文件可能已损坏")
+    return count, last_length
+
+def segment_plain_size(path):
+    """只读文件头，返回分段格式文件的明文大小（不需要密码）"""
+    with open(path, 'rb') as f:
+        parsed = read_segment_header(f)
+    if not parsed:
+        raise ValueError(f"不是分段加密格式（旧 CBC 格式不支持随机访问，请先完整解密）: {path}")
+    count, last_length = _segment_layout(parsed, os.path.getsize(path))
+    return (count - 1) * parsed[4] + last_length
+
+class SegmentReader(io.RawIOBase):
+    """分段格式文件的可 seek 只读解密流: 只解密并校验读到的分段，缓存最近一段
+
+    用于随机访问加密的压缩包（例如只取出其中一个成员），读取量只和实际访问的范围有关。
+    """
+
+    def __init__(self, path, password):
+        super().__init__()
+        self._file = open(path, 'rb')
+        try:
+            self._parsed = read_segment_header(self._file)
+            if not self._parsed:
+                raise ValueError(f"不是分段加密格式（旧 CBC 格式不支持随机访问，请先完整解密）: {path}")
+            header, iterations, salt, self._nonce_prefix, self._segment_size, volume_index = self._parsed
+            self._header = header
+            self._count, self._last_length = _segment_layout(self._parsed, os.path.getsize(path))
+            self._key = _volume_key(password, salt, iterations, volume_index)
+        except Exception:
+            self._file.close()
+            raise
+        self.size = (self._count - 1) * self._segment_size + self._last_length
+        self._pos = 0
+        self._cached_index = None
+        self._cached = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if pos < 0:
+            raise OSError("seek 位置不能为负数")
+        self._pos = pos
+        return pos
+
+    def _segment(self, index):
+        """返回第 index 段的明文（解密并校验）"""
+        if index != self._cached_index:
+            is_last = index == self._count - 1
+            length = self._last_length if is_last else self._segment_size
+            with stats_util.stage('decrypt'):
+                self._file.seek(len(self._header) + index * (self._segment_size + SEGMENT_TAG_SIZE))
+                ciphertext = self._file.read(length)
+                tag = self._file.read(SEGMENT_TAG_SIZE)
+                cipher = _segment_cipher(self._key, self._header, self._nonce_prefix, index, is_last)
+                try:
+                    self._cached = cipher.decrypt_and_verify(ciphertext, tag)
+                except ValueError:
+                    raise ValueError(f"第 {index} 段认证失败，密码错误或文件已损坏")
+            stats_util.add('decrypt', bytes_in=len(ciphertext) + len(tag), bytes_out=len(self._cached))
+            self._cached_index = index
+        return self._cached
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        total = 0
+        while total < len(view) and self._pos < self.size:
+            index, start = divmod(self._pos, self._segment_size)
+            plaintext = self._segment(index)
+            n = min(len(view) - total, len(plaintext) - start)
+            view[total:total + n] = plaintext[start:start + n]
+            total += n
+            self._pos += n
+        return total
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            self._cached = b''
+        super().close()
+
+def encrypt_file(input_path, output_dir, password, buffer_size=DEFAULT_BUFFER_SIZE,
+                 workers=1, segment_size=DEFAULT_SEGMENT_SIZE, legacy=False, job_salt=None, volume_index=0, resume=False):
+    """加密文件到指定目录（默认使用分段格式并可多进程并行；legacy=True 时输出旧的 CBC 格式）
+
+    同一任务的多个分卷应传入相同的 job_salt（见 new_job_salt）和各自的 volume_index，
+    这样整个任务只做一次 PBKDF2，每个分卷仍有独立的密钥和 nonce。
+    分段格式在输出目录中记录任务日志，中途失败后 resume=True 只加密没有完成的分段（旧格式不支持续传）。
+    """
+    output_path = ""
+    journal = None
     try:
         # 输入文件验证
         if not os.path.exists(input_path):
@@ -19,84 +551,205 @@ def encrypt_file(input_path, output_dir, password):
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+        buffer_size = _check_buffer_size(buffer_size)
+
         # 获取输入文件名并生成输出路径
         filename = os.path.basename(input_path)
         output_path = os.path.join(output_dir, f"{filename}.enc")
 
-        # 生成随机盐值
-        salt = get_random_bytes(16)
-        # 从密码派生密钥
-        key = PBKDF2(password, salt, dkLen=32, count=100000)
-
-        # 生成随机初始化向量
-        iv = get_random_bytes(16)
-        cipher = AES.new(key, AES.MODE_CBC, iv)
+        with stats_util.stage('encrypt'):
+            if not legacy:
+                st = os.stat(input_path)
+                journal = journal_util.Journal.open(
+                    journal_util.journal_path(output_dir, f"{filename}.enc"), 'encrypt',
+                    {'input': os.path.abspath(input_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                     'segment_size': segment_size, 'volume_index': volume_index},
+                    secrets=[password], resume=resume)
+                _encrypt_segmented(input_path, output_path, password, segment_size, workers, job_salt, volume_index, journal)
+                journal.finish()
+            else:
+                # 生成随机盐值
+                salt = get_random_bytes(16)
+                # 从密码派生密钥
+                key = _derive_legacy_key(password, salt)
 
-        with open(input_path, 'rb') as f_in:
-            plaintext = f_in.read()
+                # 生成随机初始化向量
+                iv = get_random_bytes(16)
+                cipher = AES.new(key, AES.MODE_CBC, iv)
 
-            # 填充数据到块大小的倍数
-            padding_length = AES.block_size - (len(plaintext) % AES.block_size)
-            plaintext += bytes([padding_length]) * padding_length
+                with open(input_path, 'rb') as f_in, open(output_path, 'wb') as f_out:
+                    f_out.write(salt)
+                    f_out.write(iv)
+                    _encrypt_stream(f_in, f_out, cipher, buffer_size)
+        stats_util.add('encrypt', bytes_in=os.path.getsize(input_path), bytes_out=os.path.getsize(output_path), files=1)
 
-            ciphertext = cipher.encrypt(plaintext)
-
-        with open(output_path, 'wb') as f_out:
-            f_out.write(salt)
-            f_out.write(iv)
-            f_out.write(ciphertext)
-
-        print(f"加密成功，输出文件: {os.path.abspath(output_path)}")
+        stats_util.log(f"加密成功，输出文件: {os.path.abspath(output_path)}")
         return output_path
 
     except Exception as e:
+        if journal is not None and journal.checkpointed:
+            # 保留已加密的分段，可以续传
+            journal.close()
+            print(f"加密过程中出错: {str(e)}（加上 --resume 重新运行即可续传）")
+            return ""
+        if journal is not None:
+            journal.finish()
+        # 删除写了一半的输出文件
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
         print(f"加密过程中出错: {str(e)}")
         return ""
 
-def decrypt_file(input_path, output_dir, password):
-    """解密文件到指定目录"""
+def encrypt_pipe(f_in, f_out, password, segment_size=DEFAULT_SEGMENT_SIZE):
+    """把 f_in 中的数据以分段格式加密写到 f_out（两者都可以是不可定位的流，例如标准输入/输出），内存占用约为一个分段"""
+    writer = SegmentWriter(f_out, password, segment_size=segment_size)
+    while True:
+        data = f_in.read(segment_size)
+        if not data:
+            break
+        writer.write(data)
+    writer.close()
+    f_out.flush()
+
+def decrypt_pipe(f_in, f_out, password):
+    """把 f_in 中分段格式的密文流解密写到 f_out（两者都可以是不可定位的流），内存占用约为两个分段"""
+    reader = SegmentStreamReader(f_in, password)
+    while True:
+        data = reader.read(DEFAULT_BUFFER_SIZE)
+        if not data:
+            break
+        f_out.write(data)
+    f_out.flush()
+
+def _decrypt_tasks(input_path, output_path, password, buffer_size, records=()):
+    """生成解密一个文件所需的任务 [(函数, 参数)]，分段格式按段拆分，旧格式整个文件一个任务
+
+    records 为续传时任务日志中的检查点，其中已完成的分段（或旧格式的整个文件）不再生成任务。
+    """
+    name = os.path.basename(output_path)
+    with open(input_path, 'rb') as f_in:
+        parsed = read_segment_header(f_in)
+    if not parsed:
+        if any(record.get('file') == name and record.get('done') for record in records):
+            return []
+        return [(_decrypt_legacy_task, (input_path, output_path, password, buffer_size))]
+
+    header, iterations, salt, nonce_prefix, segment_size, volume_index = parsed
+    # 同一任务的分卷共用任务盐值，PBKDF2 在主进程中只算一次，工作进程直接拿到分卷密钥
+    key = _volume_key(password, salt, iterations, volume_index)
+    count, last_length = _segment_layout(parsed, os.path.getsize(input_path))
+    plain_size = (count - 1) * segment_size + last_length
+    done = _Checkpoints.completed(records, output_path)
+    if not done or not os.path.exists(output_path) or os.path.getsize(output_path) != plain_size:
+        done = set()
+        with open(output_path, 'wb') as f_out:
+            f_out.truncate(plain_size)
+    return [(_decrypt_segment, (input_path, output_path, key, header, nonce_prefix, i, segment_size, i == count - 1,
+                                last_length if i == count - 1 else segment_size)) for i in range(count) if i not in done]
+
+def decrypt_files(input_paths, output_dir, password, buffer_size=DEFAULT_BUFFER_SIZE, workers=1, resume=False):
+    """批量解密多个文件（例如一个任务的所有分卷）到指定目录，返回输出路径列表，出错时返回空列表
+
+    所有文件的分段放进同一个进程池并行解密（同时提交的任务数有上限，内存占用与文件数量无关），
+    每段的 GCM 认证标签在解密的同时完成校验，不需要另外的校验过程；旧 CBC 格式的文件整个作为一个任务。
+    进度记录在输出目录的任务日志中，中途失败后 resume=True 只解密没有完成的分段和文件。
+    """
+    output_paths = []
+    journal = None
     try:
         # 输入文件验证
-        if not os.path.exists(input_path):
-            print(f"错误: 输入文件不存在: {input_path}")
-            return ""
-        if not os.path.isfile(input_path):
-            print(f"错误: 输入路径不是文件: {input_path}")
-            return ""
+        for input_path in input_paths:
+            if not os.path.exists(input_path):
+                print(f"错误: 输入文件不存在: {input_path}")
+                return []
+            if not os.path.isfile(input_path):
+                print(f"错误: 输入路径不是文件: {input_path}")
+                return []
 
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        # 获取输入文件名并生成输出路径
-        filename = os.path.basename(input_path)
-        if filename.endswith('.enc'):
-            filename = filename[:-4]
-        output_path = os.path.join(output_dir, filename)
+        buffer_size = _check_buffer_size(buffer_size)
 
-        with open(input_path, 'rb') as f_in:
-            salt = f_in.read(16)
-            iv = f_in.read(16)
-            ciphertext = f_in.read()
+        journal = journal_util.Journal.open(
+            journal_util.journal_path(output_dir, 'decrypt'), 'decrypt',
+            {'inputs': [[os.path.abspath(path), os.path.getsize(path)] for path in input_paths]},
+            secrets=[password], resume=resume)
+        checkpoints = _Checkpoints(journal)
 
-        # 从密码派生密钥
-        key = PBKDF2(password, salt, dkLen=32, count=100000)
-        cipher = AES.new(key, AES.MODE_CBC, iv)
+        def on_done(item):
+            func, task = item
+            if func is _decrypt_segment:
+                checkpoints.add(task[1], task[5])
+            else:
+                journal_util.sync_path(task[1])
+                journal.append({'file': os.path.basename(task[1]), 'done': True})
 
-        plaintext = cipher.decrypt(ciphertext)
+        with stats_util.stage('decrypt'):
+            tasks = []
+            for input_path in input_paths:
+                # 获取输入文件名并生成输出路径
+                filename = os.path.basename(input_path)
+                if filename.endswith('.enc'):
+                    filename = filename[:-4]
+                output_path = os.path.join(output_dir, filename)
+                output_paths.append(output_path)
+                tasks += _decrypt_tasks(input_path, output_path, password, buffer_size, journal.records)
+            if journal.records:
+                stats_util.log(f"续传: 还有 {len(tasks)} 个分段（或文件）需要解密")
+            _run_segment_tasks(_run_task, tasks, workers, on_done=on_done)
+            checkpoints.flush()
+        journal.finish()
 
-        # 移除填充
-        padding_length = plaintext[-1]
-        plaintext = plaintext[:-padding_length]
+        for input_path, output_path in zip(input_paths, output_paths):
+            stats_util.add('decrypt', bytes_in=os.path.getsize(input_path), bytes_out=os.path.getsize(output_path), files=1)
+            stats_util.log(f"解密成功，输出文件: {os.path.abspath(output_path)}")
+        return output_paths
 
-        with open(output_path, 'wb') as f_out:
-            f_out.write(plaintext)
+    except Exception as e:
+        if journal is not None and journal.checkpointed:
+            # 保留已解密的部分，可以续传
+            journal.close()
+            print(f"解密过程中出错: {str(e)}（加上 --resume 重新运行即可续传）")
+            return []
+        if journal is not None:
+            journal.finish()
+        # 删除写了一半的输出文件
+        for output_path in output_paths:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        print(f"解密过程中出错: {str(e)}")
+        return []
 
-        print(f"解密成功，输出文件: {os.path.abspath(output_path)}")
-        return output_path
+def verify_files(input_paths, password, workers=1):
+    """校验分段格式 .enc 文件每一段的 GCM 认证标签（多进程并行，不写出明文），全部通过时返回 True
 
+    旧 CBC 格式的文件没有认证信息，无法校验，按校验失败处理。
+    """
+    try:
+        with stats_util.stage('verify'):
+            tasks = []
+            for input_path in input_paths:
+                with open(input_path, 'rb') as f_in:
+                    parsed = read_segment_header(f_in)
+                if not parsed:
+                    raise ValueError(f"{os.path.basename(input_path)} 是旧 CBC 格式，没有可以校验的认证信息")
+                header, iterations, salt, nonce_prefix, segment_size, volume_index = parsed
+                key = _volume_key(password, salt, iterations, volume_index)
+                count, last_length = _segment_layout(parsed, os.path.getsize(input_path))
+                tasks += [(input_path, None, key, header, nonce_prefix, i, segment_size, i == count - 1,
+                           last_length if i == count - 1 else segment_size) for i in range(count)]
+            _run_segment_tasks(_decrypt_segment, tasks, workers)
+        stats_util.add('verify', bytes_in=sum(os.path.getsize(path) for path in input_paths), files=len(input_paths))
+        return True
     except Exception as e:
-        print(f"解密过程中出错: {str(e)}")
-        return ""
+        print(f"校验失败: {str(e)}")
+        return False
+
+def decrypt_file(input_path, output_dir, password, buffer_size=DEFAULT_BUFFER_SIZE, workers=1, resume=False):
+    """解密文件到指定目录（根据文件头自动识别分段格式或旧的 CBC 格式）"""
+    output_paths = decrypt_files([input_path], output_dir, password, buffer_size, workers, resume)
+    return output_paths[0] if output_paths else ""
 
 def main():
     parser = argparse.ArgumentParser(description="文件加密/解密工具")
@@ -104,22 +757,51 @@ def main():
 
     # 加密子命令
     encrypt_parser = subparsers.add_parser('encrypt', help='加密文件')
-    encrypt_parser.add_argument("-i", "--input", required=True, help="输入文件路径")
-    encrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径")
+    encrypt_parser.add_argument("-i", "--input", required=True, help="输入文件路径(- 表示标准输入)")
+    encrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径(- 表示标准输出)")
     encrypt_parser.add_argument("-p", "--password", required=True, help="加密密码")
+    encrypt_parser.add_argument("-b", "--buffer", type=int, default=DEFAULT_BUFFER_SIZE, help="流式处理缓冲区大小(字节，16 的整数倍，可选)")
+    encrypt_parser.add_argument("-w", "--workers", type=int, default=1, help="并行加密的进程数(可选，默认 1)")
+    encrypt_parser.add_argument("--segment", type=int, default=DEFAULT_SEGMENT_SIZE, help="分段大小(字节，可选)")
+    encrypt_parser.add_argument("--legacy", action="store_true", help="输出旧的 CBC 格式(不可并行)")
 
     # 解密子命令
     decrypt_parser = subparsers.add_parser('decrypt', help='解密文件')
-    decrypt_parser.add_argument("-i", "--input", required=True, help="输入文件路径")
-    decrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径")
+    decrypt_parser.add_argument("-i", "--input", required=True, help="输入文件路径(- 表示标准输入)")
+    decrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径(- 表示标准输出)")
     decrypt_parser.add_argument("-p", "--password", required=True, help="解密密码")
+    decrypt_parser.add_argument("-b", "--buffer", type=int, default=DEFAULT_BUFFER_SIZE, help="流式处理缓冲区大小(字节，16 的整数倍，可选)")
+    decrypt_parser.add_argument("-w", "--workers", type=int, default=1, help="并行解密的进程数(可选，默认 1)")
+
+    for sub_parser in (encrypt_parser, decrypt_parser):
+        sub_parser.add_argument("--resume", action="store_true", help="断点续传: 跳过上次中断前已完成的分段(可选)")
+        stats_util.add_arguments(sub_parser)
 
     args = parser.parse_args()
 
-    if args.command == 'encrypt':
-        encrypt_file(args.input, args.output, args.password)
-    elif args.command == 'decrypt':
-        decrypt_file(args.input, args.output, args.password)
+    if args.input == '-' or args.output == '-':
+        # 管道模式: 从标准输入读、向标准输出写，提示和错误信息改为输出到标准错误
+        if args.input != '-' or args.output != '-':
+            print("错误: 管道模式需要同时使用 -i - 和 -o -", file=sys.stderr)
+            sys.exit(1)
+        f_out = sys.stdout.buffer
+        with redirect_stdout(sys.stderr), stats_util.cli_session(args):
+            try:
+                if args.command == 'encrypt':
+                    encrypt_pipe(sys.stdin.buffer, f_out, args.password, args.segment)
+                else:
+                    decrypt_pipe(sys.stdin.buffer, f_out, args.password)
+            except Exception as e:
+                print(f"{'加密' if args.command == 'encrypt' else '解密'}过程中出错: {str(e)}")
+                sys.exit(1)
+        return
+
+    with stats_util.cli_session(args):
+        if args.command == 'encrypt':
+            encrypt_file(args.input, args.output, args.password, args.buffer,
+                         workers=args.workers, segment_size=args.segment, legacy=args.legacy, resume=args.resume)
+        elif args.command == 'decrypt':
+            decrypt_file(args.input, args.output, args.password, args.buffer, workers=args.workers, resume=args.resume)
 
 if __name__ == "__main__":
     main()
@@ -127,3 +809,13 @@ if __name__ == "__main__":
     # 一些使用例子:
     # 加密文件: python crypto_util.py encrypt -i /path/to/input_file -o /path/to/output_folder -p mypassword
     # 解密文件: python crypto_util.py decrypt -i /path/to/input_file.enc -o /path/to/output_folder -p mypassword
+    # 指定流式缓冲区为 1MB: python crypto_util.py encrypt -i /path/to/input_file -o /path/to/output_folder -p mypassword -b 1048576
+    # 使用 8 个进程并行加密/解密: python crypto_util.py encrypt -i /path/to/input_file -o /path/to/output_folder -p mypassword -w 8
+    # 输出旧的 CBC 格式: python crypto_util.py encrypt -i /path/to/input_file -o /path/to/output_folder -p mypassword --legacy
+    # 解密时会根据文件头自动识别新旧格式。
+    # 中断（崩溃、被杀）后断点续传，只处理没有完成的分段: 用相同的参数加上 --resume 重新运行
+    # 管道模式（不落盘，只支持分段格式，内存占用约为两个分段）:
+    #   producer | python crypto_util.py encrypt -i - -o - -p mypassword | consumer
+    #   producer | python crypto_util.py decrypt -i - -o - -p mypassword | consumer
+    # 把各阶段耗时、字节数和密钥派生耗时写入 JSON，并且不输出提示信息:
+    #   python crypto_util.py encrypt -i /path/to/input_file -o /path/to/output_folder -p mypassword --stats-json stats.json -q
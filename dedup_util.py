@@ -0,0 +1,483 @@
+import os
+import re
+import sys
+import stat
+import json
+import zlib
+import hmac
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from compress_util import scan_tree
+from crypto_util import derive_key, new_job_salt, KDF_ITERATIONS
+import stats_util
+
+# 去重仓库（dedup store）:
+# 文件按内容定义分块，每个不同的块只压缩（设置加密密码时再加密）一次，追加写入块包文件；
+# 同一仓库中的所有文件、所有运行（包括不同的输入文件夹）共享这些块，重复的数据只保存一份。
+# 仓库目录中:
+#   dedup.json                       仓库配置: 版本、分块参数，加密时还有盐值和密码校验值
+#   chunks.json                      块索引: 块 ID -> [包序号, 偏移, 长度, 原始大小]
+#   pack<NNNNNN>.zcp                 块包: 文件头 PACK_MAGIC 之后依次存放各个块的数据
+#   <名称>_run<NNNN>.index.json      每次运行的文件索引（快照）: 路径 -> [大小, 修改时间(ns), 权限, 块 ID 列表]，
+#                                    以及空目录: 路径 -> [修改时间(ns), 权限]
+#                                    加密的仓库中为 .index.enc（整个索引加密，不泄露文件名）
+# 块的数据为 1 字节标志（0 原样，1 deflate）加数据；加密时整体用 AES-GCM 加密（nonce 12B | 密文 | 标签 16B），
+# 附加认证数据为块 ID，块被替换或移动都能发现。
+# 块 ID 为块内容的 SHA-256；加密的仓库中改用 HMAC-SHA256（密钥由密码派生），避免通过块 ID 推测内容。
+# 写入顺序为 块包（fsync）-> 块索引 -> 文件索引，中途中断只会在块包中留下没有被引用的数据，不影响已有的快照。
+# 注意: 块只增不删，删除旧的运行索引不会回收块包中的空间。
+STORE_VERSION = 1
+STORE_CONFIG = 'dedup.json'
+CHUNK_INDEX = 'chunks.json'
+PACK_MAGIC = b'ZCPK\x01'
+DEFAULT_PACK_SIZE = 64 * 1024 * 1024
+READ_SIZE = 4 * 1024 * 1024
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# 内容定义分块（CDC）: 每个字节按固定的随机表映射为 0 或 1，块从至少 CDC_MIN_SIZE 处开始寻找
+# 连续 CDC_RUN 个字节都映射为 1 的位置作为边界（相当于窗口为 CDC_RUN 字节的滚动哈希），
+# 边界只取决于附近的内容，文件中插入或删除数据后，后面的块仍然与原来的相同。
+# 映射用 bytes.translate、查找用正则表达式，都在 C 中完成，不需要逐字节的 Python 循环。
+# 平均块大小约为 CDC_MIN_SIZE + 2^(CDC_RUN+1)（约 48KB），最大不超过 CDC_MAX_SIZE。
+# 分块参数保存在仓库配置中，同一仓库始终使用相同的参数（参数不同就找不到相同的块）。
+CDC_MIN_SIZE = 16 * 1024
+CDC_MAX_SIZE = 256 * 1024
+CDC_RUN = 14
+CDC_TABLE = bytes(hashlib.sha256(b'zcm cdc %d' % i).digest()[0] & 1 for i in range(256))
+
+
+def _chunks(f, min_size, max_size, run):
+    """按内容定义分块，逐个产生块数据；内存占用约为一个读取缓冲区"""
+    pattern = re.compile(b'\x01{%d}' % run)
+    data = b''
+    eof = False
+    while not eof:
+        new = f.read(READ_SIZE)
+        eof = not new
+        data += new
+        bits = data.translate(CDC_TABLE)
+        pos = 0
+        # 没读完时只切分后面至少还有一个最大块的部分，剩下的留到下一次
+        while pos < len(data) and (eof or len(data) - pos >= max_size):
+            limit = min(pos + max_size, len(data))
+            match = pattern.search(bits, pos + min_size - run, limit)
+            end = match.end() if match else limit
+            yield data[pos:end]
+            pos = end
+        data = data[pos:]
+
+
+def _save_json(path, data):
+    """原子地写入 JSON 文件（先写临时文件再替换）"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def is_store(path):
+    """path 是否为去重仓库目录"""
+    return os.path.isfile(os.path.join(path, STORE_CONFIG))
+
+
+class _Store:
+    """打开的去重仓库: 配置、密钥和块索引
+
+    create 为 True 且目录中还没有仓库时新建（加密与否由 crypto 决定）；
+    已有仓库时检查加密密码，不一致时抛出 ValueError。
+    """
+
+    def __init__(self, store_dir, crypto=None, create=False):
+        self.store_dir = store_dir
+        config_path = os.path.join(store_dir, STORE_CONFIG)
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                self.config = json.load(f)
+            if self.config.get('version') != STORE_VERSION:
+                raise ValueError(f"不支持的去重仓库版本: {self.config.get('version')}")
+        elif create:
+            self.config = {'version': STORE_VERSION, 'min_size': CDC_MIN_SIZE, 'max_size': CDC_MAX_SIZE,
+                           'run': CDC_RUN, 'encrypted': bool(crypto)}
+            if crypto:
+                self.config['salt'] = new_job_salt().hex()
+                self.config['iterations'] = KDF_ITERATIONS
+        else:
+            raise ValueError(f"不是去重仓库: {store_dir}")
+
+        self._id_key = self._data_key = None
+        if self.config['encrypted']:
+            if not crypto:
+                raise ValueError("去重仓库已加密，需要给出加密密码")
+            salt = bytes.fromhex(self.config['salt'])
+            self._id_key = derive_key(crypto, salt, b'ZCSG dedup id', self.config['iterations'])
+            self._data_key = derive_key(crypto, salt, b'ZCSG dedup data', self.config['iterations'])
+            check = hmac.new(self._id_key, b'dedup check', hashlib.sha256).hexdigest()
+            if self.config.setdefault('check', check) != check:
+                raise ValueError("加密密码与去重仓库不一致")
+        elif crypto:
+            raise ValueError("去重仓库没有加密，不能使用加密密码（加密与否在第一次运行时确定）")
+        if not os.path.exists(config_path):
+            _save_json(config_path, self.config)
+
+        index_path = os.path.join(store_dir, CHUNK_INDEX)
+        self.chunks = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.chunks = json.load(f)['chunks']
+
+    def chunk_id(self, data):
+        if self._id_key:
+            return hmac.new(self._id_key, data, hashlib.sha256).hexdigest()
+        return hashlib.sha256(data).hexdigest()
+
+    def _seal(self, data, aad):
+        if not self._data_key:
+            return data
+        nonce = get_random_bytes(NONCE_SIZE)
+        cipher = AES.new(self._data_key, AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+        cipher.update(aad)
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return nonce + ciphertext + tag
+
+    def _unseal(self, blob, aad):
+        if not self._data_key:
+            return blob
+        cipher = AES.new(self._data_key, AES.MODE_GCM, nonce=blob[:NONCE_SIZE], mac_len=TAG_SIZE)
+        cipher.update(aad)
+        return cipher.decrypt_and_verify(blob[NONCE_SIZE:-TAG_SIZE], blob[-TAG_SIZE:])
+
+    def pack_chunk(self, chunk_id, data, level):
+        """压缩（压缩后没有变小时原样保存）并加密一个块，返回写入块包的数据（可以在多个线程中同时调用）"""
+        compressed = zlib.compress(data, level)
+        record = b'\x01' + compressed if len(compressed) < len(data) else b'\x00' + data
+        return self._seal(record, bytes.fromhex(chunk_id))
+
+    def unpack_chunk(self, chunk_id, blob):
+        """解密、解压一个块并校验块 ID"""
+        try:
+            record = self._unseal(blob, bytes.fromhex(chunk_id))
+        except ValueError:
+            raise ValueError(f"块 {chunk_id[:16]} 认证失败，密码错误或块包已损坏")
+        data = zlib.decompress(record[1:]) if record[:1] == b'\x01' else record[1:]
+        if self.chunk_id(data) != chunk_id:
+            raise ValueError(f"块 {chunk_id[:16]} 校验失败，块包已损坏")
+        return data
+
+    def pack_path(self, number):
+        return os.path.join(self.store_dir, f"pack{number:06d}.zcp")
+
+    def next_pack(self):
+        """下一个块包的序号（每次运行从新的块包开始，不修改已有的块包）"""
+        numbers = [int(name[4:10]) for name in os.listdir(self.store_dir) if re.fullmatch(r'pack\d{6}\.zcp', name)]
+        return max(numbers, default=0) + 1
+
+    def save_chunks(self):
+        _save_json(os.path.join(self.store_dir, CHUNK_INDEX), {'version': STORE_VERSION, 'chunks': self.chunks})
+
+    def runs(self, name=None):
+        """仓库中的运行索引，返回按 (名称, 序号) 排序的 [(名称, 序号, 路径)]"""
+        suffix = '.index.enc' if self._data_key else '.index.json'
+        runs = []
+        for filename in os.listdir(self.store_dir):
+            match = re.fullmatch(r'(.+)_run(\d+)' + re.escape(suffix), filename)
+            if match and (name is None or match.group(1) == name):
+                runs.append((match.group(1), int(match.group(2)), os.path.join(self.store_dir, filename)))
+        return sorted(runs)
+
+    def load_run(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            data = self._unseal(data, b'index')
+        except ValueError:
+            raise ValueError(f"运行索引认证失败，密码错误或文件已损坏: {path}")
+        return json.loads(data.decode('utf-8'))
+
+    def save_run(self, name, run, index):
+        suffix = '.index.enc' if self._data_key else '.index.json'
+        path = os.path.join(self.store_dir, f"{name}_run{run:04d}{suffix}")
+        data = json.dumps(index, ensure_ascii=False).encode('utf-8')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self._seal(data, b'index'))
+        os.replace(path + '.tmp', path)
+        return path
+
+
+class _PackWriter:
+    """顺序追加块数据的块包写入器，超过 pack_size 时换一个新的块包"""
+
+    def __init__(self, store, pack_size):
+        self.store = store
+        self.pack_size = pack_size
+        self.number = store.next_pack()
+        self.bytes_written = 0
+        self._file = None
+
+    def append(self, blob):
+        """追加一个块，返回 (包序号, 偏移)"""
+        if self._file is not None and self._file.tell() + len(blob) > self.pack_size:
+            self.close()
+            self.number += 1
+        if self._file is None:
+            self._file = open(self.store.pack_path(self.number), 'wb')
+            self._file.write(PACK_MAGIC)
+        offset = self._file.tell()
+        self._file.write(blob)
+        self.bytes_written += len(blob)
+        return self.number, offset
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+# 此函数用于把文件夹存入去重仓库: 文件按内容定义分块，仓库中已有的块（本次运行的其他文件、之前的运行）不再保存，
+# 新的块压缩（并加密）后追加到新的块包中，最后写出本次运行的文件索引，并报告去重比。
+# 大小和修改时间与同名输入上一次运行相同的文件直接沿用上次的块列表，不再读取。
+# 参数:
+# input_path: 要存入的文件或文件夹路径。
+# store_dir: 去重仓库目录，不存在时新建。
+# crypto: 加密密码，可选参数；第一次运行时确定仓库是否加密，之后必须使用相同的密码。
+# workers: 压缩和加密块的线程数，可选参数，默认为 1（zlib 和 AES 运算时释放 GIL，多线程即可并行）。
+# pack_size: 块包大小（字节），可选参数，默认为 64MB。
+# level: deflate 压缩级别，可选参数，默认为 6。
+# scan_threads: 扫描目录的线程数，可选参数，默认为 1。
+def store_folder(input_path, store_dir, crypto=None, workers=1, pack_size=DEFAULT_PACK_SIZE, level=6, scan_threads=1):
+    """把文件夹存入去重仓库，返回本次运行的文件索引路径"""
+    if not os.path.exists(input_path):
+        print(f"错误: 输入路径不存在: {input_path}")
+        sys.exit(1)
+
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+
+    try:
+        store = _Store(store_dir, crypto, create=True)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+
+    name = os.path.basename(input_path.rstrip(os.sep))
+    with stats_util.stage('scan'):
+        entries = scan_tree(input_path, scan_threads)
+    stats_util.add('scan', files=len(entries))
+
+    runs = store.runs(name)
+    previous = store.load_run(runs[-1][2])['files'] if runs else {}
+    run = runs[-1][1] + 1 if runs else 1
+    min_size, max_size, cdc_run = store.config['min_size'], store.config['max_size'], store.config['run']
+
+    files = {}
+    totals = {'bytes': 0, 'chunks': 0, 'new_chunks': 0, 'new_bytes': 0, 'reused_files': 0}
+    pending = set()  # 已提交压缩、还没有写入块包的块 ID
+    in_flight = deque()
+    writer = _PackWriter(store, pack_size)
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def write_ready(limit):
+        # 按提交顺序写入块包，同时在途的块不超过 limit 个，内存占用有上限
+        while len(in_flight) > limit:
+            chunk_id, size, result = in_flight.popleft()
+            blob = result.result() if executor else result
+            pack, offset = writer.append(blob)
+            store.chunks[chunk_id] = [pack, offset, len(blob), size]
+            pending.discard(chunk_id)
+
+    try:
+        with stats_util.stage('dedup'):
+            with stats_util.progress(len(entries), "去重进度") as pbar:
+                for file_path, rel_path, size, mtime_ns, mode in entries:
+                    arcname = rel_path.replace(os.sep, '/')
+                    old = previous.get(arcname)
+                    totals['bytes'] += size
+                    if old and old[0] == size and old[1] == mtime_ns and all(c in store.chunks for c in old[3]):
+                        # 没有变化的文件: 沿用上次的块列表，不读取
+                        files[arcname] = [size, mtime_ns, mode, old[3]]
+                        totals['chunks'] += len(old[3])
+                        totals['reused_files'] += 1
+                        pbar.update(1)
+                        continue
+
+                    chunk_ids = []
+                    with open(file_path, 'rb') as f:
+                        for data in _chunks(f, min_size, max_size, cdc_run):
+                            chunk_id = store.chunk_id(data)
+                            chunk_ids.append(chunk_id)
+                            totals['chunks'] += 1
+                            if chunk_id in store.chunks or chunk_id in pending:
+                                continue
+                            totals['new_chunks'] += 1
+                            totals['new_bytes'] += len(data)
+                            pending.add(chunk_id)
+                            result = executor.submit(store.pack_chunk, chunk_id, data, level) if executor \
+                                else store.pack_chunk(chunk_id, data, level)
+                            in_flight.append((chunk_id, len(data), result))
+                            write_ready(workers * 4)
+                    files[arcname] = [size, mtime_ns, mode, chunk_ids]
+                    pbar.update(1)
+                write_ready(0)
+            writer.close()
+            store.save_chunks()
+            dirs = {}
+            for rel_dir in entries.empty_dirs:
+                st = os.stat(os.path.join(input_path, rel_dir))
+                dirs[rel_dir.replace(os.sep, '/')] = [st.st_mtime_ns, st.st_mode]
+            index = {'version': STORE_VERSION, 'name': name, 'run': run, 'files': files, 'dirs': dirs,
+                     'stats': dict(totals, stored_bytes=writer.bytes_written)}
+            run_path = store.save_run(name, run, index)
+        stats_util.add('dedup', bytes_in=totals['bytes'], bytes_out=writer.bytes_written, files=len(entries))
+    except Exception as e:
+        writer.close()
+        print(f"存入去重仓库时出错: {str(e)}")
+        sys.exit(1)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    stats_util.log(f"去重: 源数据 {totals['bytes']} 字节, {len(entries)} 个文件（{totals['reused_files']} 个未变化，未读取）, "
+                   f"{totals['chunks']} 个块, 其中新增 {totals['new_chunks']} 个块 {totals['new_bytes']} 字节")
+    if writer.bytes_written:
+        # 去重比: 源数据 / 新增的不重复数据；总缩减比: 源数据 / 本次实际写入的块包数据（去重加压缩）
+        stats_util.log(f"写入块包 {writer.bytes_written} 字节; 去重比 {totals['bytes'] / totals['new_bytes']:.2f}x, "
+                       f"总缩减比 {totals['bytes'] / writer.bytes_written:.2f}x")
+    else:
+        stats_util.log("所有数据都已在仓库中，没有写入新的块")
+    stats_util.log(f"存入完成，第 {run} 次运行; 文件索引: {os.path.abspath(run_path)}")
+    return run_path
+
+
+def _target_path(output_dir, name):
+    """文件恢复后的路径（去掉 .. 等路径部分，不会写到输出目录之外）"""
+    parts = [part for part in name.split('/') if part not in ('', os.curdir, os.pardir)]
+    return os.path.join(output_dir, *parts)
+
+
+def _restore_metadata(path, mtime_ns, mode):
+    """恢复文件或目录的权限和修改时间"""
+    os.chmod(path, stat.S_IMODE(mode))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _restore_file(store, name, entry, output_dir):
+    """从块包中读出一个文件的所有块，写到输出目录并恢复权限和修改时间；同一块包只打开一次"""
+    target = _target_path(output_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    packs = {}
+    try:
+        with open(target, 'wb') as f_out:
+            for chunk_id in entry[3]:
+                pack, offset, length, _ = store.chunks[chunk_id]
+                if pack not in packs:
+                    # 每次都是定位后读取整个块，不需要缓冲（带缓冲时每次定位后都会多读一个缓冲区）
+                    packs[pack] = open(store.pack_path(pack), 'rb', buffering=0)
+                packs[pack].seek(offset)
+                f_out.write(store.unpack_chunk(chunk_id, packs[pack].read(length)))
+    finally:
+        for f in packs.values():
+            f.close()
+    _restore_metadata(target, entry[1], entry[2])
+    return entry[0]
+
+
+# 此函数用于从去重仓库恢复某次运行的快照: 按文件索引直接从块包中读出各个块，解密、解压并校验后写出，
+# 并恢复文件的权限和修改时间，以及存入时的空目录。
+# 参数:
+# store_dir: 去重仓库目录。
+# output_dir: 输出目录路径。
+# crypto: 加密密码，加密的仓库必须给出。
+# name: 要恢复的输入名称（存入时输入文件夹的名字），可选参数；仓库中只有一个名称时可以省略。
+# run: 要恢复的运行序号，可选参数，默认为最近一次。
+# workers: 并行恢复文件的线程数，可选参数，默认为 1。
+def restore_store(store_dir, output_dir, crypto=None, name=None, run=None, workers=1):
+    """从去重仓库恢复文件"""
+    try:
+        store = _Store(store_dir, crypto)
+        runs = store.runs(name)
+        if not runs:
+            raise ValueError(f"去重仓库中没有运行索引: {store_dir}")
+        names = sorted({run_name for run_name, _, _ in runs})
+        if len(names) > 1:
+            raise ValueError(f"去重仓库中有多个名称，请指定要恢复的名称: {', '.join(names)}")
+        matched = [run_path for _, number, run_path in runs if run is None or number == run]
+        if not matched:
+            raise ValueError(f"没有第 {run} 次运行，已有: {', '.join(str(number) for _, number, _ in runs)}")
+        index = store.load_run(matched[-1])
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    files = index['files']
+    try:
+        with stats_util.stage('restore'):
+            with stats_util.progress(len(files), "恢复进度") as pbar, \
+                    ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                restored = 0
+                for size in executor.map(lambda item: _restore_file(store, item[0], item[1], output_dir), files.items()):
+                    restored += size
+                    pbar.update(1)
+            for rel_dir, (mtime_ns, mode) in index.get('dirs', {}).items():
+                target = _target_path(output_dir, rel_dir)
+                os.makedirs(target, exist_ok=True)
+                _restore_metadata(target, mtime_ns, mode)
+        stats_util.add('restore', bytes_out=restored, files=len(files))
+    except Exception as e:
+        print(f"恢复过程中出错: {str(e)}")
+        sys.exit(1)
+
+    stats_util.log(f"恢复完成，{index['name']} 第 {index['run']} 次运行, 共 {len(files)} 个文件; 输出路径: {os.path.abspath(output_dir)}")
+    return output_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="去重仓库: 按内容定义分块，重复的数据只保存一份")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # 存入子命令
+    store_parser = subparsers.add_parser('store', help='把文件/文件夹存入去重仓库')
+    store_parser.add_argument("-i", "--input", required=True, help="输入文件或文件夹路径")
+    store_parser.add_argument("-o", "--output", required=True, help="去重仓库目录")
+    store_parser.add_argument("-c", "--crypto", help="加密密码(可选，第一次运行时确定仓库是否加密)")
+    store_parser.add_argument("-w", "--workers", type=int, default=1, help="压缩和加密块的线程数(可选，默认 1)")
+    store_parser.add_argument("-s", "--size", type=int, default=DEFAULT_PACK_SIZE, help="块包大小(字节，可选，默认 64MB)")
+    store_parser.add_argument("--level", type=int, default=6, help="deflate 压缩级别(可选，默认 6)")
+    store_parser.add_argument("--scan-threads", type=int, default=1, help="扫描目录的线程数(可选，默认 1)")
+
+    # 恢复子命令
+    restore_parser = subparsers.add_parser('restore', help='从去重仓库恢复文件')
+    restore_parser.add_argument("-i", "--input", required=True, help="去重仓库目录")
+    restore_parser.add_argument("-o", "--output", required=True, help="输出目录路径")
+    restore_parser.add_argument("-c", "--crypto", help="加密密码(加密的仓库必须给出)")
+    restore_parser.add_argument("--name", help="要恢复的名称(可选，仓库中只有一个名称时可省略)")
+    restore_parser.add_argument("--run", type=int, help="要恢复的运行序号(可选，默认最近一次)")
+    restore_parser.add_argument("-w", "--workers", type=int, default=1, help="并行恢复的线程数(可选，默认 1)")
+
+    for sub_parser in (store_parser, restore_parser):
+        stats_util.add_arguments(sub_parser)
+
+    args = parser.parse_args()
+
+    with stats_util.cli_session(args):
+        if args.command == 'store':
+            store_folder(args.input, args.output, crypto=args.crypto, workers=args.workers, pack_size=args.size,
+                         level=args.level, scan_threads=args.scan_threads)
+        elif args.command == 'restore':
+            restore_store(args.input, args.output, crypto=args.crypto, name=args.name, run=args.run, workers=args.workers)
+
+    # 使用例子:
+    # 存入（第一次运行新建仓库，之后每次运行只保存新的块）: python dedup_util.py store -i /path/to/input_folder -o /path/to/store
+    # 加密的仓库，4 个线程压缩和加密: python dedup_util.py store -i /path/to/input_folder -o /path/to/store -c mypassword -w 4
+    # 多个文件夹可以存入同一个仓库，相互之间的重复数据也只保存一份。
+    # 恢复最近一次的快照: python dedup_util.py restore -i /path/to/store -o /path/to/output_folder [-c mypassword]
+    # 恢复指定名称的第 3 次运行: python dedup_util.py restore -i /path/to/store -o /path/to/output_folder --name input_folder --run 3
+    # 存入完成时输出去重比（源数据 / 新增的不重复数据）和总缩减比（源数据 / 实际写入的块包数据）。
@@ -1,10 +1,253 @@
 import os
 import sys
+import json
+import mmap
+import errno
+import struct
+import hashlib
+import fnmatch
 import argparse
 from itertools import cycle
-
-def merge_files(data_dir, img_dir, output_dir):
-    """合并数据文件和图片文件"""
+from concurrent.futures import ThreadPoolExecutor
+import stats_util
+import journal_util
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# 流式拷贝时的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+# 合并文件中源文件名行的最大长度
+MAX_NAME_LINE = 4096
+
+# 合并文件的格式: [PNG 图片][源文件名\n][数据][索引][尾部]
+# 索引为 UTF-8 JSON，记录 图片长度、数据偏移和长度、源文件名、源文件大小 和 数据的 SHA-256；
+# 尾部固定 9 字节: 索引长度(4) + 版本(1) + 魔数 b'ZCMT'(4)。
+# 读取时只需读文件最后的几个字节就能定位所有内容，不用读数据本身。
+# 没有尾部的旧文件（只有 源文件名\n 一行）仍然可以恢复。
+# 版本 2: 大文件按分片大小拆到多张图片中，索引增加 file_id、shard_index、shard_count、shard_offset
+#         （数据只是源文件的一段，sha256 为该分片的哈希，size 仍为整个源文件的大小）；不分片的文件仍写版本 1。
+TRAILER_MAGIC = b'ZCMT'
+TRAILER_VERSION = 2
+TRAILER_FOOTER = struct.Struct('>IB4s')
+
+def _png_end(f, file_size):
+    """按 chunk 头（长度 + 类型）逐个跳过 PNG 的各个 chunk，返回 IEND chunk 结束处的偏移
+
+    只读取每个 chunk 的 8 字节头，不读取图像数据，也不会被图像数据中恰好出现的 b'IEND' 误导。
+    不是合法的 PNG 结构时返回 -1。
+    """
+    f.seek(0)
+    if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        return -1
+    pos = len(PNG_SIGNATURE)
+    while pos + 12 <= file_size:
+        f.seek(pos)
+        length, kind = struct.unpack('>I4s', f.read(8))
+        pos += 12 + length  # 长度(4) + 类型(4) + 数据 + CRC(4)
+        if kind == b'IEND':
+            return pos if pos <= file_size else -1
+    return -1
+
+def _scan_iend(f):
+    """兼容旧行为: 按固定大小的块顺序查找第一个 b'IEND'，返回其后 8 字节处的偏移，找不到返回 -1"""
+    f.seek(0)
+    offset = 0
+    tail = b''
+    while True:
+        block = f.read(COPY_BUFFER_SIZE)
+        if not block:
+            return -1
+        data = tail + block
+        index = data.find(b'IEND')
+        if index != -1:
+            return offset - len(tail) + index + 8
+        tail = data[-3:]
+        offset += len(block)
+
+def _copy_range(f_in, f_out, offset, length):
+    """把 f_in 中 [offset, offset + length) 的内容拷贝到 f_out 的当前位置
+
+    优先使用内核态拷贝 os.copy_file_range / os.sendfile（数据不经过用户态），
+    不支持时退回到固定大小缓冲区的读写循环，内存占用与文件大小无关。
+    """
+    f_out.flush()
+    start = f_out.tell()
+    in_fd, out_fd = f_in.fileno(), f_out.fileno()
+    copied = 0
+    for kernel_copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if kernel_copy is None:
+            continue
+        try:
+            while copied < length:
+                if kernel_copy is os.sendfile:
+                    n = os.sendfile(out_fd, in_fd, offset + copied, length - copied)
+                else:
+                    n = os.copy_file_range(in_fd, out_fd, length - copied, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+            break
+        except OSError as e:
+            if copied or e.errno not in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP,
+                                         errno.ENOTSOCK, errno.EBADF, errno.EPERM):
+                raise
+    # 内核拷贝直接移动了文件描述符的位置，同步 Python 文件对象的位置
+    f_out.seek(start + copied)
+    if copied < length:
+        f_in.seek(offset + copied)
+        remaining = length - copied
+        while remaining > 0:
+            chunk = f_in.read(min(COPY_BUFFER_SIZE, remaining))
+            if not chunk:
+                break
+            f_out.write(chunk)
+            remaining -= len(chunk)
+            copied += len(chunk)
+    if copied != length:
+        raise ValueError(f"文件长度不足，期望拷贝 {length} 字节，实际 {copied} 字节")
+
+def _file_sha256(f, offset=0, length=None):
+    """计算文件中 [offset, offset + length) 的 SHA-256（length 为 None 时到文件末尾）
+
+    用 mmap 交给 hashlib，不把数据复制到 Python 的缓冲区中。
+    """
+    digest = hashlib.sha256()
+    f.flush()
+    file_size = os.fstat(f.fileno()).st_size
+    if length is None:
+        length = file_size - offset
+    if offset + length > file_size:
+        raise ValueError("文件长度不足，文件可能已损坏")
+    if length:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                digest.update(view[offset:offset + length])
+    return digest.hexdigest()
+
+def _pack_trailer(index):
+    """生成写在合并文件末尾的索引和尾部（带分片信息时为版本 2，否则为版本 1）"""
+    body = json.dumps(index, ensure_ascii=False).encode('utf-8')
+    version = TRAILER_VERSION if 'shard_index' in index else 1
+    return body + TRAILER_FOOTER.pack(len(body), version, TRAILER_MAGIC)
+
+def _read_index(f, file_size):
+    """读取合并文件的索引，只读取文件尾部（旧格式文件只读 PNG 的 chunk 头和文件名行），不读取数据
+
+    返回 dict: version、image_length、payload_offset、payload_length、name、size、sha256
+    （旧格式文件的 version 为 0，sha256 为 None）。不是合并文件时抛出 ValueError。
+    """
+    if file_size >= TRAILER_FOOTER.size:
+        f.seek(file_size - TRAILER_FOOTER.size)
+        body_length, version, magic = TRAILER_FOOTER.unpack(f.read(TRAILER_FOOTER.size))
+        if magic == TRAILER_MAGIC:
+            if version > TRAILER_VERSION:
+                raise ValueError(f"不支持的索引版本: {version}")
+            if body_length > file_size - TRAILER_FOOTER.size:
+                raise ValueError("索引长度无效，文件可能已损坏")
+            f.seek(file_size - TRAILER_FOOTER.size - body_length)
+            try:
+                index = json.loads(f.read(body_length).decode('utf-8'))
+            except ValueError:
+                raise ValueError("索引已损坏")
+            index['version'] = version
+            return index
+
+    # 旧格式: 按 chunk 结构定位PNG文件结尾（不是标准 PNG 结构时退回到查找 IEND）
+    png_end = _png_end(f, file_size)
+    if png_end == -1:
+        png_end = _scan_iend(f)
+    if png_end == -1:
+        raise ValueError("无效的合并文件")
+
+    # 提取源文件名(图片之后的第一行)
+    f.seek(png_end)
+    name_line = f.readline(MAX_NAME_LINE)
+    if not name_line.endswith(b'\n'):
+        raise ValueError("无效的数据格式")
+    payload_offset = png_end + len(name_line)
+    return {
+        'version': 0,
+        'image_length': png_end,
+        'payload_offset': payload_offset,
+        'payload_length': file_size - payload_offset,
+        'name': name_line[:-1].decode('utf-8'),
+        'size': file_size - payload_offset,
+        'sha256': None,
+    }
+
+def _plan_outputs(count, img_files, output_dir):
+    """预先为每个要写出的合并文件分配图片和输出文件名，返回 [(图片文件, 输出路径)]
+
+    文件名在主线程中一次性确定（以图片名命名，重复时加 _1、_2 ... 后缀，跳过输出目录中已有的文件），
+    结果只取决于输入，多个线程并行写出时也不会互相冲突。
+    """
+    taken = set(os.listdir(output_dir))
+    next_counter = {}
+    plan = []
+    img_cycle = cycle(img_files)  # 创建循环迭代器
+    for _ in range(count):
+        img_file = next(img_cycle)
+        output_name = os.path.splitext(img_file)[0]
+        output_ext = '.png'
+        candidate = f"{output_name}{output_ext}"
+        counter = next_counter.get(output_name, 1)
+        while candidate in taken:
+            candidate = f"{output_name}_{counter}{output_ext}"
+            counter += 1
+        next_counter[output_name] = counter
+        taken.add(candidate)
+        plan.append((img_file, os.path.join(output_dir, candidate)))
+    return plan
+
+def _split_shards(data_dir, data_files, shard_size):
+    """把数据文件拆成要写出的片段，返回 [(数据文件, 偏移, 长度, 分片信息)]；不分片的文件分片信息为 None"""
+    pieces = []
+    for data_file in data_files:
+        st = os.stat(os.path.join(data_dir, data_file))
+        if not shard_size or st.st_size <= shard_size:
+            pieces.append((data_file, 0, st.st_size, None))
+            continue
+        count = -(-st.st_size // shard_size)
+        # 同名的不同文件靠 file_id 区分（由文件名、大小和修改时间得到）
+        file_id = hashlib.sha256(f"{data_file}\0{st.st_size}\0{st.st_mtime_ns}".encode('utf-8')).hexdigest()[:16]
+        for i in range(count):
+            offset = i * shard_size
+            pieces.append((data_file, offset, min(shard_size, st.st_size - offset),
+                           {'file_id': file_id, 'shard_index': i, 'shard_count': count, 'size': st.st_size}))
+    return pieces
+
+def _merge_one(task):
+    """写出一个合并文件: 图片（已缓存在内存中）+ 源文件名行 + 数据（内核态拷贝）+ 索引，返回 (输入字节数, 输出字节数)"""
+    data_path, data_file, offset, length, shard, img_content, output_path = task
+    # 将源文件名信息添加到数据内容前（没有索引的旧工具也能看到文件名）
+    file_info = f"{data_file}\n".encode('utf-8')
+    with open(data_path, 'rb') as f_in, open(output_path, 'xb') as f_out:
+        f_out.write(img_content)
+        f_out.write(file_info)
+        _copy_range(f_in, f_out, offset, length)
+        index = {
+            'image_length': len(img_content),
+            'payload_offset': len(img_content) + len(file_info),
+            'payload_length': length,
+            'name': data_file,
+            'size': length,
+            'sha256': _file_sha256(f_in, offset, length),
+        }
+        if shard:
+            index.update(shard)
+            index['shard_offset'] = offset
+        f_out.write(_pack_trailer(index))
+        # 写入磁盘后才记入任务日志（断点续传）
+        f_out.flush()
+        os.fsync(f_out.fileno())
+        return len(img_content) + length, f_out.tell()
+
+def merge_files(data_dir, img_dir, output_dir, workers=1, shard_size=None, resume=False):
+    """合并数据文件和图片文件
+
+    workers: 并行写出合并文件的线程数（主要是磁盘 I/O，数据通过内核态拷贝，不占用 Python 的 CPU）。
+    shard_size: 每张图片携带的最大数据量（字节），大于它的数据文件会拆成多个分片，依次附加到图片池中的多张图片上。
+    resume: 断点续传，沿用上次的输出文件名分配，跳过任务日志中已经写完的合并文件。
+    """
     # 检查输入目录
     if not os.path.exists(data_dir):
         print(f"错误: 数据目录不存在 - {data_dir}")
@@ -12,17 +255,20 @@ def merge_files(data_dir, img_dir, output_dir):
     if not os.path.exists(img_dir):
         print(f"错误: 图片目录不存在 - {img_dir}")
         sys.exit(1)
+    if shard_size is not None and shard_size <= 0:
+        print(f"错误: 分片大小必须大于 0: {shard_size}")
+        sys.exit(1)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # 获取所有数据文件（过滤文件夹）
-    data_files = [f for f in os.listdir(data_dir)
-                 if os.path.isfile(os.path.join(data_dir, f))]
+    # 获取所有数据文件（过滤文件夹），排序以保证图片分配和文件名是确定的
+    data_files = sorted(f for f in os.listdir(data_dir)
+                        if os.path.isfile(os.path.join(data_dir, f)))
 
     # 获取所有PNG图片文件
-    img_files = [f for f in os.listdir(img_dir)
-                if f.lower().endswith('.png') and
-                os.path.isfile(os.path.join(img_dir, f))]
+    img_files = sorted(f for f in os.listdir(img_dir)
+                       if f.lower().endswith('.png') and
+                       os.path.isfile(os.path.join(img_dir, f)))
 
     if not data_files:
         print(f"错误: 目录 {data_dir} 目录中没有文件")
@@ -32,48 +278,83 @@ def merge_files(data_dir, img_dir, output_dir):
         print(f"错误: 目录 {img_dir} 目录中没有PNG文件")
         sys.exit(1)
 
-    img_cycle = cycle(img_files)  # 创建循环迭代器
-
-    for data_file in data_files:
-        img_file = next(img_cycle)
-        data_name, data_ext = os.path.splitext(data_file)
-
-        # 构建输出文件名(基于图片名)
-        output_name = os.path.splitext(img_file)[0]
-        output_ext = '.png'
-        output_path = os.path.join(output_dir, f"{output_name}{output_ext}")
-
-        # 处理文件名冲突
-        counter = 1
-        while os.path.exists(output_path):
-            output_path = os.path.join(output_dir, f"{output_name}_{counter}{output_ext}")
-            counter += 1
-
-        try:
-            # 读取文件内容
-            with open(os.path.join(data_dir, data_file), 'rb') as f:
-                data_content = f.read()
-            with open(os.path.join(img_dir, img_file), 'rb') as f:
-                img_content = f.read()
-
-            # 将源文件名信息添加到数据内容前
-            file_info = f"{data_file}\n".encode('utf-8')
-            # 打印文件名
-            print(f"合并数据文件: {data_file}")
-
-            merged_data = file_info + data_content
-
-            # 写入合并文件
-            with open(output_path, 'wb') as f:
-                f.write(img_content)
-                f.write(merged_data)
+    pieces = _split_shards(data_dir, data_files, shard_size)
 
-        except Exception as e:
-            print(f"文件合并失败: {str(e)}")
+    # 任务日志: 第一个检查点为输出文件名的分配（续传时输出目录中已有上次写出的文件，不能重新分配），之后每写完一个文件记一条
+    try:
+        journal = journal_util.Journal.open(
+            journal_util.journal_path(output_dir, 'merge_files'), 'merge_files',
+            {'data': os.path.abspath(data_dir), 'images': os.path.abspath(img_dir), 'shard_size': shard_size},
+            resume=resume)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+    plans = [record['plan'] for record in journal.records if 'plan' in record]
+    if plans:
+        if [piece[:3] for piece in plans[0]] != [list(piece[:3]) for piece in pieces]:
+            journal.close()
+            print("错误: 数据文件与上次运行时不同，无法续传（去掉 --resume 重新开始）")
             sys.exit(1)
-
-def recover_files(input_dir, output_dir):
-    """恢复原始文件"""
+        plan = [(img_file, os.path.join(output_dir, output_name)) for _, _, _, img_file, output_name in plans[0]]
+    else:
+        plan = _plan_outputs(len(pieces), img_files, output_dir)
+        journal.append({'plan': [[data_file, offset, length, img_file, os.path.basename(output_path)]
+                                 for (data_file, offset, length, _), (img_file, output_path) in zip(pieces, plan)]})
+    done = {record['output'] for record in journal.records if 'output' in record}
+    if done:
+        stats_util.log(f"续传: 跳过已写出的 {len(done)} 个合并文件")
+    pending = []
+    for piece, (img_file, output_path) in zip(pieces, plan):
+        if os.path.basename(output_path) in done and os.path.exists(output_path):
+            continue
+        # 上次写了一半的文件
+        if plans and os.path.exists(output_path):
+            os.remove(output_path)
+        pending.append((piece, (img_file, output_path)))
+    pieces = [piece for piece, _ in pending]
+    plan = [item for _, item in pending]
+
+    # 每张图片只读取一次
+    images = {}
+    for img_file in {img_file for img_file, _ in plan}:
+        with open(os.path.join(img_dir, img_file), 'rb') as f:
+            images[img_file] = f.read()
+
+    tasks = [(os.path.join(data_dir, data_file), data_file, offset, length, shard, images[img_file], output_path)
+             for (data_file, offset, length, shard), (img_file, output_path) in zip(pieces, plan)]
+
+    with stats_util.stage('merge_files'), ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # 按提交顺序取结果，第一个失败的文件会终止整个合并
+        for (data_file, _, _, shard), (_, output_path), future in zip(pieces, plan, [executor.submit(_merge_one, task) for task in tasks]):
+            try:
+                bytes_in, bytes_out = future.result()
+            except Exception as e:
+                print(f"文件合并失败: {data_file}: {str(e)}（加上 --resume 重新运行即可续传）")
+                executor.shutdown(wait=True, cancel_futures=True)
+                journal.close()
+                sys.exit(1)
+            journal.append({'output': os.path.basename(output_path)})
+            # 打印文件名
+            if shard:
+                stats_util.log(f"合并数据文件: {data_file} (分片 {shard['shard_index'] + 1}/{shard['shard_count']})")
+            else:
+                stats_util.log(f"合并数据文件: {data_file}")
+            stats_util.add('merge_files', bytes_in=bytes_in, bytes_out=bytes_out, files=1)
+    journal.finish()
+
+def _list_merged(input_dir):
+    """列出目录中的合并文件（不区分大小写的 .png），按文件名排序"""
+    return sorted(f for f in os.listdir(input_dir)
+                  if f.lower().endswith('.png') and
+                  os.path.isfile(os.path.join(input_dir, f)))
+
+def recover_files(input_dir, output_dir, only=None, workers=1, resume=False):
+    """恢复原始文件
+
+    only: 源文件名的通配符列表（如 ['*.zip', 'data_part1*']），给出时只恢复匹配的文件。
+    workers: 并行恢复的线程数；分片文件的各个分片并行写入预先分配好大小的输出文件的各自偏移处。
+    resume: 断点续传，跳过任务日志中已经恢复完的合并文件（分片文件保留已写入的分片）。
+    """
     # 检查输入输出目录
     if not os.path.exists(input_dir):
         print(f"错误: 输入目录不存在 - {input_dir}")
@@ -89,55 +370,186 @@ def recover_files(input_dir, output_dir):
     os.makedirs(img_output, exist_ok=True)
 
     # 获取所有合并文件
-    merge_files = [f for f in os.listdir(input_dir)
-                if f.lower().endswith('.png') and
-                os.path.isfile(os.path.join(input_dir, f))]
+    merge_files = _list_merged(input_dir)
 
     if not merge_files:
         print(f"错误: 目录 {input_dir} 中没有 png 文件")
         sys.exit(1)
 
+    try:
+        journal = journal_util.Journal.open(
+            journal_util.journal_path(output_dir, 'recover_files'), 'recover_files',
+            {'input': os.path.abspath(input_dir), 'only': only}, resume=resume)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+    with stats_util.stage('recover'):
+        _recover_all(merge_files, input_dir, data_output, img_output, only, workers, journal)
+    journal.finish()
+
+def _check_shards(entries):
+    """检查分片是否齐全（在写出任何文件之前），返回 {file_id: (源文件名, 源文件大小)}"""
+    groups = {}
+    for merge_file, index in entries:
+        if 'shard_index' in index:
+            groups.setdefault(index['file_id'], []).append((merge_file, index))
+
+    result = {}
+    for file_id, shards in groups.items():
+        name, size, count = shards[0][1]['name'], shards[0][1]['size'], shards[0][1]['shard_count']
+        found = {}
+        for merge_file, index in shards:
+            if (index['name'], index['size'], index['shard_count']) != (name, size, count):
+                raise ValueError(f"分片信息不一致: {merge_file}")
+            if index['shard_index'] in found:
+                raise ValueError(f"{name} 的第 {index['shard_index'] + 1} 个分片重复: {found[index['shard_index']]}, {merge_file}")
+            found[index['shard_index']] = merge_file
+        missing = [str(i + 1) for i in range(count) if i not in found]
+        if missing:
+            raise ValueError(f"{name} 缺少分片 {', '.join(missing)}（共 {count} 个）")
+        result[file_id] = (name, size)
+    return result
+
+def _check_name(name):
+    """尾部索引中的源文件名来自合并文件本身，不可信: 只允许单纯的文件名，防止写到输出目录之外"""
+    if (not isinstance(name, str) or name in ('', '.', '..') or '/' in name or '\\' in name
+            or name != os.path.basename(name) or os.path.splitdrive(name)[0]):
+        raise ValueError(f"索引中的源文件名不合法: {name!r}")
+
+def _check_duplicates(entries):
+    """检查是否有多个合并文件恢复到同一个源文件名（同一文件的各个分片除外），并行写同一个文件会互相覆盖"""
+    owners = {}
+    for merge_file, index in entries:
+        owner = index['file_id'] if 'shard_index' in index else merge_file
+        if owners.setdefault(index['name'], (owner, merge_file))[0] != owner:
+            raise ValueError(f"多个合并文件恢复到同一个文件名 {index['name']}: {owners[index['name']][1]}, {merge_file}")
+
+def _recover_one(task):
+    """恢复一个合并文件: 先校验数据的哈希，再把数据写到输出文件的指定偏移处，最后写出图片，返回 (输入字节数, 输出字节数)"""
+    merge_path, index, data_path, data_offset, img_path = task
+    with open(merge_path, 'rb') as f:
+        if index['sha256'] and _file_sha256(f, index['payload_offset'], index['payload_length']) != index['sha256']:
+            raise ValueError(f"{index['name']} 校验失败，文件可能已损坏")
+
+        # 保存恢复的文件(使用原始文件名)，分离图片和数据时流式拷贝，不把整个文件读入内存
+        # 写入磁盘后才记入任务日志（断点续传）
+        with open(data_path, 'r+b' if data_offset is not None else 'wb') as f_out:
+            f_out.seek(data_offset or 0)
+            _copy_range(f, f_out, index['payload_offset'], index['payload_length'])
+            f_out.flush()
+            os.fsync(f_out.fileno())
+
+        # 保存恢复的图片
+        with open(img_path, 'wb') as f_out:
+            _copy_range(f, f_out, 0, index['image_length'])
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        return os.fstat(f.fileno()).st_size, index['image_length'] + index['payload_length']
+
+def _recover_all(merge_files, input_dir, data_output, img_output, only, workers, journal):
+    """把合并文件拆分为数据文件和图片: 先读取所有索引并检查分片，再并行写出（跳过任务日志中已完成的）"""
+    entries = []
     for merge_file in merge_files:
-        merge_path = os.path.join(input_dir, merge_file)
-        base_name = os.path.splitext(merge_file)[0]
-
         try:
-            with open(merge_path, 'rb') as f:
-                content = f.read()
-
-                # 查找PNG文件结尾
-                png_end = content.find(b'IEND')
-                if png_end == -1:
-                    print(f"无效的合并文件: {merge_file}")
-                    sys.exit(1)
-
-                # 分离图片和数据
-                img_content = content[:png_end+8]
-                data_content = content[png_end+8:]
-
-                # 提取源文件名(第一行)
-                first_newline = data_content.find(b'\n')
-                if first_newline == -1:
-                    print(f"无效的数据格式: {merge_file}")
-                    sys.exit(1)
-
-                original_name = data_content[:first_newline].decode('utf-8')
-                # 打印文件名
-                print(f"恢复文件: {original_name}")
+            with open(os.path.join(input_dir, merge_file), 'rb') as f:
+                index = _read_index(f, os.fstat(f.fileno()).st_size)
+        except Exception as e:
+            print(f"文件恢复失败: {merge_file}: {str(e)}")
+            sys.exit(1)
+        if only and not any(fnmatch.fnmatch(index['name'], pattern) for pattern in only):
+            continue
+        entries.append((merge_file, index))
 
-                actual_data = data_content[first_newline+1:]
+    try:
+        for merge_file, index in entries:
+            try:
+                _check_name(index['name'])
+            except ValueError as e:
+                raise ValueError(f"{merge_file}: {str(e)}")
+        _check_duplicates(entries)
+        sharded = _check_shards(entries)
+    except ValueError as e:
+        print(f"文件恢复失败: {str(e)}")
+        sys.exit(1)
 
-                # 保存恢复的文件(使用原始文件名)
-                with open(os.path.join(data_output, original_name), 'wb') as f:
-                    f.write(actual_data)
+    # 续传: 输出文件还在（分片文件大小也正确）的已完成条目不再恢复
+    done = {record['file'] for record in journal.records}
+    kept = set()
+    for file_id, (name, size) in sharded.items():
+        data_path = os.path.join(data_output, name)
+        if os.path.isfile(data_path) and os.path.getsize(data_path) == size:
+            kept.add(file_id)
 
-                # 保存恢复的图片
-                with open(os.path.join(img_output, f"{base_name}.png"), 'wb') as f:
-                    f.write(img_content)
+    def finished(merge_file, index):
+        base_name = os.path.splitext(merge_file)[0]
+        if merge_file not in done or not os.path.exists(os.path.join(img_output, f"{base_name}.png")):
+            return False
+        if 'shard_index' in index:
+            return index['file_id'] in kept
+        return os.path.exists(os.path.join(data_output, index['name']))
+
+    entries = [(merge_file, index) for merge_file, index in entries if not finished(merge_file, index)]
+    if done:
+        stats_util.log(f"续传: 还有 {len(entries)} 个合并文件需要恢复")
+
+    # 分片文件预先分配好大小，各分片直接写到自己的偏移处（续传时保留已写入的分片）
+    for file_id, (name, size) in sharded.items():
+        if file_id not in kept:
+            with open(os.path.join(data_output, name), 'wb') as f_out:
+                f_out.truncate(size)
+
+    tasks = []
+    for merge_file, index in entries:
+        base_name = os.path.splitext(merge_file)[0]
+        tasks.append((os.path.join(input_dir, merge_file), index, os.path.join(data_output, index['name']),
+                      index.get('shard_offset'), os.path.join(img_output, f"{base_name}.png")))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (merge_file, index), future in zip(entries, [executor.submit(_recover_one, task) for task in tasks]):
+            try:
+                bytes_in, bytes_out = future.result()
+            except Exception as e:
+                print(f"文件恢复失败: {merge_file}: {str(e)}")
+                executor.shutdown(wait=True, cancel_futures=True)
+                journal.close()
+                sys.exit(1)
+            journal.append({'file': merge_file})
+            # 打印文件名
+            if 'shard_index' in index:
+                stats_util.log(f"恢复文件: {index['name']} (分片 {index['shard_index'] + 1}/{index['shard_count']})")
+            else:
+                stats_util.log(f"恢复文件: {index['name']}")
+            stats_util.add('recover', bytes_in=bytes_in, bytes_out=bytes_out, files=1)
+
+def list_files(input_dir, as_json=False):
+    """列出合并文件中的内容（只读取每个文件的尾部索引，不读取数据）"""
+    if not os.path.exists(input_dir):
+        print(f"错误: 输入目录不存在 - {input_dir}")
+        sys.exit(1)
 
-        except Exception as e:
-            print(f"文件恢复失败: {str(e)}")
-            sys.exit(1)
+    entries = []
+    with stats_util.stage('list'):
+        for merge_file in _list_merged(input_dir):
+            with open(os.path.join(input_dir, merge_file), 'rb') as f:
+                try:
+                    index = _read_index(f, os.fstat(f.fileno()).st_size)
+                except ValueError as e:
+                    index = {'error': str(e)}
+            index['file'] = merge_file
+            entries.append(index)
+    stats_util.add('list', files=len(entries))
+
+    if as_json:
+        print(json.dumps(entries, ensure_ascii=False, indent=2))
+        return entries
+    for entry in entries:
+        if 'error' in entry:
+            print(f"{entry['file']}: {entry['error']}")
+        else:
+            digest = entry['sha256'][:16] if entry['sha256'] else '-(旧格式)'
+            shard = f"  分片 {entry['shard_index'] + 1}/{entry['shard_count']}" if 'shard_index' in entry else ''
+            print(f"{entry['file']}: {entry['name']}  {entry['size']} 字节{shard}  sha256 {digest}")
+    return entries
 
 def main():
     parser = argparse.ArgumentParser(description="文件合并与恢复工具")
@@ -148,19 +560,36 @@ def main():
     merge_parser.add_argument('-d', '--data', required=True, help='数据文件目录')
     merge_parser.add_argument('-i', '--images', required=True, help='png 图片目录')
     merge_parser.add_argument('-o', '--output', required=True, help='输出目录')
+    merge_parser.add_argument('-w', '--workers', type=int, default=1, help='并行写出的线程数(可选，默认 1)')
+    merge_parser.add_argument('-s', '--shard-size', type=int, help='每张图片携带的最大数据量(字节，可选)，更大的文件拆成多个分片')
+    merge_parser.add_argument('--resume', action='store_true', help='断点续传: 跳过上次中断前已写出的合并文件(可选)')
 
     # 恢复命令
     recover_parser = subparsers.add_parser('recover', help='恢复文件')
     recover_parser.add_argument('-i', '--input', required=True, help='输入目录')
     recover_parser.add_argument('-o', '--output', required=True, help='输出目录')
+    recover_parser.add_argument('--only', action='append', help='只恢复源文件名匹配该通配符的文件(可多次指定，可选)')
+    recover_parser.add_argument('-w', '--workers', type=int, default=1, help='并行恢复的线程数(可选，默认 1)')
+    recover_parser.add_argument('--resume', action='store_true', help='断点续传: 跳过上次中断前已恢复的文件(可选)')
+
+    # 列出命令
+    list_parser = subparsers.add_parser('list', help='列出合并文件中的内容(不读取数据)')
+    list_parser.add_argument('-i', '--input', required=True, help='输入目录')
+    list_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+
+    for sub_parser in (merge_parser, recover_parser, list_parser):
+        stats_util.add_arguments(sub_parser)
 
     args = parser.parse_args()
 
     try:
-        if args.command == 'merge':
-            merge_files(args.data, args.images, args.output)
-        elif args.command == 'recover':
-            recover_files(args.input, args.output)
+        with stats_util.cli_session(args):
+            if args.command == 'merge':
+                merge_files(args.data, args.images, args.output, args.workers, args.shard_size, args.resume)
+            elif args.command == 'recover':
+                recover_files(args.input, args.output, args.only, args.workers, args.resume)
+            elif args.command == 'list':
+                list_files(args.input, args.json)
     except Exception as e:
         print(f"错误: {str(e)}")
         sys.exit(1)
@@ -183,9 +612,30 @@ if __name__ == '__main__':
     # 合并文件（Merge files）:
     # python merge.py merge -d /path/to/data_dir -i /path/to/img_dir -o /path/to/output_dir
 
+    # 使用 8 个线程并行合并大量文件（Merge a large batch with 8 threads）:
+    # python merge.py merge -d /path/to/data_dir -i /path/to/img_dir -o /path/to/output_dir -w 8
+
     # 恢复文件（Recover files）:
     # python merge.py recover -i /path/to/input_dir -o /path/to/output_dir
 
+    # 分片: 每张图片最多携带 100MB 数据，大文件依次拆到多张图片中；恢复时用 4 个线程并行拼回
+    # （Sharding: at most 100MB per image; shards are reassembled in parallel on recovery）:
+    # python merge.py merge -d /path/to/data_dir -i /path/to/img_dir -o /path/to/output_dir -s 104857600
+    # python merge.py recover -i /path/to/input_dir -o /path/to/output_dir -w 4
+
+    # 列出合并文件中的内容，只读取每个文件末尾的索引（List contents by reading only each file's trailer index）:
+    # python merge.py list -i /path/to/input_dir
+
+    # 只恢复源文件名匹配的文件（Recover only matching files）:
+    # python merge.py recover -i /path/to/input_dir -o /path/to/output_dir --only "*_part1.zip" --only "*.enc"
+
+    # 把耗时、字节数等统计写入 JSON，并且不逐个打印文件名（Write stats to JSON and skip per-file messages）:
+    # python merge.py merge -d /path/to/data_dir -i /path/to/img_dir -o /path/to/output_dir --stats-json stats.json -q
+
+    # 中断后断点续传，用相同的参数加上 --resume 重新运行（Resume after an interruption with the same arguments plus --resume）:
+    # python merge.py merge -d /path/to/data_dir -i /path/to/img_dir -o /path/to/output_dir --resume
+    # python merge.py recover -i /path/to/input_dir -o /path/to/output_dir --resume
+
     # 注意（Note）:
 
     # 提供的图片必须是 png 格式。合并后的图片文件仍然可以打开。
@@ -199,5 +649,9 @@ if __name__ == '__main__':
     # 如果图片名字有重复则会自动加计数后缀。
     # （If the image names are repeated, the counting suffix will be automatically added.）
 
+    # 合并文件末尾带有索引（源文件名、大小、SHA-256 等），恢复时会校验数据；没有索引的旧合并文件仍可恢复。
+    # （Merged files end with an index (name, size, SHA-256, ...) that is verified on recovery;
+    #       older merged files without the index can still be recovered.）
+
     # 使用 AI 完成编码（TRAE AI 编辑器），并经过一些人工的测试、修改和完善。
     # （Generated by TRAE AI Editor, and then manually tested, modified, and improved.）
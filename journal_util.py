@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+
+# 任务日志（断点续传）:
+# 长时间运行的任务（压缩、加密、解密、解压、合并、恢复）把进度追加到输出目录中的日志文件 .<名称>.journal，
+# 每行一条 JSON 记录，第一行为任务类型、参数和密码校验值，之后每行是一个检查点。
+# 写检查点之前相关的输出已经写入（大文件先 fsync），因此日志中的每条记录都对应可靠的进度。
+# 日志以 O_APPEND 方式打开，每条记录一次 write 写入，多个工作进程可以同时追加到同一个日志；
+# 崩溃时写了一半的最后一行在读取时被忽略。
+# 任务成功结束后删除日志；中途失败时保留日志，带 --resume 重新运行相同的命令即可跳过已经完成的部分。
+
+# 密码校验值的 PBKDF2 迭代次数（日志中不保存密码，只保存加盐的校验值，用来发现续传时用错了密码）
+CHECK_ITERATIONS = 10000
+
+
+def journal_path(output_dir, name):
+    """任务日志的路径: <output_dir>/.<name>.journal"""
+    return os.path.join(output_dir, f".{name}.journal")
+
+
+def _secret_check(secret, salt):
+    return hashlib.pbkdf2_hmac('sha256', secret.encode('utf-8'), salt, CHECK_ITERATIONS).hex()
+
+
+def _load(path):
+    """读取日志，返回 (第一行, 检查点列表)；忽略写了一半的最后一行"""
+    with open(path, 'rb') as f:
+        lines = f.read().split(b'\n')
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line.decode('utf-8')))
+        except ValueError:
+            break
+    if not records:
+        raise ValueError(f"任务日志为空或已损坏: {path}")
+    return records[0], records[1:]
+
+
+class Journal:
+    """任务日志: records 为上次运行留下的检查点（新开始的任务为空），append 追加新的检查点
+
+    discarded 为重新开始时被覆盖的旧日志中的检查点（上次中断的任务已完成的部分），调用者可以据此清理旧的输出。
+    """
+
+    def __init__(self, path, records=(), discarded=()):
+        self.path = path
+        self.records = list(records)
+        self.discarded = list(discarded)
+        self.appended = 0  # 本次运行追加的检查点数
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    @property
+    def checkpointed(self):
+        """是否已有检查点（上次运行留下的、本次追加的，或其他工作进程追加到同一个日志的）"""
+        return bool(self.records or self.appended) or (os.path.exists(self.path) and bool(_load(self.path)[1]))
+
+    @classmethod
+    def open(cls, path, kind, params, secrets=(), resume=False):
+        """打开任务日志
+
+        resume 为 True 且日志存在时读取上次的检查点，任务类型、参数或密码与上次不一致时抛出 ValueError；
+        否则（包括 resume 为 True 但没有日志时）重新开始，覆盖旧的日志，旧日志中的检查点保存在 discarded 中。
+        params 必须可以序列化为 JSON；secrets 为密码列表（None 表示未使用），只保存加盐的校验值。
+        """
+        params = json.loads(json.dumps(params))
+        if resume and os.path.exists(path):
+            header, records = _load(path)
+            if header.get('kind') != kind or header.get('params') != params:
+                raise ValueError(f"任务日志与当前的命令参数不一致，无法续传（去掉 --resume 重新开始）: {path}")
+            salt = bytes.fromhex(header['salt'])
+            checks = [_secret_check(secret, salt) if secret else None for secret in secrets]
+            if checks != header.get('checks'):
+                raise ValueError("密码与上次运行时不一致，无法续传")
+            return cls(path, records)
+
+        discarded = []
+        if os.path.exists(path):
+            try:
+                discarded = _load(path)[1]
+            except (OSError, ValueError):
+                pass  # 旧日志损坏时没有可用的检查点
+        salt = os.urandom(16)
+        header = {'kind': kind, 'params': params, 'salt': salt.hex(),
+                  'checks': [_secret_check(secret, salt) if secret else None for secret in secrets]}
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return cls(path, discarded=discarded)
+
+    def append(self, record, sync=True):
+        """追加一个检查点（一次 write 写入整行）；sync 为 True 时同时 fsync 日志"""
+        os.write(self._fd, (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.appended += 1
+        if sync:
+            os.fsync(self._fd)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def finish(self):
+        """任务成功结束: 关闭并删除日志"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def sync_path(path):
+    """把文件已写入的数据 fsync 到磁盘"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# 使用例子（在代码中）:
+# journal = journal_util.Journal.open(journal_util.journal_path(output_dir, name), 'merge', {'input': ...},
+#                                     secrets=[password], resume=resume)
+# done = {record['file'] for record in journal.records}
+# for ...:
+#     ...  # 跳过 done 中的部分，写完后
+#     journal.append({'file': ...})
+# journal.finish()
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from tqdm import tqdm
+
+# 各阶段的统计数据（整个进程共用一份）:
+# 每个阶段记录 墙钟时间、CPU 时间、输入/输出字节数、文件数 和 进入次数，同名阶段多次进入时累加。
+# 阶段可以嵌套（例如 compress 中包含 encrypt），嵌套的阶段时间会重叠，不能直接相加。
+# CPU 时间包含本进程和已回收的子进程（进程池在阶段结束前关闭时，工作进程的 CPU 时间也会计入）。
+_stages = {}
+_kdf = {'calls': 0, 'seconds': 0.0}
+_hooks = []
+_quiet = False
+_started = time.perf_counter()
+
+
+def set_quiet(quiet):
+    """设置安静模式: 不显示进度条和普通提示信息（错误信息照常输出）"""
+    global _quiet
+    _quiet = bool(quiet)
+
+
+def is_quiet():
+    return _quiet
+
+
+def log(message):
+    """输出普通提示信息，安静模式下不输出"""
+    if not _quiet:
+        print(message)
+
+
+def progress(total, desc):
+    """创建进度条；安静模式下 tqdm 被禁用，update 几乎没有开销"""
+    return tqdm(total=total, desc=desc, disable=_quiet, mininterval=0.5)
+
+
+def add_hook(hook):
+    """注册分析钩子 hook(event, name, record)，event 为 'start' 或 'end'，record 为该阶段当前的统计数据
+
+    例如用 cProfile 分析某个阶段:
+        profiler = cProfile.Profile()
+        def hook(event, name, record):
+            if name == 'compress':
+                profiler.enable() if event == 'start' else profiler.disable()
+        stats_util.add_hook(hook)
+    """
+    _hooks.append(hook)
+
+
+def _record(name):
+    if name not in _stages:
+        _stages[name] = {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                         'bytes_in': 0, 'bytes_out': 0, 'files': 0}
+    return _stages[name]
+
+
+def _cpu_time():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+@contextmanager
+def stage(name):
+    """统计一个阶段的墙钟时间和 CPU 时间"""
+    record = _record(name)
+    for hook in _hooks:
+        hook('start', name, record)
+    wall = time.perf_counter()
+    cpu = _cpu_time()
+    try:
+        yield record
+    finally:
+        record['calls'] += 1
+        record['wall_seconds'] += time.perf_counter() - wall
+        record['cpu_seconds'] += _cpu_time() - cpu
+        for hook in _hooks:
+            hook('end', name, record)
+
+
+def add(name, bytes_in=0, bytes_out=0, files=0):
+    """累加阶段的字节数和文件数"""
+    record = _record(name)
+    record['bytes_in'] += bytes_in
+    record['bytes_out'] += bytes_out
+    record['files'] += files
+
+
+def add_kdf(seconds):
+    """记录一次慢速密钥派生的耗时"""
+    _kdf['calls'] += 1
+    _kdf['seconds'] += seconds
+
+
+def snapshot():
+    """返回当前的统计数据（可直接序列化为 JSON）"""
+    stages = {}
+    for name, record in _stages.items():
+        stages[name] = dict(record)
+        wall = record['wall_seconds']
+        stages[name]['mb_per_s'] = record['bytes_in'] / 1024 / 1024 / wall if wall > 0 else None
+    return {
+        'argv': sys.argv,
+        'pid': os.getpid(),
+        'wall_seconds': time.perf_counter() - _started,
+        'kdf': dict(_kdf),
+        'stages': stages,
+    }
+
+
+def write_json(path):
+    """把统计数据写入 JSON 文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+
+
+def add_arguments(parser):
+    """给命令行子命令加上 --stats-json 和 --quiet 参数"""
+    parser.add_argument("--stats-json", help="把各阶段的耗时、字节数等统计写入 JSON 文件(可选)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="安静模式: 不显示进度条和普通提示信息(可选)")
+
+
+@contextmanager
+def cli_session(args):
+    """按命令行参数设置安静模式，并在命令结束（包括 sys.exit 退出）时写出统计 JSON"""
+    set_quiet(getattr(args, 'quiet', False))
+    try:
+        yield
+    finally:
+        if getattr(args, 'stats_json', None):
+            write_json(args.stats_json)
+
+
+# 使用例子（在代码中）:
+# with stats_util.stage('compress'):
+#     ...
+#     stats_util.add('compress', bytes_in=n_in, bytes_out=n_out, files=1)
+# stats_util.write_json('stats.json')
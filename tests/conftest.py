@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 各模块是仓库根目录下的独立脚本，测试时把根目录加入模块搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,182 @@
+import io
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import compress_util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _make_tree(root, count, size):
+    os.makedirs(os.path.join(root, 'sub'))
+    for i in range(count):
+        with open(os.path.join(root, 'sub' if i % 2 else '', f'f{i:02d}.bin'), 'wb') as f:
+            f.write(os.urandom(size))
+
+
+def _read_tree(root):
+    result = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                result[os.path.relpath(path, root)] = f.read()
+    return result
+
+
+def test_resume_then_incremental_keeps_full_manifest(tmp_path, monkeypatch):
+    """中断 → 续传 → 增量: 续传后的清单包括中断前已写完的文件，之后删除这些文件时增量包中有删除记录"""
+    src = str(tmp_path / 'isrc')
+    out = str(tmp_path / 'out')
+    _make_tree(src, 40, 20000)
+
+    # 写完 25 个成员后模拟崩溃（此时已有多个分卷写完并记入任务日志）
+    write_job = compress_util._write_job
+    calls = []
+
+    def crashing_write_job(*args, **kwargs):
+        if len(calls) == 25:
+            raise OSError("模拟崩溃")
+        calls.append(1)
+        return write_job(*args, **kwargs)
+
+    monkeypatch.setattr(compress_util, '_write_job', crashing_write_job)
+    with pytest.raises(SystemExit):
+        compress_util.compress_folder(src, out, chunk_size=64 * 1024, incremental=True)
+    monkeypatch.setattr(compress_util, '_write_job', write_job)
+
+    compress_util.compress_folder(src, out, chunk_size=64 * 1024, incremental=True, resume=True)
+    with open(os.path.join(out, 'isrc.manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert len(manifest['files']) == 40
+
+    # 没有变化时不生成增量包
+    assert compress_util.compress_folder(src, out, chunk_size=64 * 1024, incremental=True) == []
+
+    # 删除一个续传前已写完的文件: 增量包只记录删除，回放整个链后该文件不应出现
+    os.remove(os.path.join(src, 'f00.bin'))
+    paths = compress_util.compress_folder(src, out, chunk_size=64 * 1024, incremental=True)
+    assert len(paths) == 1
+
+    restored = str(tmp_path / 'restored')
+    compress_util.decompress_folder(out, restored)
+    assert _read_tree(restored) == _read_tree(src)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_decompress_encrypted_volumes_without_plaintext(tmp_path, workers):
+    """直接从 .enc 分卷解压: 结果与源文件相同，输入目录中不留下解密后的分卷"""
+    src = str(tmp_path / 'src')
+    out = str(tmp_path / 'out')
+    _make_tree(src, 10, 30000)
+    compress_util.compress_folder(src, out, chunk_size=64 * 1024, password='pw', crypto='key')
+
+    restored = str(tmp_path / 'restored')
+    compress_util.decompress_folder(out, restored, password='pw', workers=workers, crypto='key')
+    assert _read_tree(restored) == _read_tree(src)
+    assert not [name for name in os.listdir(out) if name.endswith('.zip')]
+
+
+def test_fresh_run_removes_stale_volumes(tmp_path, monkeypatch):
+    """中断后不加 --resume、用更大的分卷重新压缩: 上次留下的序号更大的分卷被删除，不会接到新的分卷集后面"""
+    src = str(tmp_path / 'src')
+    out = str(tmp_path / 'out')
+    _make_tree(src, 40, 20000)
+
+    write_job = compress_util._write_job
+    calls = []
+
+    def crashing_write_job(*args, **kwargs):
+        if len(calls) == 35:
+            raise OSError("模拟崩溃")
+        calls.append(1)
+        return write_job(*args, **kwargs)
+
+    monkeypatch.setattr(compress_util, '_write_job', crashing_write_job)
+    with pytest.raises(SystemExit):
+        compress_util.compress_folder(src, out, chunk_size=32 * 1024, crypto='key')
+    monkeypatch.setattr(compress_util, '_write_job', write_job)
+    stale = len(compress_util.find_volumes(out, 'src', '.zip.enc'))
+
+    paths = compress_util.compress_folder(src, out, chunk_size=128 * 1024, crypto='key')
+    assert len(paths) < stale
+    assert compress_util.find_volumes(out, 'src', '.zip.enc') == paths
+
+    restored = str(tmp_path / 'restored')
+    compress_util.decompress_folder(out, restored, crypto='key')
+    assert _read_tree(restored) == _read_tree(src)
+
+
+def test_digest_volume_list_ignores_stale_volumes(tmp_path, capsys):
+    """目录中混入旧的分卷: 校验报告清单之外的分卷，解压和列出按清单中的分卷列表读取，不受影响"""
+    src = str(tmp_path / 'src')
+    old = str(tmp_path / 'old')
+    out = str(tmp_path / 'out')
+    _make_tree(src, 20, 20000)
+    old_paths = compress_util.compress_folder(src, old, chunk_size=32 * 1024, password='pw')
+    paths = compress_util.compress_folder(src, out, chunk_size=128 * 1024, password='pw')
+    assert len(old_paths) > len(paths)
+    for path in old_paths[len(paths):]:
+        os.replace(path, os.path.join(out, os.path.basename(path)))
+
+    assert not compress_util.verify_archive(out, password='pw')
+    assert '清单之外的分卷' in capsys.readouterr().out
+
+    compress_util.list_archive(out, password='pw')
+    assert 'sub/f01.bin' in capsys.readouterr().out
+    restored = str(tmp_path / 'restored')
+    compress_util.decompress_folder(out, restored, password='pw')
+    assert _read_tree(restored) == _read_tree(src)
+
+    os.remove(paths[-1])
+    assert not compress_util.verify_archive(out, password='pw')
+    assert '分卷不存在' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('solid', [False, True])
+def test_parallel_password_round_trip(tmp_path, solid):
+    """多进程压缩（成员直接拼接进压缩包）+ AES 密码: 解压结果与源文件相同"""
+    src = str(tmp_path / 'src')
+    out = str(tmp_path / 'out')
+    _make_tree(src, 12, 30000)
+    compress_util.compress_folder(src, out, chunk_size=64 * 1024, password='pw', workers=2, solid=solid)
+    assert compress_util.verify_archive(out, password='pw')
+
+    restored = str(tmp_path / 'restored')
+    compress_util.decompress_folder(out, restored, password='pw')
+    assert _read_tree(restored) == _read_tree(src)
+
+
+@pytest.mark.parametrize('password, crypto', [(None, None), ('pw', None), (None, 'key'), ('pw', 'key')])
+def test_stream_round_trip(tmp_path, password, crypto):
+    """管道模式: compress_stream 写到流，decompress_stream 从流中解压，结果与源文件相同"""
+    src = str(tmp_path / 'src')
+    _make_tree(src, 10, 30000)
+    stream = io.BytesIO()
+    compress_util.compress_stream(compress_util.folder_members(src), sink=compress_util.StreamSink(stream),
+                                  password=password, crypto=crypto)
+
+    stream.seek(0)
+    restored = str(tmp_path / 'restored')
+    compress_util.decompress_stream(stream, restored, password=password, crypto=crypto)
+    assert _read_tree(restored) == _read_tree(src)
+
+
+def test_cli_pipe_round_trip(tmp_path):
+    """命令行管道: zip_encrypt -o - 的输出直接作为 zip_decrypt -i - 的输入（-p 与 -c 同时使用）"""
+    src = str(tmp_path / 'src')
+    _make_tree(src, 10, 30000)
+    restored = str(tmp_path / 'restored')
+    script = os.path.join(ROOT, 'zip_crypto.py')
+    encrypt = subprocess.Popen([sys.executable, script, 'zip_encrypt', '-i', src, '-o', '-', '-p', 'pw', '-c', 'key'],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    decrypt = subprocess.run([sys.executable, script, 'zip_decrypt', '-i', '-', '-o', restored, '-p', 'pw', '-c', 'key'],
+                             stdin=encrypt.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    encrypt.stdout.close()
+    assert encrypt.wait() == 0
+    assert decrypt.returncode == 0
+    assert _read_tree(restored) == _read_tree(src)
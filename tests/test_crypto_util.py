@@ -0,0 +1,50 @@
+import os
+import filecmp
+import tracemalloc
+
+import pytest
+
+import crypto_util
+
+# 大文件往返测试的文件大小；峰值内存（Python 分配的内存）必须远小于文件大小
+LARGE_FILE_SIZE = 64 * 1024 * 1024
+PEAK_LIMIT = 16 * 1024 * 1024
+
+
+def _large_file(path):
+    chunk = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(LARGE_FILE_SIZE // len(chunk)):
+            f.write(chunk)
+
+
+def _traced(func, *args, **kwargs):
+    """执行 func，返回 (结果, 执行期间 Python 分配内存的峰值)"""
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('legacy', [False, True])
+def test_large_round_trip_bounded_memory(tmp_path, legacy):
+    source = str(tmp_path / 'large.bin')
+    _large_file(source)
+
+    encrypted, peak = _traced(crypto_util.encrypt_file, source, str(tmp_path / 'enc'), 'secret', legacy=legacy)
+    assert encrypted
+    assert peak < PEAK_LIMIT
+
+    decrypted, peak = _traced(crypto_util.decrypt_file, encrypted, str(tmp_path / 'dec'), 'secret')
+    assert decrypted
+    assert peak < PEAK_LIMIT
+    assert filecmp.cmp(source, decrypted, shallow=False)
+
+
+def test_wrong_password_fails(tmp_path):
+    source = tmp_path / 'small.bin'
+    source.write_bytes(os.urandom(100000))
+    encrypted = crypto_util.encrypt_file(str(source), str(tmp_path / 'enc'), 'secret')
+    assert crypto_util.decrypt_file(encrypted, str(tmp_path / 'dec'), 'wrong') == ""
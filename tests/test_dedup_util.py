@@ -0,0 +1,36 @@
+import os
+import stat
+
+import pytest
+
+import dedup_util
+
+
+@pytest.mark.parametrize('crypto', [None, 'secret'])
+def test_restore_keeps_metadata_and_empty_dirs(tmp_path, crypto):
+    src = tmp_path / 'src'
+    (src / 'sub').mkdir(parents=True)
+    (src / 'empty').mkdir()
+    (src / 'nested' / 'deeper').mkdir(parents=True)
+    data = os.urandom(300000)
+    (src / 'sub' / 'data.bin').write_bytes(data)
+    (src / 'copy.bin').write_bytes(data)
+    (src / 'script.sh').write_bytes(b'#!/bin/sh\necho hi\n')
+    os.chmod(src / 'script.sh', 0o750)
+    os.chmod(src / 'copy.bin', 0o400)
+    os.utime(src / 'sub' / 'data.bin', ns=(1_500_000_000_123_456_789, 1_500_000_000_123_456_789))
+
+    store = str(tmp_path / 'store')
+    dedup_util.store_folder(str(src), store, crypto=crypto)
+    out = tmp_path / 'out'
+    dedup_util.restore_store(store, str(out), crypto=crypto)
+
+    assert (out / 'sub' / 'data.bin').read_bytes() == data
+    assert (out / 'copy.bin').read_bytes() == data
+    assert (out / 'empty').is_dir() and not os.listdir(out / 'empty')
+    assert (out / 'nested' / 'deeper').is_dir()
+    for name in ('script.sh', 'copy.bin', 'sub/data.bin'):
+        expected = os.stat(src / name)
+        actual = os.stat(out / name)
+        assert stat.S_IMODE(actual.st_mode) == stat.S_IMODE(expected.st_mode)
+        assert actual.st_mtime_ns == expected.st_mtime_ns
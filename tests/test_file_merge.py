@@ -0,0 +1,57 @@
+import os
+import hashlib
+
+import pytest
+
+import file_merge
+
+IMAGE = b'\x89PNG\r\n\x1a\n' + b'\0' * 64
+
+
+def _write_merged(path, name, data):
+    """按合并文件的格式（图片 + 文件名行 + 数据 + 索引）直接构造一个合并文件，name 不做任何检查"""
+    file_info = f"{os.path.basename(name)}\n".encode('utf-8')
+    index = {
+        'image_length': len(IMAGE),
+        'payload_offset': len(IMAGE) + len(file_info),
+        'payload_length': len(data),
+        'name': name,
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+    }
+    with open(path, 'wb') as f:
+        f.write(IMAGE + file_info + data + file_merge._pack_trailer(index))
+
+
+@pytest.mark.parametrize('name', ['../evil.txt', 'sub/../../evil.txt', '/tmp/evil.txt', '..'])
+def test_recover_rejects_unsafe_names(tmp_path, name):
+    merged = tmp_path / 'merged'
+    merged.mkdir()
+    _write_merged(str(merged / 'a.png'), name, b'payload')
+    out = tmp_path / 'out'
+    with pytest.raises(SystemExit):
+        file_merge.recover_files(str(merged), str(out))
+    assert not (out / 'evil.txt').exists()
+    assert not (tmp_path / 'evil.txt').exists()
+    assert os.listdir(out / 'data') == []
+
+
+def test_recover_rejects_duplicate_names(tmp_path):
+    merged = tmp_path / 'merged'
+    merged.mkdir()
+    _write_merged(str(merged / 'a.png'), 'same.bin', b'first')
+    _write_merged(str(merged / 'b.png'), 'same.bin', b'second')
+    with pytest.raises(SystemExit):
+        file_merge.recover_files(str(merged), str(tmp_path / 'out'), workers=4)
+    assert os.listdir(tmp_path / 'out' / 'data') == []
+
+
+def test_recover_round_trip(tmp_path):
+    merged = tmp_path / 'merged'
+    merged.mkdir()
+    _write_merged(str(merged / 'a.png'), 'one.bin', b'first')
+    _write_merged(str(merged / 'b.png'), 'two.bin', b'second')
+    file_merge.recover_files(str(merged), str(tmp_path / 'out'), workers=2)
+    assert (tmp_path / 'out' / 'data' / 'one.bin').read_bytes() == b'first'
+    assert (tmp_path / 'out' / 'data' / 'two.bin').read_bytes() == b'second'
+    assert (tmp_path / 'out' / 'images' / 'a.png').read_bytes() == IMAGE
@@ -0,0 +1,19 @@
+import journal_util
+
+
+def test_fresh_start_keeps_discarded_checkpoints(tmp_path):
+    """不续传重新开始时覆盖旧日志，但旧日志中的检查点保存在 discarded 中"""
+    path = journal_util.journal_path(str(tmp_path), 'job')
+    journal = journal_util.Journal.open(path, 'compress', {'chunk_size': 1024}, secrets=['pw'])
+    journal.append({'volume': 1, 'members': []})
+    journal.append({'volume': 2, 'members': []})
+    journal.close()
+
+    journal = journal_util.Journal.open(path, 'compress', {'chunk_size': 4096}, secrets=['pw'])
+    assert journal.records == []
+    assert [record['volume'] for record in journal.discarded] == [1, 2]
+    journal.close()
+
+    resumed = journal_util.Journal.open(path, 'compress', {'chunk_size': 4096}, secrets=['pw'], resume=True)
+    assert resumed.records == [] and resumed.discarded == []
+    resumed.finish()
@@ -1,8 +1,13 @@
 import argparse
 import os
 import sys
-from compress_util import compress_folder, decompress_folder
-from crypto_util import encrypt_file, decrypt_file
+import shutil
+from contextlib import redirect_stdout
+from compress_util import compress_folder, decompress_folder, extract_members, list_archive, verify_archive, CODECS, \
+    compress_stream, decompress_stream, tar_members, list_members, folder_members, StreamSink, CommandSink
+from crypto_util import decrypt_files, is_segmented
+from dedup_util import store_folder, restore_store, is_store, DEFAULT_PACK_SIZE
+import stats_util
 
 def parse_size(size_str):
     """将带单位的容量字符串转换为整数字节数"""
@@ -27,18 +32,54 @@ def main():
 
     # 加密子命令
     zip_encrypt_parser = subparsers.add_parser('zip_encrypt', help='压缩并加密文件')
-    zip_encrypt_parser.add_argument("-i", "--input", required=True, help="输入文件或文件夹路径")
+    zip_encrypt_parser.add_argument("-i", "--input", required=True, help="输入文件或文件夹路径，- 表示从标准输入读取(管道模式)")
     zip_encrypt_parser.add_argument("-s", "--size", type=parse_size, help="分包大小(如100MB, 1GB), 必须为整数")
     zip_encrypt_parser.add_argument("-p", "--password", help="压缩密码(可选)")
     zip_encrypt_parser.add_argument("-c", "--crypto", help="加密密码(可选)")
-    zip_encrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径")
+    zip_encrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径，- 表示写到标准输出(管道模式)")
+    zip_encrypt_parser.add_argument("-w", "--workers", type=int, default=1, help="并行进程数(可选，默认 1)")
+    zip_encrypt_parser.add_argument("--incremental", action="store_true", help="增量模式: 根据上次的清单只压缩新增和修改的文件(可选)")
+    zip_encrypt_parser.add_argument("--no-adaptive", dest="adaptive", action="store_false", help="关闭自适应压缩策略，所有文件都使用指定的压缩算法(可选)")
+    zip_encrypt_parser.add_argument("--codec", choices=list(CODECS), default='deflate', help="压缩算法(可选，默认 deflate)")
+    zip_encrypt_parser.add_argument("--level", type=int, help="压缩级别(可选，deflate 0-9, bzip2 1-9)")
+    zip_encrypt_parser.add_argument("--auto", action="store_true", help="自动调优压缩算法和级别，需配合 --target-speed 或 --target-size(可选)")
+    zip_encrypt_parser.add_argument("--target-speed", type=float, help="自动调优的目标速度(MB/s)")
+    zip_encrypt_parser.add_argument("--target-size", type=parse_size, help="自动调优的目标输出大小(如 500MB, 2GB)")
+    zip_encrypt_parser.add_argument("--scan-threads", type=int, default=1, help="扫描目录的线程数(可选，默认 1，网络盘上可调大)")
+    zip_encrypt_parser.add_argument("--solid", action="store_true", help="固实模式: 小文件拼接成块整体压缩和加密，适合大量很小的文件(可选)")
+    zip_encrypt_parser.add_argument("--resume", action="store_true", help="断点续传: 从上次中断时最后一个检查点继续(需要分卷，可选)")
+    zip_encrypt_parser.add_argument("--dedup", action="store_true", help="去重仓库模式: 按内容分块，重复数据只压缩加密一次，-o 为仓库目录，-s 为块包大小(可选)")
+    zip_encrypt_parser.add_argument("--stdin-format", choices=['tar', 'list'], default='tar', help="-i - 时标准输入的格式: tar 数据流或每行一个路径的文件列表(可选，默认 tar)")
+    zip_encrypt_parser.add_argument("--sink", help="管道模式的分卷输出命令，每个分卷的数据通过管道交给该命令，{name} 替换为分卷文件名，需配合 -o -(可选)")
+    zip_encrypt_parser.add_argument("--name", help="管道模式下压缩包(分卷)的名字(可选，默认为输入文件夹名，从标准输入读取时为 stream)")
 
     # 解密子命令
     zip_decrypt_parser = subparsers.add_parser('zip_decrypt', help='解密并解压文件')
-    zip_decrypt_parser.add_argument("-i", "--input", required=True, help="输入文件路径")
+    zip_decrypt_parser.add_argument("-i", "--input", required=True, help="输入文件路径，- 表示从标准输入流式读取不分卷的压缩包(管道模式)")
     zip_decrypt_parser.add_argument("-c", "--crypto", help="加密密码(可选)")
     zip_decrypt_parser.add_argument("-p", "--password", help="解压密码(可选)")
     zip_decrypt_parser.add_argument("-o", "--output", required=True, help="输出文件夹路径")
+    zip_decrypt_parser.add_argument("-w", "--workers", type=int, default=1, help="并行进程数(可选，默认 1)")
+    zip_decrypt_parser.add_argument("--resume", action="store_true", help="断点续传: 跳过上次中断前已解压的文件(可选)")
+    zip_decrypt_parser.add_argument("--member", action="append", help="只解压匹配的成员(路径、通配符或目录，可多次指定)，只解密用到的分卷和分段(可选)")
+    zip_decrypt_parser.add_argument("--run", type=int, help="输入为去重仓库时恢复第几次运行的快照(可选，默认最近一次)")
+
+    # 列出内容子命令
+    list_parser = subparsers.add_parser('list', help='列出压缩包中的内容(只读取并解密中央目录)')
+    list_parser.add_argument("-i", "--input", required=True, help="输入文件或文件夹路径")
+    list_parser.add_argument("-c", "--crypto", help="加密密码(可选)")
+    list_parser.add_argument("-p", "--password", help="解压密码(可选，给出时展开固实块)")
+    list_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+
+    # 校验子命令
+    verify_parser = subparsers.add_parser('verify', help='按摘要清单并行校验分卷集(不解密、不解压)')
+    verify_parser.add_argument("-i", "--input", required=True, help="输入文件夹或摘要清单文件路径")
+    verify_parser.add_argument("-c", "--crypto", help="加密密码(可选，用于校验清单签名；没有清单时校验 .enc 文件的认证标签)")
+    verify_parser.add_argument("-p", "--password", help="压缩密码(可选，清单用压缩密码签名时用于校验签名)")
+    verify_parser.add_argument("-w", "--workers", type=int, default=1, help="并行校验的线程数(可选，默认 1)")
+
+    for sub_parser in (zip_encrypt_parser, zip_decrypt_parser, list_parser, verify_parser):
+        stats_util.add_arguments(sub_parser)
 
     try:
         args = parser.parse_args()
@@ -48,75 +89,187 @@ def main():
         print(f"错误: {str(e)}")
         sys.exit(1)
 
-    print("输入路径:", args.input)
-    # 修改为条件打印size参数
-    if hasattr(args, 'size'):
-        print("分包大小(字节):", args.size if args.size else "none")
-    print("压缩/解压密码:", args.password if args.password else "none")
-    print("加密/解密密码:", args.crypto if args.crypto else "none")
-    print("输出文件夹:", args.output)
+    if args.command == 'list':
+        # 列出内容时只输出列表（便于配合 --json 使用）
+        with stats_util.cli_session(args):
+            list_archive(args.input, password=args.password, crypto=args.crypto, as_json=args.json)
+        return
+
+    if args.command == 'verify':
+        with stats_util.cli_session(args):
+            if not verify_archive(args.input, password=args.password, crypto=args.crypto, workers=args.workers):
+                sys.exit(1)
+        return
+
+    stats_util.set_quiet(args.quiet)
+    # 压缩包写到标准输出时，提示信息和统计都改为输出到标准错误
+    stdout = sys.stdout.buffer
+    with redirect_stdout(sys.stderr if args.output == '-' else sys.stdout):
+        stats_util.log(f"输入路径: {args.input}")
+        # 修改为条件打印size参数
+        if hasattr(args, 'size'):
+            stats_util.log(f"分包大小(字节): {args.size if args.size else 'none'}")
+        stats_util.log(f"压缩/解压密码: {args.password if args.password else 'none'}")
+        stats_util.log(f"加密/解密密码: {args.crypto if args.crypto else 'none'}")
+        stats_util.log(f"输出文件夹: {args.output}")
+
+        with stats_util.cli_session(args):
+            _run(args, stdout)
+
+def _check_pipe_options(args, options):
+    """管道模式下不支持的选项给出时报错退出"""
+    used = [option for option, value in options if value]
+    if used:
+        print(f"错误: 管道模式不支持 {', '.join(used)}")
+        sys.exit(1)
+
+def _run_encrypt_pipe(args, stdout):
+    """管道模式的压缩加密: 源数据来自标准输入（tar 数据流或文件列表）或文件夹，
+    压缩包写到标准输出、--sink 命令或输出文件夹，本地不写任何临时文件"""
+    _check_pipe_options(args, [('--incremental', args.incremental), ('--resume', args.resume), ('--solid', args.solid),
+                               ('--auto', args.auto), ('--dedup', args.dedup)])
+    if args.sink and args.output != '-':
+        print("错误: --sink 需要配合 -o - 使用")
+        sys.exit(1)
+    if args.output == '-' and args.size and not args.sink:
+        print("错误: 写到标准输出时不能分卷，分卷请配合 --sink 使用")
+        sys.exit(1)
+    if args.workers > 1:
+        stats_util.log("警告: 管道模式按顺序压缩，忽略 -w")
+
+    if args.input == '-':
+        members = tar_members(sys.stdin.buffer) if args.stdin_format == 'tar' else list_members(sys.stdin)
+        archive_name = args.name or 'stream'
+    else:
+        if not os.path.exists(args.input):
+            print(f"错误: 输入路径不存在: {args.input}")
+            sys.exit(1)
+        members = folder_members(args.input, args.scan_threads)
+        archive_name = args.name or os.path.basename(os.path.normpath(args.input))
+
+    sink = None
+    if args.sink:
+        sink = CommandSink(args.sink)
+    elif args.output == '-':
+        sink = StreamSink(stdout)
+    compress_stream(members, output_dir=None if sink else args.output, archive_name=archive_name, sink=sink,
+                    chunk_size=args.size, password=args.password, crypto=args.crypto, codec=args.codec,
+                    level=args.level, adaptive=args.adaptive)
+
+def _run(args, stdout=None):
+    """执行子命令；stdout 为管道模式下写出压缩包的标准输出"""
+    if args.command == 'zip_encrypt' and (args.input == '-' or args.output == '-' or args.sink):
+        _run_encrypt_pipe(args, stdout)
+
+        stats_util.log("完成")
+
+    elif args.command == 'zip_decrypt' and args.input == '-':
+        # 从标准输入流式解密、解压（边读边认证每个分段、边解压），不需要先把压缩包落盘
+        _check_pipe_options(args, [('--member', args.member), ('--resume', args.resume), ('--run', args.run)])
+        decompress_stream(sys.stdin.buffer, args.output, password=args.password, crypto=args.crypto)
+
+        stats_util.log("完成")
+
+    elif args.command == 'zip_encrypt' and args.dedup:
+        # 去重仓库模式: 文件按内容分块，仓库中已有的块（包括之前运行存入的）不再压缩和加密
+        if args.password:
+            print("错误: 去重仓库模式不使用压缩密码，请用 -c 指定加密密码")
+            sys.exit(1)
+        store_folder(args.input, args.output, crypto=args.crypto, workers=args.workers,
+                     pack_size=args.size or DEFAULT_PACK_SIZE, scan_threads=args.scan_threads)
+
+        stats_util.log("完成")
+
+    elif args.command == 'zip_decrypt' and os.path.isdir(args.input) and is_store(args.input):
+        # 输入是去重仓库: 直接从块包中读出、解密、解压各个块
+        restore_store(args.input, args.output, crypto=args.crypto, run=args.run, workers=args.workers)
+
+        stats_util.log("完成")
 
-    if args.command == 'zip_encrypt':
+    elif args.command == 'zip_encrypt':
          # 调用compress_util.py中的压缩函数
+        # 如果使用了加密参数，压缩、分卷和文件加密在同一个流水线中完成，
+        # 压缩数据直接加密写入最终的 .enc 分卷，不产生中间文件
+        # （整个任务共用一个任务盐值，只做一次慢速密钥派生，各分卷按序号派生独立子密钥）
         compress_folder(
             input_path=args.input,
             output_dir=args.output,
             chunk_size=args.size,
-            password=args.password
+            password=args.password,
+            crypto=args.crypto,
+            workers=args.workers,
+            incremental=args.incremental,
+            adaptive=args.adaptive,
+            codec=args.codec,
+            level=args.level,
+            auto=args.auto,
+            target_speed=args.target_speed,
+            target_size=args.target_size,
+            scan_threads=args.scan_threads,
+            solid=args.solid,
+            resume=args.resume
         )
 
-        # 如果使用了加密参数
-        # 调用encrypt_file加密函数，对上面压缩输出的文件进行加密
-        # 注意检查是否使用了分卷功能，如果使用则要对每个输出文件进行加密
-        if args.crypto:
-            output_dir = args.output
-            if args.size:
-                # 对每个分卷文件进行加密
-                for filename in os.listdir(output_dir):
-                    if filename.endswith('.zip'):
-                        input_path = os.path.join(output_dir, filename)
-                        encrypt_file(input_path, output_dir, args.crypto)
-                        # 删除原始压缩文件
-                        os.remove(input_path)
-            else:
-                # 对单个压缩文件进行加密
-                input_path = os.path.join(output_dir, os.path.basename(args.input) + '.zip')
-                encrypt_file(input_path, output_dir, args.crypto)
-                # 删除原始压缩文件
-                os.remove(input_path)
+        stats_util.log("完成")
+
+    elif args.command == 'zip_decrypt' and args.member:
+        # 只取出部分成员: 直接从 .enc 分卷中按需解密中央目录和这些成员所在的分段，不生成解密后的分卷
+        extract_members(args.input, args.output, args.member, password=args.password, crypto=args.crypto)
 
-        print("完成")
-        sys.exit(0)
+        stats_util.log("完成")
 
     elif args.command == 'zip_decrypt':
-        # 如果使用了解密密码参数, 调用decrypt_file解密
-        decompress_file_name = args.input
         if args.crypto:
-            input_dir = args.input
-            # 如果是文件直接解密
-            if os.path.isfile(input_dir):
-                decompress_file_name = decrypt_file(input_dir, os.path.dirname(input_dir), args.crypto)
+            enc_paths = [args.input] if os.path.isfile(args.input) else sorted(
+                os.path.join(args.input, filename) for filename in os.listdir(args.input) if filename.endswith('.enc'))
+            try:
+                legacy = [path for path in enc_paths if not is_segmented(path)]
+            except ValueError as e:
+                print(f"错误: {str(e)}")
+                sys.exit(1)
+            if legacy:
+                # 旧 CBC 格式不能按需解密，只能先完整解密到输出目录下的临时文件夹，解压后（包括出错时）删除
+                _decrypt_legacy_and_extract(args, enc_paths)
             else:
-                # 如果是文件夹则遍历解密
-                for filename in os.listdir(input_dir):
-                    if filename.endswith('.enc'):
-                        input_path = os.path.join(input_dir, filename)
-                        decompress_file_name = decrypt_file(input_path, input_dir, args.crypto)
-                        # 保留原始加密文件
-
-        # 如果 decompress_file_name 文件名 包含有 "part", 说明是分卷文件，则 decompress_file_name 改为使用 args.input
-        if '_part' in decompress_file_name:
-            decompress_file_name = args.input
-
-        # 调用decompress_folder解压函数
+                # 分段加密格式: 直接从 .enc 分卷中边读边解密（每段的认证标签同时校验）并解压，
+                # 解密后的分卷只在内存中，不落盘
+                decompress_folder(
+                    args.input,
+                    output_dir=args.output,
+                    password=args.password,
+                    workers=args.workers,
+                    resume=args.resume,
+                    crypto=args.crypto
+                )
+        else:
+            # 调用decompress_folder解压函数
+            decompress_folder(
+                args.input,
+                output_dir=args.output,
+                password=args.password,
+                workers=args.workers,
+                resume=args.resume
+            )
+
+        stats_util.log("完成")
+
+def _decrypt_legacy_and_extract(args, enc_paths):
+    """含旧 CBC 格式的文件时: 把所有 .enc 文件解密到输出目录下的临时文件夹再解压，结束后删除解密出的明文"""
+    temp_dir = os.path.join(args.output, '.zcm_decrypt')
+    os.makedirs(temp_dir, exist_ok=True)
+    try:
+        # 所有分卷的分段共用一个进程池，只做一次密钥派生，每段的认证标签在解密时同时校验
+        if not decrypt_files(enc_paths, temp_dir, args.crypto, workers=args.workers, resume=args.resume):
+            sys.exit(1)
         decompress_folder(
-            decompress_file_name,
+            temp_dir if os.path.isdir(args.input) else os.path.join(temp_dir, os.path.basename(enc_paths[0])[:-len('.enc')]),
             output_dir=args.output,
-            password=args.password
+            password=args.password,
+            workers=args.workers,
+            resume=args.resume
         )
-
-        print("完成")
-        sys.exit(0)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     main()
@@ -131,6 +284,7 @@ if __name__ == "__main__":
 
     # 确保本地 python 环境已经安装了库（Make sure that the local python environment has installed the library）
     # pip install argparse tqdm pyzipper pycryptodome
+    # 或者安装已测试的版本（Or install the tested versions）: pip install -r requirements.txt
 
     # 一些使用例子（Some usage examples）:
 
@@ -151,6 +305,63 @@ if __name__ == "__main__":
     #       keep this folder without anything else except for the compressed product to ensure that the partitioned file name is checked out correctly）
     # python.exe .\zip_crypto zip_decrypt -i <input_dir> -o <output_dir>  -p aaa -c abc
 
+    # 加上 -w 8 可使用 8 个进程并行加密/解密（Add -w 8 to encrypt/decrypt with 8 processes in parallel）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> -s 50KB -p aaa -c abc -w 8
+
+    # 增量模式，每晚对同一文件夹运行，第一次生成完整包，之后只生成 <input_dir>_deltaN 增量包
+    # （Incremental mode: the first run writes a full archive, later runs only write <input_dir>_deltaN deltas）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> -p aaa -c abc --incremental
+    # 解压时 -i 指定 <output_dir>，会依次回放完整包和所有增量包（Decompress with -i <output_dir> to replay the chain）
+
+    # 指定压缩算法和级别（Choose codec and level）: 加上 --codec lzma 或 --codec bzip2 --level 9
+    # 自动调优，选择预计输出不超过 2GB 时最快的算法（Auto-tune for the fastest codec that fits in 2GB）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> --auto --target-size 2GB
+
+    # 网络盘上有大量小文件时，用 16 个线程扫描目录（Scan a huge tree on a network disk with 16 threads）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> --scan-threads 16
+
+    # 固实模式，大量很小的文件拼接成块整体压缩和加密（Solid mode: pack tiny files into blocks）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> -p aaa --solid
+
+    # 把各阶段（压缩、加密、分卷、解密、解压）的耗时、字节数、文件数和密钥派生耗时写入 JSON，并且不显示进度条和提示信息
+    # （Write per-stage time, bytes, file counts and KDF time to JSON, without progress bars or messages）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> -s 50KB -c abc --stats-json stats.json -q
+
+    # 只取出部分文件，只解密中央目录和这些文件所在的分卷/分段，不需要解密整个分卷集
+    # （Restore only some files; only the central directory and the segments holding them are decrypted）:
+    # python zip_crypto zip_decrypt -i <input_dir> -o <output_dir> -p aaa -c abc --member docs/report.txt --member "*.log"
+
+    # 列出内容（名称、大小、压缩后大小、CRC、所在分卷），只解密最后的分卷中的中央目录
+    # （List names, sizes, compressed sizes, CRCs and start volumes; only the central directory is decrypted）:
+    # python zip_crypto list -i <input_dir> -c abc [-p aaa] [--json]
+
+    # 断点续传，中断（崩溃、被杀）后用相同的参数加上 --resume 重新运行，从最后一个检查点继续
+    # （Resume after a crash: rerun the same command with --resume to continue from the last checkpoint）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <output_dir> -s 50KB -p aaa -c abc --resume
+    # python zip_crypto zip_decrypt -i <input_dir> -o <output_dir> -p aaa -c abc --resume
+
+    # 校验分卷集: 压缩时在输出文件夹中生成 <input_dir>.digest.json（分卷密文、成员和源文件的 SHA-256，有密码时带 HMAC 签名），
+    # 用 4 个线程只读取分卷计算哈希，不解密也不解压
+    # （Verify a volume set against <input_dir>.digest.json written during compression — volume ciphertext,
+    #       member and source-file SHA-256, HMAC-signed when a password is set — hashing volumes with 4 threads, no decryption）:
+    # python zip_crypto verify -i <output_dir> -c abc -w 4
+
+    # 去重仓库模式，文件按内容分块，重复的块（同一次运行的其他文件、之前的运行）只压缩加密一次，-o 为仓库目录
+    # （Dedup store mode: content-defined chunks, each unique chunk is compressed and encrypted once; -o is the store）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o <store_dir> -c abc --dedup
+    # 恢复最近一次（或 --run 指定的）快照（Restore the latest snapshot, or the one given by --run）:
+    # python zip_crypto zip_decrypt -i <store_dir> -o <output_dir> -c abc [--run 2]
+
+    # 管道模式，tar 数据流从标准输入进、压缩加密后的数据流从标准输出出，本地不落盘（不能分卷，不支持 lzma）
+    # （Pipe mode: a tar stream in on stdin, the compressed and encrypted stream out on stdout, nothing on local disk;
+    #       no splitting, no lzma）:
+    # tar cf - <input_dir> | python zip_crypto zip_encrypt -i - -o - -p aaa -c abc | ssh host 'cat > backup.zip.enc'
+    # ssh host 'cat backup.zip.enc' | python zip_crypto zip_decrypt -i - -o <output_dir> -p aaa -c abc
+    # 从标准输入读取文件列表（Read a file list from stdin）:
+    # git ls-files | python zip_crypto zip_encrypt -i - --stdin-format list -o <output_dir> --name src
+    # 分卷交给命令处理，例如直接上传，{name} 为分卷文件名（Hand each volume to a command, e.g. an upload; {name} is the volume file name）:
+    # python zip_crypto zip_encrypt -i <input_dir> -o - -s 1GB -c abc --sink "aws s3 cp - s3://bucket/backup/{name}"
+
     # 注意（Note）:
     # 如果加密不使用分卷，则输出为一个文件，则解压缩的时候，指定 -i 为这个文件即可
     # （If encryption is not used for partitioning, the output is a file,